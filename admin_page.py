@@ -1,42 +1,72 @@
-import gspread
-from google.oauth2.service_account import Credentials
 import customtkinter as ctk
 from custom_messagebox import show_info, show_error, askyesno
 from login import LoginPage
-import os
-import json
-from config import Config
+from config import Config, sheet_id_from_url
+from storage import get_backend
+from sheet_cache import inventory_cache, credentials_cache, assignments_cache, sync_outbox, SYNC_INTERVAL
+from search_controller import SearchController
+from view_sync import keep_in_sync
+from virtual_list import VirtualList, Pager
+from sheets_worker import sheets_executor
+from health_monitor import health_monitor, describe, sparkline
+from local_store import local_store
+from passwords import hash_password
+from staged_changes import StagedChanges
+from sheet_export import export_worksheet
+from request_history import request_index, StaleIndex
+from request_fulfillment import RequestProcessor, STATUS_COLUMN
+from inventory_model import (InventoryTable, SORT_ORDERS, checked_number, format_quantity, normalize_row,
+                             parse_quantity, split_query)
+from low_stock import low_stock, add_reorder_header
+from bulk_import import BulkImport, CHUNK_ROWS
+from usage_analytics import usage_analytics, trend, WINDOW_DAYS, HORIZON_DAYS
+from api_trace import action, traced_action
+from diagnostics_window import bind_diagnostics
+from sites import site_inventories
+from cross_site_window import CrossSiteWindow
+from audit_log import (audit_log, fields, describe_change, INVENTORY_FIELDS, CREDENTIAL_FIELDS, ACTION_COLUMN,
+                       TARGET_COLUMN)
 
 config = Config()
 
-scopes = ["https://www.googleapis.com/auth/spreadsheets"]
+# Milliseconds between background checks of the inventory for the Below Threshold panel
+LOW_STOCK_INTERVAL = 60000
 
 try:
-    creds = Credentials.from_service_account_file('credentials.json', scopes=scopes)
-
-    client = gspread.authorize(creds)
-except Exception as e:
-    print(f"Error authenticating with Google Sheets: {e}")
-
-try:
-    inventory_sheetid = config.get_inventory_sheet_id()
-    credentials_sheetid = config.get_credentials_sheet_id()
-
-    inventory_sheet = client.open_by_key(inventory_sheetid).sheet1
-    credentials_sheet = client.open_by_key(credentials_sheetid).sheet1
+    inventory_sheet = get_backend().get_worksheet(config.get_inventory_sheet_id())
+    credentials_sheet = get_backend().get_worksheet(config.get_credentials_sheet_id())
 except Exception as e:
     print(f"Error accessing sheets: {e}")
     inventory_sheet = None
     credentials_sheet = None
 
+inventory_cache.set_sheet(inventory_sheet)
+credentials_cache.set_sheet(credentials_sheet)
+
 class AdminPage:
-    def __init__(self):
+    # Requests made by handlers without an action of their own count towards the page
+    @traced_action("admin.page")
+    def __init__(self, mainloop=True):
         self.display = ctk.CTk()
         self.display.title("Admin Page")
-        self.display.geometry("600x600")
+        self.display.geometry("600x900")
         self.display.config(background="#2E2E2E")
+        self.staged = StagedChanges()
+        sheets_executor.attach(self.display)
+        health_monitor.attach(self.display, probe=self.probe)
+        self.connected = False
+        if config.get_credentials_sheet_id():
+            # The audit worksheet lives next to the users and requests
+            audit_log.start(config.get_credentials_sheet_id())
         self.setup_ui()
-        self.display.mainloop()
+        bind_diagnostics(self.display)
+        sheets_executor.add_busy_listener(self.update_busy_indicator)
+        health_monitor.add_listener(self.show_health)
+        self.sync_offline_changes()
+        self.watch_low_stock()
+        # The benchmarks drive the page from their own loop
+        if mainloop:
+            self.display.mainloop()
 
     def setup_ui(self):
         # Set appearance mode
@@ -56,11 +86,22 @@ class AdminPage:
         ctk.CTkLabel(header_frame, text="Admin Dashboard", font=("Helvetica", 12),
                      text_color="#e0e0e0").pack(side="left", padx=20)
 
+        # The site whose inventory is edited and requests are fulfilled from
+        self.site_var = ctk.StringVar(value=config.get_active_site())
+        self.site_menu = ctk.CTkOptionMenu(header_frame, values=config.get_sites(), variable=self.site_var,
+                                           width=110, command=self.switch_site)
+        self.site_menu.pack(side="left", padx=5)
+
         # Logout button
         ctk.CTkButton(header_frame, text="Log Out", fg_color="#F44336", text_color="white", 
                       font=("Helvetica", 12, 'bold'), width=100,
                       command=self.logout).pack(side="right", padx=20)
 
+        # Loading indicator for background Sheets calls
+        self.busy_label = ctk.CTkLabel(header_frame, text="", font=("Helvetica", 12),
+                                       text_color="#FF9800")
+        self.busy_label.pack(side="right", padx=10)
+
         # Admin Dashboard Label
         ctk.CTkLabel(self.display, text="Admin Control Panel", font=("Helvetica", 24, 'bold'), 
                     text_color="#4CAF50").pack(pady=10)
@@ -91,9 +132,29 @@ class AdminPage:
                     width=200, fg_color="#F44336", text_color="white", 
                     font=("Helvetica", 12)).pack(pady=5)
 
+        ctk.CTkButton(inventory_frame, text="Import Materials", command=lambda: self.bulk_import("inventory"),
+                    width=200, fg_color="#3F51B5", text_color="white",
+                    font=("Helvetica", 12)).pack(pady=5)
+
         ctk.CTkButton(inventory_frame, text="Show All Inventory", command=self.show_all_inventory, 
                     width=200, fg_color="#2196F3", text_color="white", 
-                    font=("Helvetica", 12)).pack(pady=10)
+                    font=("Helvetica", 12)).pack(pady=(10, 5))
+
+        ctk.CTkButton(inventory_frame, text="All Sites Inventory", command=self.show_all_sites,
+                    width=200, fg_color="#2196F3", text_color="white",
+                    font=("Helvetica", 12)).pack(pady=(0, 10))
+
+        # Staged mode: queue inventory edits locally and commit them in one batch
+        staging_frame = ctk.CTkFrame(inventory_frame, fg_color="transparent")
+        staging_frame.pack(pady=(0, 10))
+
+        self.staging_switch = ctk.CTkSwitch(staging_frame, text="Stage changes", font=("Helvetica", 12))
+        self.staging_switch.pack(side="left", padx=5)
+
+        self.review_button = ctk.CTkButton(staging_frame, text="Review (0)", command=self.review_staged_changes,
+                                           width=90, fg_color="#607D8B", text_color="white",
+                                           font=("Helvetica", 12))
+        self.review_button.pack(side="left", padx=5)
 
         # User Management Frame
         user_frame = ctk.CTkFrame(left_column, fg_color="#222222", corner_radius=10)
@@ -109,6 +170,10 @@ class AdminPage:
                     width=200, fg_color="#F44336", text_color="white",
                     font=("Helvetica", 12)).pack(pady=5)
 
+        ctk.CTkButton(user_frame, text="Import Users", command=lambda: self.bulk_import("users"),
+                    width=200, fg_color="#3F51B5", text_color="white",
+                    font=("Helvetica", 12)).pack(pady=5)
+
         ctk.CTkButton(user_frame, text="Show All Users", command=self.show_all_users,
                     width=200, fg_color="#2196F3", text_color="white",
                     font=("Helvetica", 12)).pack(pady=5)
@@ -131,6 +196,44 @@ class AdminPage:
                     width=200, fg_color="#00BCD4", text_color="white",
                     font=("Helvetica", 12)).pack(pady=5)
 
+        ctk.CTkButton(requests_frame, text="Usage Analytics", command=self.show_usage_analytics,
+                    width=200, fg_color="#3F51B5", text_color="white",
+                    font=("Helvetica", 12)).pack(pady=5)
+
+        # Materials at or below their reorder point, kept live by the low-stock monitor
+        low_stock_frame = ctk.CTkFrame(right_column, fg_color="#222222", corner_radius=10)
+        low_stock_frame.pack(fill="both", expand=True, pady=(0, 10))
+        self.low_stock_label = ctk.CTkLabel(low_stock_frame, text="Below Threshold", font=("Helvetica", 18, 'bold'),
+                                            text_color="#4CAF50")
+        self.low_stock_label.pack(pady=10)
+
+        def make_alert_row(parent):
+            row_frame = ctk.CTkFrame(parent, corner_radius=5)
+            row_frame.labels = []
+            for width in (100, 60, 40):
+                label = ctk.CTkLabel(row_frame, text="", font=("Helvetica", 11),
+                                     text_color="#ffffff", width=width, anchor="w")
+                label.pack(side="left", padx=3)
+                row_frame.labels.append(label)
+            row_frame.update_btn = ctk.CTkButton(row_frame, text="Update", width=50, height=22,
+                                                 fg_color="#2196F3")
+            row_frame.update_btn.pack(side="right", padx=3)
+            return row_frame
+
+        def bind_alert_row(row_frame, alert, index):
+            row_frame.configure(fg_color="#04090a" if index % 2 == 0 else "#0a0f10")
+            name_label, stock_label, lead_label = row_frame.labels
+            name_label.configure(text=alert["name"])
+            stock_label.configure(text=f"{format_quantity(alert['quantity'])} / "
+                                       f"{format_quantity(alert['reorder_point'])}",
+                                  text_color="#F44336" if alert["quantity"] <= 0 else "#FF9800")
+            lead_label.configure(text=f"{format_quantity(alert['lead_time'])} d"
+                                 if alert["lead_time"] is not None else "")
+            row_frame.update_btn.configure(command=lambda: self.update_material_inline(alert["row"]))
+
+        self.low_stock_list = VirtualList(low_stock_frame, make_alert_row, bind_alert_row, row_height=30)
+        self.low_stock_list.pack(fill="both", expand=True, padx=10, pady=(0, 10))
+
         # System Frame
         system_frame = ctk.CTkFrame(right_column, fg_color="#222222", corner_radius=10)
         system_frame.pack(fill="both", expand=True)
@@ -142,50 +245,406 @@ class AdminPage:
                     fg_color="#795548", text_color="white",
                     font=("Helvetica", 12)).pack(pady=5)
 
+        ctk.CTkButton(system_frame, text="Manage Sites", command=self.manage_sites, width=200,
+                    fg_color="#795548", text_color="white",
+                    font=("Helvetica", 12)).pack(pady=5)
+
+        ctk.CTkButton(system_frame, text="Audit Log", command=self.show_audit_log, width=200,
+                    fg_color="#795548", text_color="white",
+                    font=("Helvetica", 12)).pack(pady=5)
+
+        # Footer with connection health and recent request latencies
+        footer_frame = ctk.CTkFrame(self.display, fg_color="#333333", corner_radius=0, height=30)
+        footer_frame.pack(fill="x", side="bottom")
+        footer_frame.pack_propagate(False)
+
+        self.health_label = ctk.CTkLabel(footer_frame, text="", font=("Helvetica", 11),
+                                         text_color="#888888")
+        self.health_label.pack(side="left", padx=10)
+
+    def watch_low_stock(self):
+        """Fill the Below Threshold panel, then keep syncing the inventory in the background"""
+        def sync_if_stale():
+            # An open inventory list keeps the cache fresh with its own syncs; the
+            # changes either of them pulls reach both through the cache listeners
+            if not inventory_cache.is_fresh():
+                inventory_cache.sync()
+
+        def synced(result):
+            if not self.low_stock_watched:
+                self.low_stock_watched = True
+                low_stock.add_listener(self.show_low_stock)
+            schedule()
+
+        def failed(e):
+            print(f"Error checking stock levels: {e}")
+            if not self.low_stock_watched:
+                self.low_stock_list.show_message(f"Error: {e}", text_color="#F44336")
+            schedule()
+
+        def sync():
+            with action("inventory.sync"):
+                sheets_executor.submit(sync_if_stale, on_success=synced, on_error=failed)
+
+        def schedule():
+            self.display.after(LOW_STOCK_INTERVAL, sync)
+
+        self.low_stock_watched = False
+        self.low_stock_list.show_message("Checking stock levels...")
+        sync()
+
+    def show_low_stock(self, alerts):
+        self.low_stock_label.configure(text=f"Below Threshold ({len(alerts)})" if alerts else "Below Threshold",
+                                       text_color="#F44336" if alerts else "#4CAF50")
+        self.low_stock_list.set_rows(alerts, empty_text="All materials are above their reorder point")
+
+    @staticmethod
+    def probe():
+        """Checks the connection when there has been no other traffic for a while"""
+        if config.get_inventory_sheet_id():
+            get_backend().probe(config.get_inventory_sheet_id())
+
+    def show_health(self, status):
+        text, color = describe(status)
+        self.health_label.configure(text=text, text_color=color)
+        connected = status["state"] in ("connected", "degraded")
+        # Back online: send the changes queued while offline
+        if connected and not self.connected and local_store.pending_count():
+            self.sync_offline_changes()
+        self.connected = connected
+
     def logout(self):
         self.display.destroy()
         LoginPage()
 
+    @traced_action("admin.switch_site")
+    def switch_site(self, site):
+        """Work on the inventory of another site: edits, the low-stock panel and request fulfilment follow it"""
+        if site == config.get_active_site():
+            return
+        if len(self.staged):
+            self.site_var.set(config.get_active_site())
+            show_error("Error", "Commit or discard the staged changes before switching sites")
+            return
+
+        def switched(sheet):
+            self.refresh_inventory_window()
+            show_info("Success", f"Now working on the inventory of {site}")
+
+        def failed(e):
+            self.site_var.set(config.get_active_site())
+            show_error("Error", f"Could not switch to {site}: {e}")
+
+        # Queued behind the writes already made on the current site
+        sheets_executor.submit(site_inventories.switch_site, config, site, write=True,
+                               on_success=switched, on_error=failed)
+
+    @traced_action("admin.show_all_sites")
+    def show_all_sites(self):
+        CrossSiteWindow(self.display, config)
+
+    def manage_sites(self):
+        """Add, re-point or remove the sites (each with its own inventory spreadsheet)"""
+        top = ctk.CTkToplevel(self.display)
+        top.title("Manage Sites")
+        top.geometry("520x460")
+        top.grab_set()
+
+        ctk.CTkLabel(top, text="Sites", font=("Helvetica", 18, 'bold'),
+                     text_color="#4CAF50").pack(pady=10)
+
+        sites_box = ctk.CTkTextbox(top, height=180, font=("Courier", 12), wrap="none")
+        sites_box.pack(fill="x", padx=10)
+
+        def show_sites():
+            lines = [f"{'●' if site == config.get_active_site() else ' '} {site[:20]:20} "
+                     f"{config.get_site_inventory_id(site)}" for site in config.get_sites()]
+            sites_box.configure(state="normal")
+            sites_box.delete("1.0", "end")
+            sites_box.insert("1.0", "\n".join(lines))
+            sites_box.configure(state="disabled")
+            self.site_menu.configure(values=config.get_sites())
+
+        ctk.CTkLabel(top, text="Site name:", font=("Helvetica", 12)).pack(pady=(10, 0))
+        name_entry = ctk.CTkEntry(top, width=300)
+        name_entry.pack(pady=5)
+        ctk.CTkLabel(top, text="Inventory spreadsheet URL or ID:", font=("Helvetica", 12)).pack()
+        sheet_entry = ctk.CTkEntry(top, width=300)
+        sheet_entry.pack(pady=5)
+
+        @traced_action("admin.save_site")
+        def save():
+            site = name_entry.get().strip()
+            value = sheet_entry.get().strip()
+            if not site or not value:
+                show_error("Error", "Please enter a site name and its inventory spreadsheet")
+                return
+            sheet_id = sheet_id_from_url(value)
+
+            def saved(sheet):
+                config.save_site(site, sheet_id, value if "/d/" in value else "")
+                if site == config.get_active_site():
+                    inventory_cache.set_sheet(sheet)
+                    self.refresh_inventory_window()
+                show_sites()
+                show_info("Success", f"Site {site} saved")
+
+            # Only sites whose inventory can be opened are kept
+            sheets_executor.submit(get_backend().get_worksheet, sheet_id, on_success=saved,
+                                   on_error=lambda e: show_error("Error", f"Cannot open the inventory of {site}: {e}"))
+
+        def remove():
+            site = name_entry.get().strip()
+            if site not in config.get_sites():
+                show_error("Error", "Enter the name of an existing site")
+                return
+            if not askyesno("Confirm", f"Remove the site {site}? Its spreadsheet is left as it is."):
+                return
+            try:
+                config.remove_site(site)
+            except ValueError as e:
+                show_error("Error", str(e))
+                return
+            show_sites()
+
+        button_frame = ctk.CTkFrame(top, fg_color="transparent")
+        button_frame.pack(pady=10)
+        ctk.CTkButton(button_frame, text="Save Site", command=save, width=120,
+                      fg_color="#4CAF50").pack(side="left", padx=5)
+        ctk.CTkButton(button_frame, text="Remove Site", command=remove, width=120,
+                      fg_color="#F44336").pack(side="left", padx=5)
+        ctk.CTkButton(button_frame, text="Close", command=top.destroy, width=120).pack(side="left", padx=5)
+        show_sites()
+
+    def update_busy_indicator(self, pending):
+        """Show how many Google Sheets calls are still running"""
+        self.busy_label.configure(text=f"⟳ Syncing ({pending})" if pending else "")
+
+    def show_write_error(self, error):
+        if isinstance(error, LookupError):
+            show_error("Error", str(error))
+        else:
+            show_error("Error", f"An error occurred: {error}")
+
+    @traced_action("admin.show_audit_log")
+    def show_audit_log(self):
+        """Every recorded change to users and materials, newest first, with who made it"""
+        top = ctk.CTkToplevel(self.display)
+        top.title("Audit Log")
+        top.geometry("1000x600")
+        top.grab_set()
+
+        ctk.CTkLabel(top, text="Audit Log", font=("Helvetica", 18, 'bold'),
+                     text_color="#4CAF50").pack(pady=10)
+
+        controls_frame = ctk.CTkFrame(top, fg_color="transparent")
+        controls_frame.pack(pady=5)
+
+        search_var = ctk.StringVar()
+        search_entry = ctk.CTkEntry(controls_frame, textvariable=search_var,
+                                    placeholder_text="🔍 Search actor, material, email or date", width=300)
+        search_entry.pack(side="left", padx=5)
+
+        kinds = {"All changes": "", "Inventory": "inventory.", "Users": "user.", "Requests": "request."}
+        kind_var = ctk.StringVar(value="All changes")
+        ctk.CTkOptionMenu(controls_frame, values=list(kinds), variable=kind_var, width=120,
+                          command=lambda choice: run_search(now=True)).pack(side="left", padx=5)
+
+        ctk.CTkButton(controls_frame, text="Refresh", command=lambda: load(force=True), width=90,
+                      fg_color="#2196F3", text_color="white").pack(side="left", padx=5)
+        ctk.CTkButton(controls_frame, text="Write Now", command=lambda: load(flush=True), width=90,
+                      fg_color="#009688", text_color="white").pack(side="left", padx=5)
+
+        columns = (("Time", 140), ("Actor", 170), ("Action", 120), ("Site", 70), ("Target", 150), ("Change", 280))
+        header_frame = ctk.CTkFrame(top, fg_color="#333333", height=40)
+        header_frame.pack(fill="x", padx=10, pady=(10, 0))
+        for text, width in columns:
+            ctk.CTkLabel(header_frame, text=text, font=("Helvetica", 12, "bold"),
+                         text_color="#ffffff", width=width).pack(side="left", padx=5)
+
+        def make_row(parent):
+            row_frame = ctk.CTkFrame(parent, corner_radius=5)
+            row_frame.labels = []
+            for text, width in columns:
+                label = ctk.CTkLabel(row_frame, text="", font=("Helvetica", 12), text_color="#ffffff",
+                                     width=width, anchor="w")
+                label.pack(side="left", padx=5)
+                row_frame.labels.append(label)
+            return row_frame
+
+        def bind_row(row_frame, entry, index):
+            row_frame.configure(fg_color="#04090a" if index % 2 == 0 else "#0a0f10")
+            for label, value in zip(row_frame.labels, entry[:TARGET_COLUMN + 1] + [describe_change(entry)]):
+                label.configure(text=value)
+
+        entries_list = VirtualList(top, make_row, bind_row, row_height=36)
+        entries_list.pack(fill="both", expand=True, padx=10, pady=(10, 0))
+
+        summary_label = ctk.CTkLabel(top, text="", font=("Helvetica", 11), text_color="#888888")
+        summary_label.pack(pady=5)
+
+        def render(entries):
+            entries_list.set_rows(entries, empty_text="No changes recorded" if not search.rows
+                                  else "No matching changes")
+
+        search = SearchController(top, render, text_func=lambda entry: " ".join(entry[:TARGET_COLUMN + 1]))
+
+        def run_search(now=False):
+            prefix = kinds[kind_var.get()]
+            predicate = (lambda entry: entry[ACTION_COLUMN].startswith(prefix)) if prefix else None
+            if now:
+                search.run_now(search_var.get(), predicate)
+            else:
+                search.schedule(search_var.get(), predicate)
+
+        def read(force, flush):
+            written = audit_log.flush() if flush else 0
+            return audit_log.entries(force=force or bool(written)), audit_log.pending()
+
+        def loaded(result):
+            if not top.winfo_exists():
+                return
+            entries, pending = result
+            summary_label.configure(text=f"{len(entries)} changes · {pending} waiting to be written to the "
+                                         f"audit sheet" if pending else f"{len(entries)} changes")
+            search.set_rows(entries)
+            run_search(now=True)
+
+        def failed(e):
+            if top.winfo_exists():
+                entries_list.show_message(f"Error: {e}", text_color="#F44336")
+
+        def load(force=False, flush=False):
+            entries_list.show_message("Reading the audit log...")
+            sheets_executor.submit(read, force, flush, on_success=loaded, on_error=failed)
+
+        search_entry.bind("<KeyRelease>", lambda event: run_search())
+        load()
+
+    @traced_action("admin.modify_credentials")
     def modify_credentials(self, email, password, role="user", remove=False):
-        try:
+        def write():
             if remove:
-                cell = credentials_sheet.find(email)
-                if cell:
-                    credentials_sheet.delete_row(cell.row)
-                    show_info("Success", "User removed successfully!")
-                else:
-                    show_error("Error", "User not found!")
-            else:
-                credentials_sheet.append_row([role, email, password])
-                show_info("Success", "User added successfully!")
-        except Exception as e:
-            show_error("Error", f"An error occurred: {e}")
+                row_index = credentials_cache.find_row(email)
+                if not row_index:
+                    raise LookupError("User not found!")
+                before = credentials_cache.row_values(row_index)
+                credentials_cache.delete_row(row_index)
+                audit_log.record("user.remove", email, before=fields(before, CREDENTIAL_FIELDS))
+                return "User removed successfully!"
+            credentials_cache.append_row([role, email, hash_password(password)])
+            audit_log.record("user.add", email, after=fields([role, email], CREDENTIAL_FIELDS))
+            return "User added successfully!"
+
+        sheets_executor.submit(write, write=True,
+                               on_success=lambda message: show_info("Success", message),
+                               on_error=self.show_write_error)
+
+    @traced_action("admin.modify_inventory")
+    def modify_inventory(self, name, quantity=None, remove=False, reorder_point="", lead_time=""):
+        """Add, update or remove a material; an empty reorder point or lead time is left as it is"""
+        def write():
+            # Local name -> row lookup instead of a server-side find
+            row_index = inventory_cache.find_row(name)
 
-    def modify_inventory(self, name, quantity=None, remove=False):
-        try:
             if remove:
-                cell = inventory_sheet.find(name)
-                if cell:
-                    inventory_sheet.delete_row(cell.row)
-                    show_info("Success", "Material removed successfully!")
-                else:
-                    show_error("Error", "Material not found!")
+                if not row_index:
+                    raise LookupError("Material not found!")
+                before = inventory_cache.row_values(row_index)
+                inventory_cache.delete_row(row_index)
+                self.audit_inventory("inventory.remove", name, before=before)
+                return "Material removed successfully!"
+
+            reorder = [(column, value) for column, value in ((3, reorder_point), (4, lead_time)) if value]
+            if not quantity and not reorder:
+                return None
+            if reorder:
+                add_reorder_header(inventory_cache)
+            if row_index:
+                before = inventory_cache.row_values(row_index)
+                if quantity:
+                    inventory_cache.update_cell(row_index, 2, quantity)
+                for column, value in reorder:
+                    inventory_cache.update_cell(row_index, column, value)
+                self.audit_inventory("inventory.update", name, before, inventory_cache.row_values(row_index),
+                                     columns=([2] if quantity else []) + [column for column, value in reorder])
+                return "Material updated successfully!"
+            if not quantity:
+                raise LookupError("Material not found!")
+            values = [name, quantity, reorder_point, lead_time]
+            while not values[-1]:
+                values.pop()
+            inventory_cache.append_row(values)
+            self.audit_inventory("inventory.add", name, after=values)
+            return "Material added successfully!"
+
+        def done(message):
+            if message:
+                show_info("Success", message)
+
+        if not remove:
+            # Numbers are written the same way every time
+            try:
+                quantity = checked_number("Quantity", quantity or "")
+                reorder_point = checked_number("Reorder point", reorder_point, minimum=0)
+                lead_time = checked_number("Lead time", lead_time, minimum=0)
+            except ValueError as e:
+                show_error("Error", str(e))
+                return
+        sheets_executor.submit(write, write=True, on_success=done, on_error=self.show_write_error)
+
+    @staticmethod
+    def audit_inventory(action_name, name, before=None, after=None, columns=None):
+        """Journal a change to an inventory row (before and after are the row, columns the 1-based ones changed)"""
+        audit_log.record(action_name, name,
+                         before=fields(before, INVENTORY_FIELDS, columns) if before is not None else None,
+                         after=fields(after, INVENTORY_FIELDS, columns) if after is not None else None,
+                         site=config.get_active_site())
+
+    def audit_staged(self, entries):
+        """Journal the staged changes a batch committed"""
+        for entry in entries:
+            if entry["error"] is not None:
+                continue
+            old, new = [entry["name"], entry["old"]], [entry["name"], entry["new"]]
+            if entry["action"] == "add":
+                self.audit_inventory("inventory.add", entry["name"], after=new)
+            elif entry["action"] == "update":
+                self.audit_inventory("inventory.update", entry["name"], old, new, columns=[2])
             else:
-                cell = inventory_sheet.find(name)
-                if cell:
-                    if quantity:
-                        inventory_sheet.update_cell(cell.row, 2, quantity)
-                        show_info("Success", "Material updated successfully!")
-                else:
-                    if quantity:
-                        inventory_sheet.append_row([name, quantity])
-                        show_info("Success", "Material added successfully!")
-        except gspread.exceptions.CellNotFound:
-            if not remove:
-                inventory_sheet.append_row([name, quantity])
-                show_info("Success", "Material added successfully!")
-        except Exception as e:
-            show_error("Error", f"An error occurred: {e}")
+                self.audit_inventory("inventory.remove", entry["name"], before=old)
+
+    @staticmethod
+    def audit_import(kind, plan):
+        """Journal the rows an import added or updated (a new password is noted, never its value)"""
+        titles = INVENTORY_FIELDS if kind == "inventory" else CREDENTIAL_FIELDS + ("Password",)
+        for entry in plan["entries"]:
+            if entry.get("status") != "Imported":
+                continue
+            before, after = {}, {}
+            for column, (old, new) in sorted(entry["changes"].items()):
+                if titles[column] == "Password":
+                    old, new = "", "changed"
+                before[titles[column]], after[titles[column]] = old, new
+            audit_log.record(f"{'inventory' if kind == 'inventory' else 'user'}.import", entry["key"],
+                             before=before if entry["action"] == "update" else None, after=after,
+                             site=config.get_active_site() if kind == "inventory" else "")
+
+    def audit_fulfilment(self, plan):
+        """Journal the stock a fulfilment batch used and the status it gave each request"""
+        if not plan["applied"]:
+            return
+        for item in plan["stock"].values():
+            self.audit_inventory("inventory.fulfil", item["name"], [item["name"], item["old"]],
+                                 [item["name"], item["new"]], columns=[2])
+        for entry in plan["entries"]:
+            source = entry["source"]
+            status = source[STATUS_COLUMN - 1] if len(source) >= STATUS_COLUMN and source[STATUS_COLUMN - 1] \
+                else "pending"
+            audit_log.record(f"request.{entry['status']}", f"{entry['email']}: {entry['material']}",
+                             before={"Status": status, "Requested": entry["requested"]},
+                             after={"Status": entry["status"], "Fulfilled": format_quantity(entry["granted"])},
+                             site=config.get_active_site())
 
     def add_user(self):
         self.manage_users("add")
@@ -241,7 +700,7 @@ class AdminPage:
     def manage_inventory(self, action):
         top = ctk.CTkToplevel(self.display)
         top.title("Manage Inventory")
-        top.geometry("400x300")
+        top.geometry("400x460" if action != "remove" else "400x300")
 
         ctk.CTkLabel(top, text="Material Name:", font=("Helvetica", 12)).pack(pady=10)
         name_entry = ctk.CTkEntry(top, width=200, font=("Helvetica", 12))
@@ -251,13 +710,27 @@ class AdminPage:
         quantity_entry = ctk.CTkEntry(top, width=200, font=("Helvetica", 12))
         quantity_entry.pack(pady=5)
 
+        if action != "remove":
+            ctk.CTkLabel(top, text="Reorder Point (optional):", font=("Helvetica", 12)).pack(pady=10)
+            reorder_entry = ctk.CTkEntry(top, width=200, font=("Helvetica", 12))
+            reorder_entry.pack(pady=5)
+
+            ctk.CTkLabel(top, text="Lead Time in Days (optional):", font=("Helvetica", 12)).pack(pady=10)
+            lead_time_entry = ctk.CTkEntry(top, width=200, font=("Helvetica", 12))
+            lead_time_entry.pack(pady=5)
+
         def save_inventory():
             name = name_entry.get()
             quantity = quantity_entry.get()
-            if action == "add":
-                self.modify_inventory(name, quantity)
-            elif action == "update":
-                self.modify_inventory(name, quantity)
+            reorder_point = reorder_entry.get().strip() if action != "remove" else ""
+            lead_time = lead_time_entry.get().strip() if action != "remove" else ""
+            if self.staging_enabled():
+                if reorder_point or lead_time:
+                    show_error("Error", "Reorder points are not staged; turn off Stage changes to set them.")
+                    return
+                self.stage_inventory_change(name, quantity, remove=(action == "remove"))
+            elif action in ("add", "update"):
+                self.modify_inventory(name, quantity, reorder_point=reorder_point, lead_time=lead_time)
             elif action == "remove":
                 self.modify_inventory(name, remove=True)
             top.destroy()
@@ -265,6 +738,291 @@ class AdminPage:
         ctk.CTkButton(top, text="Submit", command=save_inventory, width=200, fg_color="#4CAF50", text_color="white",
                       font=("Helvetica", 12)).pack(pady=20)
 
+    def staging_enabled(self):
+        return self.staging_switch.get() == 1
+
+    def stage_inventory_change(self, name, quantity=None, remove=False):
+        """Queue an inventory change instead of writing it to the sheet"""
+        self.staged.stage(name, quantity, remove=remove)
+        self.review_button.configure(text=f"Review ({len(self.staged)})")
+
+    @traced_action("admin.review_staged_changes")
+    def review_staged_changes(self):
+        """Show the staged inventory changes against the sheet and commit them in one batch"""
+        if not len(self.staged):
+            show_info("Staged Changes", "There are no staged changes to review.")
+            return
+
+        top = ctk.CTkToplevel(self.display)
+        top.title("Staged Changes")
+        top.geometry("700x500")
+        top.grab_set()
+
+        title_label = ctk.CTkLabel(top, text=f"{len(self.staged)} Staged Changes", font=("Helvetica", 18, 'bold'),
+                                   text_color="#4CAF50")
+        title_label.pack(pady=10)
+
+        # Table header
+        header_frame = ctk.CTkFrame(top, fg_color="#333333", height=40)
+        header_frame.pack(fill="x", padx=10, pady=(10, 0))
+
+        for text, width in (("Action", 80), ("Material", 220), ("Quantity", 120), ("Status", 200)):
+            ctk.CTkLabel(header_frame, text=text, font=("Helvetica", 12, "bold"),
+                        text_color="#ffffff", width=width).pack(side="left", padx=5)
+
+        action_colors = {"add": "#4CAF50", "update": "#FF9800", "remove": "#F44336"}
+
+        def make_row(parent):
+            row_frame = ctk.CTkFrame(parent, corner_radius=5)
+            row_frame.labels = []
+            for width in (80, 220, 120, 200):
+                label = ctk.CTkLabel(row_frame, text="", font=("Helvetica", 12),
+                                     text_color="#ffffff", width=width, anchor="w")
+                label.pack(side="left", padx=5)
+                row_frame.labels.append(label)
+            return row_frame
+
+        def bind_row(row_frame, entry, index):
+            row_frame.configure(fg_color="#04090a" if index % 2 == 0 else "#0a0f10")
+            action_label, name_label, qty_label, status_label = row_frame.labels
+            action_label.configure(text=entry["action"].capitalize(),
+                                   text_color=action_colors[entry["action"]])
+            name_label.configure(text=entry["name"])
+            if entry["action"] == "remove":
+                qty_label.configure(text=entry["old"])
+            elif entry["action"] == "update":
+                qty_label.configure(text=f"{entry['old']} → {entry['new']}")
+            else:
+                qty_label.configure(text=entry["new"])
+            status_label.configure(text=entry["error"] or entry.get("status", "Ready"),
+                                   text_color="#F44336" if entry["error"] else "#ffffff")
+
+        changes_list = VirtualList(top, make_row, bind_row, row_height=36)
+        changes_list.pack(fill="both", expand=True, padx=10, pady=10)
+
+        def show_diff(entries):
+            if top.winfo_exists():
+                changes_list.set_rows(entries, empty_text="There are no staged changes")
+
+        def failed(e):
+            if top.winfo_exists():
+                changes_list.show_message(f"Error: {e}", text_color="#F44336")
+
+        def load_diff():
+            changes_list.show_message("Comparing with the sheet...")
+            sheets_executor.submit(lambda: self.staged.diff(inventory_cache.get_all_values()),
+                                   on_success=show_diff, on_error=failed)
+
+        def commit():
+            if local_store.pending_count():
+                # The rows read below would include the queued writes, and their row numbers with them
+                raise RuntimeError("Sync the changes made offline before committing")
+            # Re-read the sheet so the row numbers in the batch are current
+            rows = inventory_cache.get_all_values(force=True)
+            entries = self.staged.commit(inventory_cache.sheet, rows)
+            self.audit_staged(entries)
+            # Read the result back so the low-stock monitor sees the batch too
+            try:
+                inventory_cache.get_all_values(force=True)
+            except Exception as e:
+                print(f"Error reloading the inventory: {e}")
+                inventory_cache.invalidate()
+            return entries
+
+        def committed(entries):
+            self.review_button.configure(text=f"Review ({len(self.staged)})")
+            for entry in entries:
+                if entry["error"] is None:
+                    entry["status"] = "Committed"
+            applied = sum(1 for entry in entries if entry["error"] is None)
+            if top.winfo_exists():
+                title_label.configure(text=f"{applied} of {len(entries)} Changes Committed")
+                changes_list.set_rows(entries)
+            if applied == len(entries):
+                show_info("Success", f"{applied} changes committed in one batch!")
+            else:
+                show_error("Error", f"{len(entries) - applied} of {len(entries)} changes failed "
+                                    "and are still staged. See the list for details.")
+            self.refresh_inventory_window()
+
+        @traced_action("admin.commit_staged_changes")
+        def start_commit():
+            changes_list.show_message("Committing changes...")
+            sheets_executor.submit(commit, write=True, on_success=committed, on_error=failed)
+
+        def discard_all():
+            if askyesno("Discard Changes", "Discard all staged changes?"):
+                self.staged.clear()
+                self.review_button.configure(text="Review (0)")
+                top.destroy()
+
+        button_frame = ctk.CTkFrame(top, fg_color="transparent")
+        button_frame.pack(fill="x", padx=10, pady=(0, 10))
+
+        ctk.CTkButton(button_frame, text="Close", command=top.destroy, width=100,
+                      fg_color="#555555", text_color="white").pack(side="left", padx=5)
+        ctk.CTkButton(button_frame, text="Discard All", command=discard_all, width=100,
+                      fg_color="#F44336", text_color="white").pack(side="left", padx=5)
+        ctk.CTkButton(button_frame, text="Commit", command=start_commit, width=100,
+                      fg_color="#4CAF50", text_color="white").pack(side="right", padx=5)
+
+        load_diff()
+
+    @traced_action("admin.bulk_import")
+    def bulk_import(self, kind):
+        """Import materials or users from a CSV or XLSX file: a dry run first, then a few batch writes"""
+        import os
+        from tkinter import filedialog
+
+        noun = "Materials" if kind == "inventory" else "Users"
+        file_path = filedialog.askopenfilename(
+            parent=self.display, title=f"Import {noun}",
+            filetypes=[("CSV or Excel", "*.csv *.xlsx"), ("All files", "*.*")]
+        )
+        if not file_path:
+            return
+        cache = inventory_cache if kind == "inventory" else credentials_cache
+        column_names = ({1: "Qty", 2: "Reorder", 3: "Lead"} if kind == "inventory"
+                        else {0: "Role", 2: "Password"})
+
+        top = ctk.CTkToplevel(self.display)
+        top.title("Import Preview")
+        top.geometry("850x550")
+        top.grab_set()
+
+        title_label = ctk.CTkLabel(top, text=f"Import {noun} from {os.path.basename(file_path)}",
+                                   font=("Helvetica", 18, 'bold'), text_color="#4CAF50")
+        title_label.pack(pady=10)
+
+        if kind == "inventory":
+            add_switch = ctk.CTkSwitch(top, text="Add quantities to the current stock", font=("Helvetica", 12),
+                                       command=lambda: load_plan())
+            add_switch.pack(pady=5)
+
+        # Table header
+        header_frame = ctk.CTkFrame(top, fg_color="#333333", height=40)
+        header_frame.pack(fill="x", padx=10, pady=(10, 0))
+
+        widths = (50, 80, 200, 280, 170)
+        for text, width in zip(("Line", "Action", "Material" if kind == "inventory" else "Email", "Changes",
+                                "Status"), widths):
+            ctk.CTkLabel(header_frame, text=text, font=("Helvetica", 12, "bold"),
+                        text_color="#ffffff", width=width).pack(side="left", padx=5)
+
+        action_colors = {"add": "#4CAF50", "update": "#FF9800", "unchanged": "#888888", "error": "#F44336"}
+
+        def make_row(parent):
+            row_frame = ctk.CTkFrame(parent, corner_radius=5)
+            row_frame.labels = []
+            for width in widths:
+                label = ctk.CTkLabel(row_frame, text="", font=("Helvetica", 12),
+                                     text_color="#ffffff", width=width, anchor="w")
+                label.pack(side="left", padx=5)
+                row_frame.labels.append(label)
+            return row_frame
+
+        def describe_changes(entry):
+            parts = []
+            for column, (old, new) in sorted(entry["changes"].items()):
+                if column not in column_names:
+                    continue
+                if column_names[column] == "Password":
+                    parts.append("Password set")
+                else:
+                    parts.append(f"{column_names[column]} {old} → {new}" if old else f"{column_names[column]} {new}")
+            return ", ".join(parts)
+
+        def bind_row(row_frame, entry, index):
+            row_frame.configure(fg_color="#04090a" if index % 2 == 0 else "#0a0f10")
+            line_label, action_label, key_label, changes_label, status_label = row_frame.labels
+            line_label.configure(text=str(entry["line"]))
+            action_label.configure(text=entry["action"].capitalize(), text_color=action_colors[entry["action"]])
+            key_label.configure(text=entry["key"])
+            changes_label.configure(text=describe_changes(entry))
+            status_label.configure(text=entry["error"] or entry.get("status", ""),
+                                   text_color="#F44336" if entry["error"] else "#ffffff")
+
+        entries_list = VirtualList(top, make_row, bind_row, row_height=36)
+        entries_list.pack(fill="both", expand=True, padx=10, pady=10)
+
+        summary_label = ctk.CTkLabel(top, text="", font=("Helvetica", 12), text_color="#888888")
+        summary_label.pack(pady=(0, 5))
+
+        importer = {"current": None}
+
+        def dry_run(current):
+            current.read()
+            return current.plan(cache, force=True)
+
+        def summarize(plan):
+            counts = plan["counts"]
+            return (f"{counts['add']} to add, {counts['update']} to update, {counts['unchanged']} unchanged, "
+                    f"{counts['error']} with errors")
+
+        def show_plan(plan):
+            if not top.winfo_exists():
+                return
+            summary_label.configure(text=f"Dry run: {summarize(plan)}")
+            entries_list.set_rows(plan["entries"], empty_text="The file has no rows to import")
+            if plan["counts"]["add"] or plan["counts"]["update"]:
+                import_button.configure(state="normal")
+
+        def failed(e):
+            if top.winfo_exists():
+                entries_list.show_message(f"Error: {e}", text_color="#F44336")
+
+        def load_plan():
+            importer["current"] = BulkImport(kind, file_path,
+                                             add_quantities=kind == "inventory" and add_switch.get() == 1)
+            import_button.configure(state="disabled")
+            entries_list.show_message("Checking the file against the sheet...")
+            sheets_executor.submit(dry_run, importer["current"], on_success=show_plan, on_error=failed)
+
+        def imported(plan):
+            failures = sum(1 for entry in plan["entries"] if entry.get("status") != "Imported"
+                           and entry["action"] in ("add", "update"))
+            if top.winfo_exists():
+                title_label.configure(text=f"{plan['written']} {noun} Imported")
+                summary_label.configure(text=summarize(plan))
+                entries_list.set_rows(plan["entries"])
+            if failures:
+                show_error("Error", f"{plan['written']} rows were imported, {failures} failed. "
+                                    "See the list for details.")
+            else:
+                show_info("Success", f"{plan['written']} rows imported in "
+                                     f"{-(-plan['written'] // CHUNK_ROWS)} batch(es)!")
+            if kind == "inventory":
+                self.refresh_inventory_window()
+
+        def import_failed(e):
+            show_error("Error", f"Import failed: {e}")
+            if top.winfo_exists():
+                load_plan()
+
+        @traced_action("admin.apply_import")
+        def run_import(current):
+            plan = current.apply(cache)
+            self.audit_import(current.kind, plan)
+            return plan
+
+        def start_import():
+            import_button.configure(state="disabled")
+            entries_list.show_message("Importing...")
+            sheets_executor.submit(run_import, importer["current"], write=True,
+                                   on_success=imported, on_error=import_failed)
+
+        button_frame = ctk.CTkFrame(top, fg_color="transparent")
+        button_frame.pack(fill="x", padx=10, pady=(0, 10))
+
+        ctk.CTkButton(button_frame, text="Close", command=top.destroy, width=100,
+                      fg_color="#555555", text_color="white").pack(side="left", padx=5)
+        import_button = ctk.CTkButton(button_frame, text="Import", command=start_import, width=100,
+                                      state="disabled", fg_color="#4CAF50", text_color="white")
+        import_button.pack(side="right", padx=5)
+
+        load_plan()
+
+    @traced_action("admin.show_all_inventory")
     def show_all_inventory(self):
         top = ctk.CTkToplevel(self.display)
         top.title("All Inventory")
@@ -279,13 +1037,18 @@ class AdminPage:
 
         search_var = ctk.StringVar()
         search_entry = ctk.CTkEntry(
-            search_frame, textvariable=search_var, placeholder_text="🔍 Search Inventory", width=300
+            search_frame, textvariable=search_var, placeholder_text="🔍 Search Inventory, e.g. bolt qty < 10",
+            width=300
         )
         search_entry.pack(side="left", padx=5)
 
+        sort_var = ctk.StringVar(value=SORT_ORDERS[0])
+        ctk.CTkOptionMenu(search_frame, values=list(SORT_ORDERS), variable=sort_var, width=130,
+                          command=lambda choice: run_search(now=True)).pack(side="left", padx=5)
+
         # Add export button
         ctk.CTkButton(search_frame, text="Export CSV", 
-                     command=lambda: self.export_data(inventory_sheet, "inventory"),
+                     command=lambda: self.export_data(inventory_cache.sheet, "inventory", transform=normalize_row),
                      width=100, height=30, 
                      fg_color="#009688", text_color="white").pack(side="right", padx=5)
 
@@ -298,64 +1061,108 @@ class AdminPage:
         ctk.CTkLabel(header_frame, text="Quantity", font=("Helvetica", 12, "bold"),
                     text_color="#ffffff", width=100).pack(side="right", padx=10)
 
-        # Scrollable inventory list
-        frame = ctk.CTkScrollableFrame(top, fg_color="#16191a")
-        frame.pack(fill="both", expand=True, padx=10, pady=10)
+        # Virtualized inventory list: only the visible rows exist as widgets
+        def make_row(parent):
+            item_frame = ctk.CTkFrame(parent, corner_radius=5)
+
+            # Left side with name
+            item_frame.name_label = ctk.CTkLabel(item_frame, text="", font=("Helvetica", 12),
+                                                 text_color="#ffffff", width=300, anchor="w")
+            item_frame.name_label.pack(side="left", padx=(20, 0))
+
+            # Right side with buttons and quantity
+            right_frame = ctk.CTkFrame(item_frame, fg_color="transparent")
+            right_frame.pack(side="right", padx=(0, 20))
+
+            # Update button
+            item_frame.update_btn = ctk.CTkButton(right_frame, text="Update", width=70, height=25,
+                                                  fg_color="#2196F3")
+            item_frame.update_btn.pack(side="left", padx=5)
+
+            # Remove button
+            item_frame.remove_btn = ctk.CTkButton(right_frame, text="Remove", width=70, height=25,
+                                                  fg_color="#F44336")
+            item_frame.remove_btn.pack(side="left", padx=5)
+
+            # Quantity
+            item_frame.qty_label = ctk.CTkLabel(right_frame, text="", font=("Helvetica", 12),
+                                                text_color="#ffffff", width=50)
+            item_frame.qty_label.pack(side="left", padx=5)
+            return item_frame
+
+        def bind_row(item_frame, index, position):
+            current = table["current"]
+            row_index = current.sheet_row(index)  # Sheet rows are 1-indexed
+            item_frame.configure(fg_color="#04090a" if row_index % 2 == 1 else "#0a0f10")
+            item_frame.name_label.configure(text=current.names[index])
+            item_frame.qty_label.configure(text=current.texts[index],
+                                           text_color="#F44336" if current.is_low(index) else "#ffffff")
+            item_frame.update_btn.configure(command=lambda: self.update_material_inline(row_index))
+            item_frame.remove_btn.configure(command=lambda: self.remove_material_inline(row_index))
+            # Row index for edit reference
+            item_frame.rowindex = row_index
+
+        inventory_list = VirtualList(top, make_row, bind_row, row_height=44)
+        inventory_list.pack(fill="both", expand=True, padx=10, pady=(10, 0))
+
+        summary_label = ctk.CTkLabel(top, text="", font=("Helvetica", 11), text_color="#888888")
+        summary_label.pack(pady=5)
+
+        # The rows are parsed into columns once; search items are positions in the table
+        table = {"current": InventoryTable()}
+
+        def render(indexes):
+            current = table["current"]
+            indexes = current.sort(indexes, sort_var.get())
+            summary_label.configure(text=current.summary(indexes))
+            inventory_list.set_rows(indexes, empty_text="No inventory found" if not search.rows
+                                    else "No matching materials")
+
+        # Searches run against the rows loaded below, never against the sheet
+        search = SearchController(top, render, text_func=lambda index: table["current"].names[index])
+
+        def run_search(now=False):
+            text, conditions = split_query(search_var.get())
+            predicate = table["current"].where(conditions)
+            if now:
+                search.run_now(text, predicate)
+            else:
+                search.schedule(text, predicate)
 
-        def update_inventory():
-            for widget in frame.winfo_children():
-                widget.destroy()
+        def loaded(rows):
+            if not top.winfo_exists():
+                return
+            table["current"] = InventoryTable.from_rows(rows)
+            search.set_rows(range(len(table["current"])))
+            run_search(now=True)
+
+        def patch(changes):
+            patched = table["current"].patch(changes)
+            if patched is None:
+                # A row gained or lost its quantity column: rebuild from the synced cache
+                loaded(inventory_cache.get_all_values())
+                return
+            updated, appended = patched
+            for index in updated:
+                search.update_row(index, index)
+            for index in appended:
+                search.append_row(index)
 
-            search_text = search_var.get().lower()
-            try:
-                rows = inventory_sheet.get_all_values()
-                if not rows:
-                    ctk.CTkLabel(frame, text="No inventory found", font=("Helvetica", 12), text_color="#888").pack(
-                        pady=10)
-                else:
-                    for i, row in enumerate(rows):
-                        if len(row) >= 2:  # Make sure row has at least 2 elements
-                            name, qty = row[0], row[1]
-                            if search_text in name.lower():
-                                row_color = "#04090a" if i % 2 == 0 else "#0a0f10"
-                                item_frame = ctk.CTkFrame(frame, fg_color=row_color, corner_radius=5, height=40)
-                                item_frame.pack(fill="x", pady=2, padx=5)
-                                item_frame.pack_propagate(False)
-
-                                # Left side with name
-                                name_label = ctk.CTkLabel(item_frame, text=name, font=("Helvetica", 12),
-                                                      text_color="#ffffff", width=300, anchor="w")
-                                name_label.pack(side="left", padx=(20, 0))
-
-                                # Right side with buttons and quantity
-                                right_frame = ctk.CTkFrame(item_frame, fg_color="transparent")
-                                right_frame.pack(side="right", padx=(0, 20))
-
-                                # Update button
-                                update_btn = ctk.CTkButton(right_frame, text="Update", width=70, height=25,
-                                                       fg_color="#2196F3", command=lambda i=i: self.update_material_inline(i+1))
-                                update_btn.pack(side="left", padx=5)
-
-                                # Remove button
-                                remove_btn = ctk.CTkButton(right_frame, text="Remove", width=70, height=25,
-                                                       fg_color="#F44336", command=lambda i=i: self.remove_material_inline(i+1))
-                                remove_btn.pack(side="left", padx=5)
-
-                                # Quantity
-                                qty_label = ctk.CTkLabel(right_frame, text=qty, font=("Helvetica", 12),
-                                                     text_color="#ffffff", width=50)
-                                qty_label.pack(side="left", padx=5)
-
-                                # Row index for edit reference
-                                item_frame.rowindex = i + 1  # Sheet rows are 1-indexed
-            except Exception as e:
-                ctk.CTkLabel(frame, text=f"Error: {e}", font=("Helvetica", 12), text_color="#888").pack(pady=10)
+        def failed(e):
+            if top.winfo_exists():
+                inventory_list.show_message(f"Error: {e}")
 
-        update_inventory()
+        def update_inventory():
+            inventory_list.show_message("Loading inventory...")
+            sheets_executor.submit(inventory_cache.get_all_values, on_success=loaded, on_error=failed)
 
-    def export_data(self, sheet, filename_prefix):
+        search_entry.bind("<KeyRelease>", lambda event: run_search())
+        update_inventory()
+        keep_in_sync(top, inventory_cache, patch, loaded, lambda: run_search(now=True))
 
-        import csv
+    @traced_action("admin.export_data")
+    def export_data(self, sheet, filename_prefix, redact_columns=(), transform=None):
+        """Stream a worksheet to a CSV (or gzip-compressed CSV) file, chunk by chunk"""
         from datetime import datetime
         from tkinter import filedialog
 
@@ -363,202 +1170,496 @@ class AdminPage:
             show_error("Error", "Sheet not available")
             return
 
-        try:
-            # Get data
-            data = sheet.get_all_values()
+        # Ask for save location
+        timestamp = datetime.now().strftime("%Y%m%d_%H%M%S")
+        default_filename = f"{filename_prefix}_{timestamp}.csv"
 
-            # Ask for save location
-            timestamp = datetime.now().strftime("%Y%m%d_%H%M%S")
-            default_filename = f"{filename_prefix}_{timestamp}.csv"
+        file_type = ctk.StringVar(master=self.display)
+        file_path = filedialog.asksaveasfilename(
+            defaultextension=".csv",
+            filetypes=[("CSV files", "*.csv"), ("CSV (gzip)", "*.csv.gz"), ("All files", "*.*")],
+            initialfile=default_filename,
+            typevariable=file_type
+        )
 
-            file_path = filedialog.asksaveasfilename(
-                defaultextension=".csv",
-                filetypes=[("CSV files", "*.csv"), ("All files", "*.*")],
-                initialfile=default_filename
-            )
+        if not file_path:
+            return  # User cancelled
+        # The dialog adds .csv, so compression chosen by file type has to be added here
+        if file_type.get() == "CSV (gzip)" and not file_path.endswith(".gz"):
+            file_path += ".gz"
+
+        # Progress window
+        progress_window = ctk.CTkToplevel(self.display)
+        progress_window.title("Exporting")
+        progress_window.geometry("360x120")
+        progress_window.transient(self.display)
+
+        progress_label = ctk.CTkLabel(progress_window, text="Starting export...", font=("Helvetica", 12))
+        progress_label.pack(pady=(20, 10))
+        progress_bar = ctk.CTkProgressBar(progress_window, width=300)
+        progress_bar.set(0)
+        progress_bar.pack(pady=5)
+
+        def show_progress(done_total):
+            done, total = done_total
+            if progress_window.winfo_exists():
+                progress_bar.set(done / total if total else 1)
+                progress_label.configure(text=f"Exported {done} of {total} rows")
+
+        def finished(rows_written):
+            if progress_window.winfo_exists():
+                progress_window.destroy()
+            show_info("Success", f"{rows_written} rows exported to {file_path}")
+
+        def failed(e):
+            if progress_window.winfo_exists():
+                progress_window.destroy()
+            show_error("Error", f"Export failed: {str(e)}")
 
-            if not file_path:
-                return  # User cancelled
+        sheets_executor.submit(
+            export_worksheet, sheet, file_path, redact_columns=redact_columns, transform=transform,
+            progress=lambda done, total: sheets_executor.post(show_progress, (done, total)),
+            on_success=finished, on_error=failed)
 
-            # Write to CSV
-            with open(file_path, 'w', newline='') as file:
-                writer = csv.writer(file)
-                for row in data:
-                    writer.writerow(row)
+    @traced_action("admin.view_user_requests")
+    def view_user_requests(self):
+        """View all user material requests, one page at a time"""
+        assignments = {"sheet": None}
 
-            show_info("Success", f"Data exported to {file_path}")
+        def open_assignments():
+            user_assignments_sheet = open_assignments_sheet()
+            request_index.refresh()
+            return user_assignments_sheet, request_index.entries()
 
-        except Exception as e:
-            show_error("Error", f"Export failed: {str(e)}")
+        # Create the requests window
+        top = ctk.CTkToplevel(self.display)
+        top.title("User Material Requests")
+        top.geometry("800x600")
+        top.grab_set()
 
-    def view_user_requests(self):
-        """View all user material requests"""
-        # Ensure we can access the user assignments sheet
-        try:
-            user_assignments_sheet = None
-            # Get sheets client
-            creds = None
-
-            if 'GOOGLE_CREDENTIALS' in os.environ and os.environ['GOOGLE_CREDENTIALS'].strip():
-                credentials_dict = json.loads(os.environ['GOOGLE_CREDENTIALS'])
-                creds = Credentials.from_service_account_info(credentials_dict, scopes=scopes)
-            elif os.path.exists('credentials.json'):
-                creds = Credentials.from_service_account_file('credentials.json', scopes=scopes)
-
-            if not creds:
-                show_error("Error", "No Google credentials available")
+        ctk.CTkLabel(top, text="User Material Requests", font=("Helvetica", 18, 'bold'), 
+                    text_color="#4CAF50").pack(pady=10)
+
+        # Filter controls
+        filter_frame = ctk.CTkFrame(top, fg_color="transparent")
+        filter_frame.pack(fill="x", padx=20, pady=5)
+
+        # Email filter
+        email_var = ctk.StringVar()
+        ctk.CTkLabel(filter_frame, text="Filter by Email:", 
+                   font=("Helvetica", 12)).pack(side="left", padx=(0, 5))
+        email_entry = ctk.CTkEntry(filter_frame, textvariable=email_var, width=200)
+        email_entry.pack(side="left", padx=5)
+
+        # Date filter
+        date_var = ctk.StringVar()
+        ctk.CTkLabel(filter_frame, text="Date:", 
+                   font=("Helvetica", 12)).pack(side="left", padx=(10, 5))
+        date_entry = ctk.CTkEntry(filter_frame, textvariable=date_var, width=100)
+        date_entry.pack(side="left", padx=5)
+
+        # Export button
+        ctk.CTkButton(filter_frame, text="Export CSV", 
+                     command=lambda: self.export_data(assignments["sheet"], "requests"),
+                     width=100, height=30, 
+                     fg_color="#009688", text_color="white").pack(side="right", padx=5)
+
+        # Table header
+        header_frame = ctk.CTkFrame(top, fg_color="#333333", height=40)
+        header_frame.pack(fill="x", padx=20, pady=(10, 0))
+
+        ctk.CTkLabel(header_frame, text="Email", font=("Helvetica", 12, "bold"),
+                    text_color="#ffffff", width=200).pack(side="left", padx=5)
+        ctk.CTkLabel(header_frame, text="Material", font=("Helvetica", 12, "bold"),
+                    text_color="#ffffff", width=150).pack(side="left", padx=5)
+        ctk.CTkLabel(header_frame, text="Quantity", font=("Helvetica", 12, "bold"),
+                    text_color="#ffffff", width=80).pack(side="left", padx=5)
+        ctk.CTkLabel(header_frame, text="Date", font=("Helvetica", 12, "bold"),
+                    text_color="#ffffff", width=100).pack(side="left", padx=5)
+        ctk.CTkLabel(header_frame, text="Notes", font=("Helvetica", 12, "bold"),
+                    text_color="#ffffff", width=150).pack(side="left", padx=5)
+
+        # Virtualized list of requests
+        def make_row(parent):
+            row_frame = ctk.CTkFrame(parent, corner_radius=5)
+            row_frame.labels = []
+            for width in (200, 150, 80, 100, 150):
+                label = ctk.CTkLabel(row_frame, text="", font=("Helvetica", 12),
+                                     text_color="#ffffff", width=width)
+                label.pack(side="left", padx=5)
+                row_frame.labels.append(label)
+            return row_frame
+
+        def bind_row(row_frame, item, index):
+            i, row = item
+            row_frame.configure(fg_color="#04090a" if i % 2 == 0 else "#0a0f10")
+            # Email, Material, Quantity, Date, Notes
+            for column, label in enumerate(row_frame.labels):
+                label.configure(text=row[column] if len(row) > column else "")
+
+        requests_list = VirtualList(top, make_row, bind_row, row_height=44)
+        requests_list.pack(fill="both", expand=True, padx=20, pady=10)
+
+        pager = Pager(top, lambda page: load_page(page))
+        pager.pack(pady=(0, 10))
+
+        # The filters run over the row index (email and date of every request);
+        # only the rows of the page on screen are read from the sheet
+        state = {"rows": [], "page": 0, "generation": 0}
+
+        def render(entries):
+            state["rows"] = [entry[0] for entry in entries]
+            load_page(state["page"])
+
+        search = SearchController(top, render, text_func=lambda entry: entry[1])
+
+        def date_matches(entry):
+            return date_var.get() in entry[2]
+
+        def load_page(page):
+            state["generation"] += 1
+            generation = state["generation"]
+
+            def shown(result):
+                if not top.winfo_exists() or generation != state["generation"]:
+                    return
+                if result["page"] != state["page"]:
+                    requests_list.scroll_to(0)
+                state["page"] = result["page"]
+                pager.show(result["page"], result["pages"], result["total"], "requests")
+                requests_list.set_rows(result["rows"], empty_text="No requests found" if not search.rows
+                                       else "No matching requests")
+
+            def page_failed(e):
+                if isinstance(e, StaleIndex):
+                    # Rows were inserted or deleted on the sheet; the index was rebuilt
+                    update_requests()
+                else:
+                    failed(e)
+
+            sheets_executor.submit(request_index.page, state["rows"], page,
+                                   on_success=shown, on_error=page_failed)
+
+        def loaded(result):
+            if not top.winfo_exists():
+                return
+            assignments["sheet"], entries = result
+            search.set_rows(entries)
+            search.run_now(email_var.get(), date_matches)
+
+        def failed(e):
+            if top.winfo_exists():
+                requests_list.show_message(f"Could not load user requests: {str(e)}", text_color="#F44336")
+
+        def update_requests():
+            requests_list.show_message("Loading requests...")
+            sheets_executor.submit(open_assignments, on_success=loaded, on_error=failed)
+
+        def filter_changed(*args):
+            state["page"] = 0
+            search.schedule(email_var.get(), date_matches)
+
+        # Update on filter change
+        email_var.trace_add("write", filter_changed)
+        date_var.trace_add("write", filter_changed)
+
+        # Load initial data
+        update_requests()
+        self.keep_index_in_sync(top, lambda entries: loaded((assignments["sheet"], entries)))
+
+    def keep_index_in_sync(self, top, reload):
+        """Pick up requests added on the sheet while top is open; reload(entries) shows them"""
+        def synced(changed):
+            if not top.winfo_exists():
                 return
+            if changed:
+                reload(request_index.entries())
+            schedule()
 
-            client = gspread.authorize(creds)
+        def failed(e):
+            print(f"Error syncing {request_index.name}: {e}")
+            if top.winfo_exists():
+                schedule()
 
-            # Try to open the user assignments worksheet
-            try:
-                sheet = client.open_by_key(config.get_credentials_sheet_id())
-                try:
-                    user_assignments_sheet = sheet.worksheet("user_assignments")
-                except gspread.exceptions.WorksheetNotFound:
-                    # Create it if it doesn't exist
-                    user_assignments_sheet = sheet.add_worksheet(title="user_assignments", rows=100, cols=20)
-                    user_assignments_sheet.append_row(["Email", "Material", "Quantity", "Date", "Notes"])
-            except Exception as e:
-                show_error("Error", f"Could not access user assignments: {str(e)}")
+        def sync():
+            if top.winfo_exists():
+                with action(f"{request_index.name}.sync"):
+                    sheets_executor.submit(request_index.refresh, on_success=synced, on_error=failed)
+
+        def schedule():
+            top.after(SYNC_INTERVAL * 1000, sync)
+
+        schedule()
+
+    @traced_action("admin.process_requests")
+    def process_requests(self):
+        """Review the pending requests against the inventory and fulfil them in one batch"""
+        top = ctk.CTkToplevel(self.display)
+        top.title("Process Requests")
+        top.geometry("800x550")
+        top.grab_set()
+
+        title_label = ctk.CTkLabel(top, text="Pending Requests", font=("Helvetica", 18, 'bold'),
+                                   text_color="#4CAF50")
+        title_label.pack(pady=10)
+
+        options_frame = ctk.CTkFrame(top, fg_color="transparent")
+        options_frame.pack(fill="x", padx=10)
+        summary_label = ctk.CTkLabel(options_frame, text="", font=("Helvetica", 12), text_color="#ffffff")
+        summary_label.pack(side="left", padx=5)
+        partial_switch = ctk.CTkSwitch(options_frame, text="Allow partial fulfilment",
+                                       command=lambda: load_plan())
+        partial_switch.select()
+        partial_switch.pack(side="right", padx=5)
+
+        # Table header
+        header_frame = ctk.CTkFrame(top, fg_color="#333333", height=40)
+        header_frame.pack(fill="x", padx=10, pady=(10, 0))
+
+        columns = (("Row", 50), ("Email", 190), ("Material", 150), ("Quantity", 100), ("Result", 220))
+        for text, width in columns:
+            ctk.CTkLabel(header_frame, text=text, font=("Helvetica", 12, "bold"),
+                        text_color="#ffffff", width=width).pack(side="left", padx=5)
+
+        status_colors = {"approved": "#4CAF50", "partial": "#FF9800", "rejected": "#F44336"}
+
+        def make_row(parent):
+            row_frame = ctk.CTkFrame(parent, corner_radius=5)
+            row_frame.labels = []
+            for text, width in columns:
+                label = ctk.CTkLabel(row_frame, text="", font=("Helvetica", 12),
+                                     text_color="#ffffff", width=width, anchor="w")
+                label.pack(side="left", padx=5)
+                row_frame.labels.append(label)
+            return row_frame
+
+        def bind_row(row_frame, entry, index):
+            row_frame.configure(fg_color="#04090a" if index % 2 == 0 else "#0a0f10")
+            row_label, email_label, material_label, qty_label, result_label = row_frame.labels
+            row_label.configure(text=str(entry["row"]))
+            email_label.configure(text=entry["email"])
+            material_label.configure(text=entry["material"])
+            qty_label.configure(text=f"{entry['requested']} → {format_quantity(entry['granted'])}")
+            result = entry["status"].capitalize()
+            result_label.configure(text=f"{result}: {entry['reason']}" if entry["reason"] else result,
+                                   text_color=status_colors[entry["status"]])
+
+        entries_list = VirtualList(top, make_row, bind_row, row_height=36)
+        entries_list.pack(fill="both", expand=True, padx=10, pady=10)
+
+        plan = {"current": None}
+
+        def show_plan(result):
+            if not top.winfo_exists():
                 return
+            plan["current"] = result
+            counts = result["counts"]
+            summary_label.configure(text=f"{counts['approved']} approved, {counts['partial']} partial, "
+                                         f"{counts['rejected']} rejected"
+                                         + (f" ({result['remaining']} more wait for the next batch)"
+                                            if result["remaining"] else ""))
+            entries_list.set_rows(result["entries"], empty_text="There are no pending requests")
+            apply_button.configure(state="normal" if result["entries"] else "disabled")
+
+        def failed(e):
+            if top.winfo_exists():
+                entries_list.show_message(f"Error: {e}", text_color="#F44336")
+
+        def processor():
+            return RequestProcessor(inventory_cache, assignments_cache, request_index,
+                                    allow_partial=partial_switch.get() == 1)
+
+        def make_plan(engine):
+            open_assignments_sheet()
+            return engine.plan()
+
+        def load_plan():
+            plan["current"] = None
+            apply_button.configure(state="disabled")
+            entries_list.show_message("Checking pending requests against the inventory...")
+            sheets_executor.submit(make_plan, processor(), on_success=show_plan, on_error=failed)
+
+        def applied(result):
+            counts = result["counts"]
+            show_info("Success", f"{len(result['entries'])} requests processed in one batch: "
+                                 f"{counts['approved']} approved, {counts['partial']} partial, "
+                                 f"{counts['rejected']} rejected.")
+            self.refresh_inventory_window()
+            if top.winfo_exists():
+                load_plan()
+
+        def apply_failed(e):
+            show_error("Error", str(e))
+            if top.winfo_exists():
+                load_plan()
+
+        def apply_plan(engine, current):
+            result = engine.apply(current)
+            self.audit_fulfilment(result)
+            return result
+
+        @traced_action("admin.apply_requests")
+        def apply():
+            if plan["current"] is None:
+                return
+            apply_button.configure(state="disabled")
+            entries_list.show_message("Updating inventory and requests...")
+            sheets_executor.submit(apply_plan, processor(), plan["current"], write=True,
+                                   on_success=applied, on_error=apply_failed)
+
+        button_frame = ctk.CTkFrame(top, fg_color="transparent")
+        button_frame.pack(fill="x", padx=10, pady=(0, 10))
+
+        ctk.CTkButton(button_frame, text="Close", command=top.destroy, width=100,
+                      fg_color="#555555", text_color="white").pack(side="left", padx=5)
+        ctk.CTkButton(button_frame, text="Refresh", command=load_plan, width=100,
+                      fg_color="#2196F3", text_color="white").pack(side="left", padx=5)
+        apply_button = ctk.CTkButton(button_frame, text="Apply", command=apply, width=100, state="disabled",
+                                     fg_color="#4CAF50", text_color="white")
+        apply_button.pack(side="right", padx=5)
+
+        load_plan()
+
+    @traced_action("admin.usage_analytics")
+    def show_usage_analytics(self):
+        """Usage per material from the request log: velocity, forecast and top consumers"""
+        top = ctk.CTkToplevel(self.display)
+        top.title("Usage Analytics")
+        top.geometry("900x650")
+        top.grab_set()
 
-            # Create the requests window
-            top = ctk.CTkToplevel(self.display)
-            top.title("User Material Requests")
-            top.geometry("800x600")
-            top.grab_set()
-
-            ctk.CTkLabel(top, text="User Material Requests", font=("Helvetica", 18, 'bold'), 
-                        text_color="#4CAF50").pack(pady=10)
-
-            # Filter controls
-            filter_frame = ctk.CTkFrame(top, fg_color="transparent")
-            filter_frame.pack(fill="x", padx=20, pady=5)
-
-            # Email filter
-            email_var = ctk.StringVar()
-            ctk.CTkLabel(filter_frame, text="Filter by Email:", 
-                       font=("Helvetica", 12)).pack(side="left", padx=(0, 5))
-            email_entry = ctk.CTkEntry(filter_frame, textvariable=email_var, width=200)
-            email_entry.pack(side="left", padx=5)
-
-            # Date filter
-            date_var = ctk.StringVar()
-            ctk.CTkLabel(filter_frame, text="Date:", 
-                       font=("Helvetica", 12)).pack(side="left", padx=(10, 5))
-            date_entry = ctk.CTkEntry(filter_frame, textvariable=date_var, width=100)
-            date_entry.pack(side="left", padx=5)
-
-            # Export button
-            ctk.CTkButton(filter_frame, text="Export CSV", 
-                         command=lambda: self.export_data(user_assignments_sheet, "requests"),
-                         width=100, height=30, 
-                         fg_color="#009688", text_color="white").pack(side="right", padx=5)
-
-            # Table header
-            header_frame = ctk.CTkFrame(top, fg_color="#333333", height=40)
-            header_frame.pack(fill="x", padx=20, pady=(10, 0))
-
-            ctk.CTkLabel(header_frame, text="Email", font=("Helvetica", 12, "bold"),
-                        text_color="#ffffff", width=200).pack(side="left", padx=5)
-            ctk.CTkLabel(header_frame, text="Material", font=("Helvetica", 12, "bold"),
-                        text_color="#ffffff", width=150).pack(side="left", padx=5)
-            ctk.CTkLabel(header_frame, text="Quantity", font=("Helvetica", 12, "bold"),
-                        text_color="#ffffff", width=80).pack(side="left", padx=5)
-            ctk.CTkLabel(header_frame, text="Date", font=("Helvetica", 12, "bold"),
-                        text_color="#ffffff", width=100).pack(side="left", padx=5)
-            ctk.CTkLabel(header_frame, text="Notes", font=("Helvetica", 12, "bold"),
-                        text_color="#ffffff", width=150).pack(side="left", padx=5)
-
-            # Scrollable frame for requests
-            frame = ctk.CTkScrollableFrame(top, fg_color="#16191a")
-            frame.pack(fill="both", expand=True, padx=20, pady=10)
-
-            def update_requests():
-                for widget in frame.winfo_children():
-                    widget.destroy()
-
-                email_filter = email_var.get().lower()
-                date_filter = date_var.get()
+        ctk.CTkLabel(top, text="Usage Analytics", font=("Helvetica", 18, 'bold'),
+                     text_color="#4CAF50").pack(pady=10)
 
-                try:
-                    rows = user_assignments_sheet.get_all_values()
+        controls_frame = ctk.CTkFrame(top, fg_color="transparent")
+        controls_frame.pack(pady=5)
 
-                    if len(rows) <= 1:  # Only header or empty
-                        ctk.CTkLabel(frame, text="No requests found", font=("Helvetica", 12),
-                                   text_color="#888888").pack(pady=20)
-                        return
+        search_var = ctk.StringVar()
+        search_entry = ctk.CTkEntry(controls_frame, textvariable=search_var, placeholder_text="🔍 Search Materials",
+                                    width=250)
+        search_entry.pack(side="left", padx=5)
 
-                    # Skip header if it exists
-                    if rows[0][0].lower() == "email":
-                        rows = rows[1:]
-
-                    # Display filtered rows
-                    for i, row in enumerate(rows):
-                        # Ensure row has enough elements
-                        if len(row) < 3:
-                            continue
-
-                        email = row[0] if len(row) > 0 else ""
-                        material = row[1] if len(row) > 1 else ""
-                        quantity = row[2] if len(row) > 2 else ""
-                        date = row[3] if len(row) > 3 else ""
-                        notes = row[4] if len(row) > 4 else ""
-
-                        # Apply filters
-                        if email_filter and email_filter not in email.lower():
-                            continue
-
-                        if date_filter and date_filter not in date:
-                            continue
-
-                        # Create row frame
-                        row_color = "#04090a" if i % 2 == 0 else "#0a0f10"
-                        row_frame = ctk.CTkFrame(frame, fg_color=row_color, corner_radius=5, height=40)
-                        row_frame.pack(fill="x", pady=2, padx=5)
-                        row_frame.pack_propagate(False)
-
-                        # Row data
-                        ctk.CTkLabel(row_frame, text=email, font=("Helvetica", 12),
-                                   text_color="#ffffff", width=200).pack(side="left", padx=5)
-                        ctk.CTkLabel(row_frame, text=material, font=("Helvetica", 12),
-                                   text_color="#ffffff", width=150).pack(side="left", padx=5)
-                        ctk.CTkLabel(row_frame, text=quantity, font=("Helvetica", 12),
-                                   text_color="#ffffff", width=80).pack(side="left", padx=5)
-                        ctk.CTkLabel(row_frame, text=date, font=("Helvetica", 12),
-                                   text_color="#ffffff", width=100).pack(side="left", padx=5)
-                        ctk.CTkLabel(row_frame, text=notes, font=("Helvetica", 12),
-                                   text_color="#ffffff", width=150).pack(side="left", padx=5)
-
-                except Exception as e:
-                    ctk.CTkLabel(frame, text=f"Error: {str(e)}", font=("Helvetica", 12),
-                               text_color="#F44336").pack(pady=20)
-
-            # Update on filter change
-            email_var.trace_add("write", lambda *args: update_requests())
-            date_var.trace_add("write", lambda *args: update_requests())
-
-            # Load initial data
-            update_requests()
+        windows = {"Last 7 days": 7, f"Last {WINDOW_DAYS} days": WINDOW_DAYS, "Last 90 days": 90}
+        window_var = ctk.StringVar(value=f"Last {WINDOW_DAYS} days")
+        ctk.CTkOptionMenu(controls_frame, values=list(windows), variable=window_var, width=130,
+                          command=lambda choice: load()).pack(side="left", padx=5)
 
-        except Exception as e:
-            show_error("Error", f"Could not load user requests: {str(e)}")
+        ctk.CTkButton(controls_frame, text="Refresh", command=lambda: load(force=True), width=100,
+                      fg_color="#2196F3", text_color="white").pack(side="left", padx=5)
 
-    def process_requests(self):
-        show_info("Feature Coming Soon", "This feature will be available in the next update!")
+        columns = (("Material", 180), ("Used", 80), ("Per Day", 70), (f"Next {HORIZON_DAYS} d", 80),
+                   ("In Stock", 70), ("Days Left", 70), ("Trend", 140))
+        header_frame = ctk.CTkFrame(top, fg_color="#333333", height=40)
+        header_frame.pack(fill="x", padx=10, pady=(10, 0))
+        for text, width in columns:
+            ctk.CTkLabel(header_frame, text=text, font=("Helvetica", 12, "bold"),
+                         text_color="#ffffff", width=width).pack(side="left", padx=5)
+
+        def make_row(parent):
+            row_frame = ctk.CTkFrame(parent, corner_radius=5)
+            row_frame.labels = []
+            for text, width in columns:
+                label = ctk.CTkLabel(row_frame, text="", font=("Courier", 12) if text == "Trend" else ("Helvetica", 12),
+                                     text_color="#ffffff", width=width, anchor="w")
+                label.pack(side="left", padx=5)
+                row_frame.labels.append(label)
+            return row_frame
+
+        def bind_row(row_frame, item, index):
+            row_frame.configure(fg_color="#04090a" if index % 2 == 0 else "#0a0f10")
+            stock = report["stock"].get(item["name"])
+            days_left = stock / item["velocity"] if stock is not None and item["velocity"] > 0 else None
+            values = (item["name"], format_quantity(item["recent"]), f"{item['velocity']:.2f}",
+                      format_quantity(round(item["forecast"], 1)),
+                      format_quantity(stock) if stock is not None else "—",
+                      f"{days_left:.0f}" if days_left is not None else "—",
+                      sparkline(trend(item["daily"])))
+            for label, value in zip(row_frame.labels, values):
+                label.configure(text=value)
+            # Stock that runs out before the forecast horizon
+            row_frame.labels[5].configure(text_color="#F44336" if days_left is not None and days_left < HORIZON_DAYS
+                                          else "#ffffff")
+
+        materials_list = VirtualList(top, make_row, bind_row, row_height=36)
+        materials_list.pack(fill="both", expand=True, padx=10, pady=(10, 0))
+
+        ctk.CTkLabel(top, text="Top Consumers", font=("Helvetica", 12, "bold"),
+                     text_color="#ffffff").pack(anchor="w", padx=10, pady=(10, 0))
+        consumers_box = ctk.CTkTextbox(top, height=120, font=("Courier", 12), wrap="none")
+        consumers_box.pack(fill="x", padx=10)
+
+        summary_label = ctk.CTkLabel(top, text="", font=("Helvetica", 11), text_color="#888888")
+        summary_label.pack(pady=5)
+
+        report = {"stock": {}}
+
+        def render(items):
+            materials_list.set_rows(items, empty_text="No usage recorded" if not search.rows
+                                    else "No matching materials")
+
+        search = SearchController(top, render, text_func=lambda item: item["name"])
+
+        def compute(window, force):
+            open_assignments_sheet()
+            usage_analytics.refresh(force)
+            # Days of stock left at the current velocity
+            stock = {}
+            for row in inventory_cache.get_all_values():
+                if len(row) > 1 and row[0] and row[0] not in stock:
+                    stock[row[0]] = parse_quantity(row[1])
+            return usage_analytics.report(window=window), stock
+
+        def loaded(result):
+            if not top.winfo_exists():
+                return
+            usage, report["stock"] = result
+            lines = [f"{'Email':40} {'Used':>10} {'Requests':>9}"]
+            for consumer in usage["consumers"]:
+                lines.append(f"{consumer['email'][:40]:40} {format_quantity(consumer['total']):>10} "
+                             f"{consumer['requests']:>9}")
+            consumers_box.configure(state="normal")
+            consumers_box.delete("1.0", "end")
+            consumers_box.insert("1.0", "\n".join(lines))
+            consumers_box.configure(state="disabled")
+            summary_label.configure(text=f"{usage['requests']} requests · {len(usage['materials'])} materials · "
+                                         f"forecast = {usage['window']}-day moving average × {usage['horizon']} days")
+            search.set_rows(usage["materials"])
+            search.run_now(search_var.get())
+
+        def failed(e):
+            if top.winfo_exists():
+                materials_list.show_message(f"Error: {e}", text_color="#F44336")
+
+        def load(force=False):
+            materials_list.show_message("Analysing the request log...")
+            sheets_executor.submit(compute, windows[window_var.get()], force, on_success=loaded, on_error=failed)
+
+        search_entry.bind("<KeyRelease>", lambda event: search.schedule(search_var.get()))
+        load()
+
+    def refresh_inventory_window(self):
+        """Reopen the inventory list if it is showing"""
+        for widget in self.display.winfo_children():
+            if isinstance(widget, ctk.CTkToplevel) and widget.title() == "All Inventory":
+                widget.destroy()
+                self.show_all_inventory()
+                return
 
+    @traced_action("admin.update_material_inline")
     def update_material_inline(self, row_index):
         """Update material directly from the list"""
+        sheets_executor.submit(inventory_cache.row_values, row_index,
+                               on_success=lambda row: self.show_update_material_window(row_index, row),
+                               on_error=lambda e: show_error("Error", f"Failed to update material: {str(e)}"))
+
+    def show_update_material_window(self, row_index, row):
         try:
-            row = inventory_sheet.row_values(row_index)
             name = row[0]
             qty = row[1]
 
             update_window = ctk.CTkToplevel(self.display)
             update_window.title("Update Material")
-            update_window.geometry("400x200")
+            update_window.geometry("400x300")
 
             ctk.CTkLabel(update_window, text=f"Update: {name}", font=("Helvetica", 14, "bold")).pack(pady=(20,10))
 
@@ -570,73 +1671,157 @@ class AdminPage:
             qty_entry.pack(side="left")
             qty_entry.insert(0, qty)
 
-            def save():
-                new_qty = qty_entry.get()
-                inventory_sheet.update_cell(row_index, 2, new_qty)
+            # Reorder Point and Lead Time columns; clearing a cell stops the alerts for it
+            reorder_entries = []
+            for column, label in ((3, "Reorder point:"), (4, "Lead time (days):")):
+                field_frame = ctk.CTkFrame(update_window, fg_color="transparent")
+                field_frame.pack(pady=5)
+                ctk.CTkLabel(field_frame, text=label).pack(side="left", padx=(0, 10))
+                entry = ctk.CTkEntry(field_frame)
+                entry.pack(side="left")
+                entry.insert(0, row[column - 1] if len(row) >= column else "")
+                reorder_entries.append((column, label.rstrip(":").capitalize(), entry))
+
+            def saved(result):
                 show_info("Success", "Material updated successfully!")
-                update_window.destroy()
                 # Refresh the inventory view if open
-                for widget in self.display.winfo_children():
-                    if isinstance(widget, ctk.CTkToplevel) and widget.title() == "All Inventory":
-                        widget.destroy()
-                        self.show_all_inventory()
+                self.refresh_inventory_window()
+
+            @traced_action("admin.update_material")
+            def save():
+                try:
+                    new_qty = checked_number("Quantity", qty_entry.get(), required=True)
+                    reorder = [(column, checked_number(label, entry.get(), minimum=0))
+                               for column, label, entry in reorder_entries]
+                except ValueError as e:
+                    show_error("Error", str(e))
+                    return
+                changed = [(column, value) for column, value in reorder
+                           if value != (row[column - 1] if len(row) >= column else "")]
+                if self.staging_enabled():
+                    if changed:
+                        show_error("Error", "Reorder points are not staged; turn off Stage changes to set them.")
+                        return
+                    update_window.destroy()
+                    self.stage_inventory_change(name, new_qty)
+                    return
+                update_window.destroy()
+
+                def write():
+                    # The list may have shifted since the window opened
+                    current_index, before = self.locate_material(name)
+                    if changed:
+                        add_reorder_header(inventory_cache)
+                    inventory_cache.update_cell(current_index, 2, new_qty)
+                    for column, value in changed:
+                        inventory_cache.update_cell(current_index, column, value)
+                    self.audit_inventory("inventory.update", name, before, inventory_cache.row_values(current_index),
+                                         columns=[2] + [column for column, value in changed])
+
+                sheets_executor.submit(write, write=True, on_success=saved,
+                                       on_error=lambda e: show_error("Error", f"Failed to update material: {str(e)}"))
 
             ctk.CTkButton(update_window, text="Save", command=save, fg_color="#4CAF50").pack(pady=20)
 
         except Exception as e:
             show_error("Error", f"Failed to update material: {str(e)}")
 
+    @staticmethod
+    def locate_material(name):
+        """(row index, row) of a material as the inventory is now; raises LookupError if it is gone"""
+        row_index = inventory_cache.find_row(name) if name else None
+        row = inventory_cache.row_values(row_index) if row_index else []
+        if not row or row[0] != name:
+            raise LookupError(f"{name or 'The material'} is no longer in the inventory; refresh the list")
+        return row_index, row
+
+    @traced_action("admin.remove_material_inline")
     def remove_material_inline(self, row_index):
         """Remove material directly from the list"""
-        try:
-            name = inventory_sheet.cell(row_index, 1).value
+        def confirm(row):
+            name = row[0] if row else ""
             if askyesno("Confirm Delete", f"Are you sure you want to delete {name}?"):
-                inventory_sheet.delete_rows(row_index)
-                show_info("Success", "Material removed successfully!")
-                # Close current inventory window and open a new one
-                for widget in self.display.winfo_children():
-                    if isinstance(widget, ctk.CTkToplevel) and widget.title() == "All Inventory":
-                        widget.destroy()
-                        self.show_all_inventory()
-                        return
-        except Exception as e:
+                if self.staging_enabled():
+                    self.stage_inventory_change(name, remove=True)
+                    return
+                sheets_executor.submit(remove, row, write=True, on_success=removed, on_error=failed)
+
+        def remove(row):
+            # Rows may have been added or removed while the question was open
+            current_index, before = self.locate_material(row[0] if row else "")
+            inventory_cache.delete_row(current_index)
+            self.audit_inventory("inventory.remove", before[0], before=before)
+
+        def removed(result):
+            show_info("Success", "Material removed successfully!")
+            # Close current inventory window and open a new one
+            self.refresh_inventory_window()
+
+        def failed(e):
             show_error("Error", f"Failed to remove material: {str(e)}")
 
-    def test_connection(self):
-        """Test the connection to Google Sheets"""
-        try:
-            # Try to get credentials
-            creds = None
-            if 'GOOGLE_CREDENTIALS' in os.environ and os.environ['GOOGLE_CREDENTIALS'].strip():
-                credentials_dict = json.loads(os.environ['GOOGLE_CREDENTIALS'])
-                creds = Credentials.from_service_account_info(credentials_dict, scopes=scopes)
-            elif os.path.exists('credentials.json'):
-                creds = Credentials.from_service_account_file('credentials.json', scopes=scopes)
-
-            if not creds:
-                show_error("Connection Failed", "No Google credentials available")
-                return
-
-            # Try to connect
-            client = gspread.authorize(creds)
-
-            # Test access to sheets
-            inventory_sheet = client.open_by_key(config.get_inventory_sheet_id()).sheet1
-            credentials_sheet = client.open_by_key(config.get_credentials_sheet_id()).sheet1
+        sheets_executor.submit(inventory_cache.row_values, row_index, on_success=confirm, on_error=failed)
+
+    @traced_action("admin.sync_offline_changes")
+    def sync_offline_changes(self, on_success=None, on_error=None):
+        """Send the changes made while offline, in order, once the sheets can be reached"""
+        def sync():
+            # The caches may have started without a sheet if Google was unreachable
+            inventory_cache.set_sheet(get_backend().get_worksheet(config.get_inventory_sheet_id()))
+            credentials_cache.set_sheet(get_backend().get_worksheet(config.get_credentials_sheet_id()))
+            assignments_cache.set_sheet(get_backend().get_or_create_worksheet(
+                config.get_credentials_sheet_id(), "user_assignments",
+                ["Email", "Material", "Quantity", "Date", "Notes"]))
+            return sync_outbox()
+
+        def synced(result):
+            sent, conflicts, pending = result
+            if conflicts:
+                show_error("Sync Conflicts", "These offline changes were not applied because the "
+                           "sheet changed in the meantime:\n\n" + "\n".join(conflicts))
+            if on_success:
+                on_success(result)
+
+        def failed(e):
+            print(f"Error sending offline changes: {e}")
+            if on_error:
+                on_error(e)
+
+        if not (config.get_inventory_sheet_id() and config.get_credentials_sheet_id()):
+            return
+        sheets_executor.submit(sync, write=True, on_success=synced, on_error=failed)
 
-            # Try to read data
-            inventory_sheet.cell(1, 1)
-            credentials_sheet.cell(1, 1)
+    @traced_action("admin.test_connection")
+    def test_connection(self):
+        """Report the connection health, only probing the sheets if there was no recent traffic"""
+        def report(status):
+            error_rate = f"{status['error_rate']:.0%}"
+            latency = (f"{status['p50']:.0f} ms median, {status['p95']:.0f} ms 95th percentile"
+                       if status["p50"] is not None else "no data")
+            show_info("Connection Successful",
+                      "Successfully connected to Google Sheets!\n\n" +
+                      f"Site: {config.get_active_site()}\n" +
+                      f"Inventory Sheet ID: {config.get_inventory_sheet_id()}\n" +
+                      f"Credentials Sheet ID: {config.get_credentials_sheet_id()}\n\n" +
+                      f"Latency: {latency}\n" +
+                      f"Errors: {error_rate} of the last {status['requests']} requests\n" +
+                      f"Rate limited: {status['throttled']} times")
+            self.sync_offline_changes()
+
+        status = health_monitor.status()
+        if status["state"] == "connected" and status["idle"] < health_monitor.idle_probe:
+            report(status)
+            return
 
-            # All tests passed
-            show_info("Connection Successful", 
-                              "Successfully connected to Google Sheets!\n\n" + 
-                              f"Inventory Sheet ID: {config.get_inventory_sheet_id()}\n" +
-                              f"Credentials Sheet ID: {config.get_credentials_sheet_id()}")
+        def check():
+            # Test access to both spreadsheets through the shared connection
+            get_backend().probe(config.get_inventory_sheet_id())
+            get_backend().probe(config.get_credentials_sheet_id())
 
-        except Exception as e:
-            show_error("Connection Failed", f"Error: {str(e)}")
+        sheets_executor.submit(check, on_success=lambda result: report(health_monitor.status()),
+                               on_error=lambda e: show_error("Connection Failed", f"Error: {str(e)}"))
 
+    @traced_action("admin.show_all_users")
     def show_all_users(self):
         """Show all users in the system"""
         top = ctk.CTkToplevel(self.display)
@@ -659,7 +1844,7 @@ class AdminPage:
 
         # Add export button
         ctk.CTkButton(search_frame, text="Export CSV", 
-                     command=lambda: self.export_data(credentials_sheet, "users"),
+                     command=lambda: self.export_data(credentials_cache.sheet, "users", redact_columns=(2,)),
                      width=100, height=30, 
                      fg_color="#009688", text_color="white").pack(side="right", padx=5)
 
@@ -672,47 +1857,85 @@ class AdminPage:
         ctk.CTkLabel(header_frame, text="Email", font=("Helvetica", 12, "bold"),
                     text_color="#ffffff", width=300).pack(side="left", padx=10)
 
-        # Scrollable users list
-        frame = ctk.CTkScrollableFrame(top, fg_color="#16191a")
-        frame.pack(fill="both", expand=True, padx=10, pady=10)
+        # Virtualized users list
+        def make_row(parent):
+            item_frame = ctk.CTkFrame(parent, corner_radius=5)
 
-        def update_users():
-            for widget in frame.winfo_children():
-                widget.destroy()
+            # Role label
+            item_frame.role_label = ctk.CTkLabel(item_frame, text="", font=("Helvetica", 12),
+                                                 text_color="#ffffff", width=100)
+            item_frame.role_label.pack(side="left", padx=10)
 
-            search_text = search_var.get().lower()
-            try:
-                rows = credentials_sheet.get_all_values()
-                if not rows:
-                    ctk.CTkLabel(frame, text="No users found", font=("Helvetica", 12), 
-                               text_color="#888").pack(pady=10)
-                else:
-                    # Skip header row if it exists
-                    if rows[0][0].lower() == "role":
-                        rows = rows[1:]
-
-                    for i, row in enumerate(rows):
-                        if len(row) >= 2:  # Make sure row has role and email
-                            role, email = row[0], row[1]
-                            if search_text in email.lower() or search_text in role.lower():
-                                row_color = "#04090a" if i % 2 == 0 else "#0a0f10"
-                                item_frame = ctk.CTkFrame(frame, fg_color=row_color, corner_radius=5)
-                                item_frame.pack(fill="x", pady=5, padx=10)
-
-                                # Role label
-                                role_label = ctk.CTkLabel(item_frame, text=role.capitalize(), 
-                                                      font=("Helvetica", 12),
-                                                      text_color="#ffffff", width=100)
-                                role_label.pack(side="left", padx=10)
-
-                                # Email label
-                                email_label = ctk.CTkLabel(item_frame, text=email,
-                                                       font=("Helvetica", 12),
-                                                       text_color="#ffffff", width=300)
-                                email_label.pack(side="left", padx=10)
-            except Exception as e:
-                ctk.CTkLabel(frame, text=f"Error: {e}", font=("Helvetica", 12), 
-                           text_color="#888").pack(pady=10)
+            # Email label
+            item_frame.email_label = ctk.CTkLabel(item_frame, text="", font=("Helvetica", 12),
+                                                  text_color="#ffffff", width=300)
+            item_frame.email_label.pack(side="left", padx=10)
+            return item_frame
+
+        def bind_row(item_frame, item, index):
+            i, row = item
+            item_frame.configure(fg_color="#04090a" if i % 2 == 0 else "#0a0f10")
+            item_frame.role_label.configure(text=row[0].capitalize())
+            item_frame.email_label.configure(text=row[1])
+
+        users_list = VirtualList(top, make_row, bind_row, row_height=40)
+        users_list.pack(fill="both", expand=True, padx=10, pady=10)
+
+        def render(items):
+            users_list.set_rows(items, empty_text="No users found" if not search.rows
+                                else "No matching users")
 
-        search_entry.bind("<KeyRelease>", lambda event: update_users())
-        update_users()
\ No newline at end of file
+        search = SearchController(top, render, text_func=lambda item: f"{item[1][0]} {item[1][1]}")
+
+        # Skip header row if it exists, and make sure row has role and email
+        def accept(i, row):
+            return len(row) >= 2 and not (i == 0 and row[0].lower() == "role")
+
+        def loaded(rows):
+            if not top.winfo_exists():
+                return
+            search.set_rows([(i, row) for i, row in enumerate(rows) if accept(i, row)])
+            search.run_now(search_var.get())
+
+        def failed(e):
+            if top.winfo_exists():
+                users_list.show_message(f"Error: {e}")
+
+        def update_users():
+            users_list.show_message("Loading users...")
+            sheets_executor.submit(credentials_cache.get_all_values, on_success=loaded, on_error=failed)
+
+        search_entry.bind("<KeyRelease>", lambda event: search.schedule(search_var.get()))
+        update_users()
+        keep_in_sync(top, credentials_cache, lambda changes: patch_search_rows(search, changes, accept),
+                     loaded, lambda: search.run_now(search_var.get()))
+
+
+def open_assignments_sheet():
+    """Open the user assignments worksheet, creating it if it doesn't exist"""
+    user_assignments_sheet = get_backend().get_or_create_worksheet(
+        config.get_credentials_sheet_id(), "user_assignments",
+        ["Email", "Material", "Quantity", "Date", "Notes"])
+    if assignments_cache.sheet is not user_assignments_sheet:
+        assignments_cache.set_sheet(user_assignments_sheet)
+    return user_assignments_sheet
+
+
+def patch_search_rows(search, changes, accept):
+    """Apply a SheetCache.sync() result to a search whose items are (position, row)"""
+    positions = {item[0]: p for p, item in enumerate(search.rows)}
+    rebuild = False
+    for i, row in changes["changed"].items():
+        if i in positions and accept(i, row):
+            search.update_row(positions[i], (i, row))
+        elif i in positions or accept(i, row):
+            rebuild = True  # The row joins or leaves the list
+
+    if rebuild:
+        rows = {i: row for i, row in search.rows}
+        rows.update(changes["changed"])
+        search.set_rows([(i, row) for i, row in sorted(rows.items()) if accept(i, row)])
+
+    for i, row in sorted(changes["appended"].items()):
+        if accept(i, row):
+            search.append_row((i, row))
@@ -0,0 +1,141 @@
+import contextvars
+import functools
+import json
+import threading
+import time
+from collections import deque
+from urllib.parse import unquote, urlparse
+
+# The UI action the code running now works for, e.g. "admin.show_all_inventory".
+# SheetsExecutor carries it over to its worker threads and back to the callbacks.
+_action = contextvars.ContextVar("api_action", default=None)
+
+UNATTRIBUTED = "unattributed"
+
+
+class ApiTracer:
+    """The last capacity Sheets API requests, each with its UI action, bytes and latency"""
+
+    def __init__(self, capacity=5000):
+        self._calls = deque(maxlen=capacity)
+        self._lock = threading.Lock()
+        self._total = 0
+        self._started = time.time()
+
+    def record(self, api, method, url, params=None, sent=0, received=0, latency=0.0, status=None,
+               error=None):
+        """Record one HTTP request (called from worker threads)"""
+        spreadsheet, target = parse_endpoint(url, params)
+        entry = {
+            "time": time.time(),
+            "action": current_action(),
+            "api": api,
+            "method": method.upper(),
+            "spreadsheet": spreadsheet,
+            "target": target,
+            "sent": sent,
+            "received": received,
+            "latency_ms": round(latency * 1000, 1),
+            "status": status,
+            "error": str(error) if error else None,
+            "thread": threading.current_thread().name,
+        }
+        with self._lock:
+            self._calls.append(entry)
+            self._total += 1
+
+    def calls(self):
+        with self._lock:
+            return list(self._calls)
+
+    def total(self):
+        with self._lock:
+            return self._total
+
+    def summary(self):
+        """Per action: request count, bytes, total and slowest latency and errors, busiest first"""
+        actions = {}
+        for call in self.calls():
+            stats = actions.setdefault(call["action"], {"action": call["action"], "requests": 0, "sent": 0,
+                                                        "received": 0, "latency_ms": 0.0, "slowest_ms": 0.0,
+                                                        "errors": 0})
+            stats["requests"] += 1
+            stats["sent"] += call["sent"]
+            stats["received"] += call["received"]
+            stats["latency_ms"] += call["latency_ms"]
+            stats["slowest_ms"] = max(stats["slowest_ms"], call["latency_ms"])
+            stats["errors"] += 1 if call["error"] or (call["status"] or 0) >= 400 else 0
+        return sorted(actions.values(), key=lambda stats: stats["requests"], reverse=True)
+
+    def clear(self):
+        with self._lock:
+            self._calls.clear()
+
+    def export_jsonl(self, file_path):
+        """Write the buffered requests, oldest first, one JSON object per line; returns the count"""
+        calls = self.calls()
+        with open(file_path, "w", encoding="utf-8") as f:
+            for call in calls:
+                f.write(json.dumps(call) + "\n")
+        return len(calls)
+
+
+def parse_endpoint(url, params=None):
+    """Split a Sheets API URL into the spreadsheet ID and the range or endpoint after it"""
+    path = unquote(urlparse(str(url)).path)
+    spreadsheet, target = None, path
+    if "/spreadsheets/" in path:
+        rest = path.split("/spreadsheets/", 1)[1]
+        spreadsheet, _, target = rest.partition("/")
+        target = target or "metadata"
+    elif "/files/" in path:
+        # Drive API (sharing, permissions)
+        spreadsheet, _, target = path.split("/files/", 1)[1].partition("/")
+        target = f"drive {target or 'file'}"
+    ranges = (params or {}).get("ranges")
+    if ranges:
+        target += " " + ",".join([ranges] if isinstance(ranges, str) else ranges)
+    return spreadsheet, target
+
+
+def payload_size(data=None, json_body=None):
+    if data is not None:
+        return len(data) if isinstance(data, (bytes, str)) else 0
+    if json_body is not None:
+        return len(json.dumps(json_body))
+    return 0
+
+
+def current_action():
+    return _action.get() or UNATTRIBUTED
+
+
+class action:
+    """Attribute the Sheets requests made inside this block (and the jobs it submits) to name"""
+
+    def __init__(self, name):
+        self.name = name
+        self._token = None
+
+    def __enter__(self):
+        self._token = _action.set(self.name)
+        return self
+
+    def __exit__(self, *exc_info):
+        _action.reset(self._token)
+        return False
+
+
+def traced_action(name):
+    """Decorator form of action(name) for UI handlers"""
+    def decorate(func):
+        @functools.wraps(func)
+        def wrapper(*args, **kwargs):
+            with action(name):
+                return func(*args, **kwargs)
+        return wrapper
+    return decorate
+
+
+# Shared by every window of the application
+api_tracer = ApiTracer()
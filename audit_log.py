@@ -0,0 +1,167 @@
+import json
+import threading
+import time
+import uuid
+
+from api_trace import action
+from local_store import local_store, is_offline_error
+from sheet_cache import SheetCache
+from storage import get_backend
+
+AUDIT_SHEET = "audit"
+AUDIT_HEADER = ["Time", "Actor", "Action", "Site", "Target", "Before", "After", "Entry"]
+
+# Columns of the audit worksheet (0-based)
+TIME_COLUMN, ACTOR_COLUMN, ACTION_COLUMN, SITE_COLUMN, TARGET_COLUMN, BEFORE_COLUMN, AFTER_COLUMN, ENTRY_COLUMN = \
+    range(len(AUDIT_HEADER))
+
+# The writer sends the journal every FLUSH_INTERVAL seconds, or as soon as FLUSH_ENTRIES are waiting
+FLUSH_INTERVAL = 30
+FLUSH_ENTRIES = 50
+
+# Entries per append request; a longer backlog goes out over several flushes
+MAX_FLUSH_ROWS = 1000
+
+INVENTORY_FIELDS = ("Material", "Quantity", "Reorder Point", "Lead Time (days)")
+CREDENTIAL_FIELDS = ("Role", "Email")  # Password hashes are never written to the log
+
+
+def fields(row, titles, columns=None):
+    """{title: value} of a sheet row, for the 1-based columns given (all non-empty ones by default)"""
+    if columns is None:
+        columns = [column for column in range(1, len(titles) + 1) if len(row) >= column and row[column - 1]]
+    return {titles[column - 1]: row[column - 1] if len(row) >= column else "" for column in columns}
+
+
+class AuditLog:
+    """Who changed what, journalled locally and appended to the audit worksheet in batches"""
+
+    def __init__(self, store, interval=FLUSH_INTERVAL, batch=FLUSH_ENTRIES):
+        self.store = store
+        self.interval = interval
+        self.batch = batch
+        self.actor = ""
+        self.cache = SheetCache(name=AUDIT_SHEET, store=store, unique_keys=False)
+        self._spreadsheet_id = None
+        self._wake = threading.Event()
+        self._flush_lock = threading.Lock()
+        self._writer = None
+
+    def set_actor(self, email):
+        """The user the following entries are attributed to"""
+        self.actor = email or ""
+
+    def start(self, spreadsheet_id):
+        """Start the writer for the audit worksheet of this spreadsheet (once per process)"""
+        self._spreadsheet_id = spreadsheet_id
+        if self._writer is None:
+            self._writer = threading.Thread(target=self._run, name="audit-writer", daemon=True)
+            self._writer.start()
+        # Entries left over from an earlier session go out first
+        self._wake.set()
+
+    def record(self, action_name, target, before=None, after=None, site=""):
+        """Journal one change; before and after are {field: value} (None for an added or removed item)"""
+        row = [time.strftime("%Y-%m-%d %H:%M:%S"), self.actor, action_name, site, target,
+               json.dumps(before, ensure_ascii=False) if before is not None else "",
+               json.dumps(after, ensure_ascii=False) if after is not None else "",
+               uuid.uuid4().hex]
+        try:
+            self.store.append_audit(row)
+        except Exception as e:
+            # The change itself went through; losing its entry must not undo or fail it
+            print(f"Error writing the audit journal: {e}")
+            return
+        if self.store.audit_pending() >= self.batch:
+            self._wake.set()
+
+    def pending(self):
+        return self.store.audit_pending()
+
+    def flush(self):
+        """Copy the journal entries not yet on the audit worksheet; returns how many were sent"""
+        with self._flush_lock:
+            entries = self.store.audit_entries(self.store.audit_flushed(), limit=MAX_FLUSH_ROWS)
+            if not entries or not self._spreadsheet_id:
+                return 0
+            with action("audit.flush"):
+                sheet = self.worksheet()
+                sheet.append_rows([row for entry_id, row in entries])
+            self.store.mark_audit_flushed(entries[-1][0])
+            self.cache.invalidate()
+            if len(entries) == MAX_FLUSH_ROWS:
+                self._wake.set()
+            return len(entries)
+
+    def worksheet(self):
+        if self.cache.sheet is None:
+            self.cache.set_sheet(get_backend().get_or_create_worksheet(
+                self._spreadsheet_id, AUDIT_SHEET, AUDIT_HEADER, cols=len(AUDIT_HEADER)))
+        return self.cache.sheet
+
+    def entries(self, force=False):
+        """Every entry, newest first: the audit worksheet plus the ones still in the journal"""
+        # Taken before the read: entries flushed meanwhile are then in both, not in neither
+        flushed = self.store.audit_flushed()
+        rows = []
+        try:
+            if self._spreadsheet_id:
+                self.worksheet()
+            rows = self.cache.get_all_values(force=force)
+        except Exception as e:
+            if not is_offline_error(e) and self.cache.sheet is not None:
+                raise
+            print(f"Error reading the audit log, showing the local journal: {e}")
+        if rows and rows[0] == AUDIT_HEADER:
+            rows = rows[1:]
+        rows += [row for entry_id, row in self.store.audit_entries(flushed)]
+
+        entries = []
+        seen = set()
+        for row in rows:
+            row = list(row) + [""] * (len(AUDIT_HEADER) - len(row))
+            if row[ENTRY_COLUMN] in seen:
+                continue
+            if row[ENTRY_COLUMN]:
+                seen.add(row[ENTRY_COLUMN])
+            entries.append(row)
+        # Newest first (the sort is stable, so entries of the same second stay in order)
+        entries.sort(key=lambda row: row[TIME_COLUMN])
+        entries.reverse()
+        return entries
+
+    def _run(self):
+        while True:
+            self._wake.wait(self.interval)
+            self._wake.clear()
+            try:
+                self.flush()
+            except Exception as e:
+                # Kept in the journal for the next round
+                print(f"Error writing the audit log: {e}")
+
+
+def describe_change(row):
+    """The Before and After cells of an entry as one line, e.g. "Quantity: 5 → 3" """
+    before, after = (changed_fields(row[column]) for column in (BEFORE_COLUMN, AFTER_COLUMN))
+    if before is None:
+        return "added " + ", ".join(f"{field}: {value}" for field, value in (after or {}).items())
+    if after is None:
+        return "removed " + ", ".join(f"{field}: {value}" for field, value in before.items())
+    return "; ".join(f"{field}: {before.get(field, '')} → {after.get(field, '')}"
+                     for field in dict.fromkeys(list(before) + list(after)))
+
+
+def changed_fields(text):
+    if not text:
+        return None
+    try:
+        value = json.loads(text)
+    except ValueError:
+        value = None
+    # A cell edited by hand on the sheet is shown as it is
+    return value if isinstance(value, dict) else {"Value": text}
+
+
+# Shared by every window of the application
+audit_log = AuditLog(local_store)
@@ -0,0 +1,83 @@
+"""A simulated Sheets backend: local SQLite worksheets with a fixed delay per call, tallied by name"""
+import threading
+import time
+from collections import Counter
+
+from sqlite_backend import SQLiteBackend
+
+# Properties gspread answers from metadata it already has, not with a request
+LOCAL_ATTRIBUTES = {"id", "title", "row_count", "col_count", "spreadsheet", "backend"}
+
+
+class LatencyBackend:
+    def __init__(self, path, latency=0.1):
+        self.name = "fake"
+        self.latency = latency
+        self.calls = Counter()
+        self.local = SQLiteBackend(path)
+        self._lock = threading.Lock()
+        self._worksheets = {}
+
+    def call(self, name, func, *args, **kwargs):
+        with self._lock:
+            self.calls[name] += 1
+        time.sleep(self.latency)
+        return func(*args, **kwargs)
+
+    def reset_calls(self):
+        with self._lock:
+            self.calls = Counter()
+
+    def connect(self):
+        self.local.connect()
+        return self
+
+    def get_worksheet(self, key, title=None):
+        if (key, title) not in self._worksheets:
+            worksheet = self.call("get_worksheet", self.local.get_worksheet, key, title)
+            self._worksheets[(key, title)] = Recorded(self, worksheet)
+        return self._worksheets[(key, title)]
+
+    def get_or_create_worksheet(self, key, title, header, rows=100, cols=20):
+        if (key, title) not in self._worksheets:
+            worksheet = self.call("get_or_create_worksheet", self.local.get_or_create_worksheet,
+                                  key, title, header, rows, cols)
+            self._worksheets[(key, title)] = Recorded(self, worksheet)
+        return self._worksheets[(key, title)]
+
+    def open_spreadsheet(self, key):
+        return Recorded(self, self.local.open_spreadsheet(key))
+
+    def create_spreadsheet(self, title):
+        return self.call("create_spreadsheet", self.local.create_spreadsheet, title)
+
+    def share_spreadsheet(self, key, email):
+        return True
+
+    def spreadsheet_url(self, key):
+        return self.local.spreadsheet_url(key)
+
+    def probe(self, key):
+        self.call("probe", self.local.probe, key)
+
+    def reset(self):
+        self._worksheets = {}
+
+
+class Recorded:
+    """Wraps a worksheet or spreadsheet so each method call goes through LatencyBackend.call"""
+
+    def __init__(self, backend, target):
+        self._backend = backend
+        self._target = target
+
+    def __getattr__(self, name):
+        value = getattr(self._target, name)
+        if name == "spreadsheet":
+            return Recorded(self._backend, value)
+        if name in LOCAL_ATTRIBUTES or not callable(value):
+            return value
+
+        def method(*args, **kwargs):
+            return self._backend.call(name, value, *args, **kwargs)
+        return method
@@ -0,0 +1,51 @@
+"""Measure how quickly the login window appears and becomes usable
+
+Needs a display (use xvfb-run on a headless machine).
+
+    python benchmarks/startup.py --runs 5 --output startup.json
+"""
+import argparse
+import json
+import os
+import statistics
+import subprocess
+import sys
+import time
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+
+def run_once(timeout):
+    env = dict(os.environ, IMS_STARTUP_BENCHMARK="1", IMS_STARTUP_T0=repr(time.time()))
+    result = subprocess.run([sys.executable, "main.py"], cwd=ROOT, env=env, timeout=timeout,
+                            capture_output=True, text=True)
+    # The report is the last JSON line; anything else is the app's own logging
+    for line in reversed(result.stdout.splitlines()):
+        if line.startswith("{"):
+            return json.loads(line)
+    raise RuntimeError(f"No timing report from main.py:\n{result.stdout}\n{result.stderr}")
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--runs", type=int, default=5)
+    parser.add_argument("--timeout", type=float, default=60)
+    parser.add_argument("--output", help="write the summary as JSON to this file")
+    args = parser.parse_args()
+
+    runs = [run_once(args.timeout) for _ in range(args.runs)]
+    summary = {}
+    for name in ("first_frame", "login_ready"):
+        values = [run[name] for run in runs if name in run]
+        if values:
+            summary[name] = {"median": statistics.median(values), "min": min(values), "max": max(values)}
+
+    for name, stats in summary.items():
+        print(f"{name:12} median {stats['median']:.3f}s  (min {stats['min']:.3f}s, max {stats['max']:.3f}s)")
+    if args.output:
+        with open(args.output, "w") as f:
+            json.dump({"runs": runs, "summary": summary}, f, indent=2)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,267 @@
+"""Benchmark the list views, search and sheet writes against a simulated backend
+
+Needs a display (use xvfb-run on a headless machine), except for usage_analytics.
+Compare against a baseline recorded on the same machine:
+
+    python benchmarks/suite.py --save-baseline /tmp/baseline.json  # on main
+    python benchmarks/suite.py --compare /tmp/baseline.json  # on the branch
+"""
+import argparse
+import json
+import os
+import resource
+import statistics
+import subprocess
+import sys
+import tempfile
+import time
+
+HERE = os.path.dirname(os.path.abspath(__file__))
+ROOT = os.path.dirname(HERE)
+
+SCENARIOS = ("show_all_inventory", "view_user_requests", "show_all_users", "view_inventory",
+             "modify_inventory", "usage_analytics")
+SEARCH_TEXT = "m12"
+REGRESSION_TOLERANCE = 0.2  # Report anything more than 20% slower than the baseline
+
+
+# -- Child process: one scenario -------------------------------------------------
+
+def populate(path, rows):
+    """Fill a SQLite store with inventory, credentials and request rows"""
+    from sqlite_backend import SQLiteBackend
+    from passwords import hash_password
+
+    backend = SQLiteBackend(path)
+    backend.get_worksheet("inventory").append_rows(
+        [["Material", "Quantity"]] + [[f"m{i}", str(i % 500)] for i in range(rows)])
+    password = hash_password("benchmark")
+    backend.get_worksheet("credentials").append_rows(
+        [["Role", "Email", "Password"]] +
+        [["admin" if i == 0 else "user", f"user{i}@example.com", password] for i in range(rows)])
+    backend.get_or_create_worksheet("credentials", "user_assignments", ["Email", "Material", "Quantity", "Date"])
+    backend.get_worksheet("credentials", "user_assignments").append_rows(
+        [[f"user{i % 100}@example.com", f"m{i % 1000}", str(i % 20), f"2024-01-{i % 28 + 1:02d}"]
+         for i in range(rows)])
+    backend.reset()
+
+
+def pump(root, until, timeout=120):
+    """Run the Tk loop until until() is true; returns the seconds it took"""
+    started = time.perf_counter()
+    while not until():
+        root.update()
+        if time.perf_counter() - started > timeout:
+            raise TimeoutError("Scenario did not finish")
+        time.sleep(0.001)
+    return time.perf_counter() - started
+
+
+def newest_toplevel(root):
+    import customtkinter as ctk
+    return [widget for widget in root.winfo_children() if isinstance(widget, ctk.CTkToplevel)][-1]
+
+
+def descendants(widget, kind):
+    found = []
+    for child in widget.winfo_children():
+        if isinstance(child, kind):
+            found.append(child)
+        found.extend(descendants(child, kind))
+    return found
+
+
+def measure_list(root, open_view, searches):
+    """Open a list view, wait for its rows, then type SEARCH_TEXT one key at a time"""
+    import customtkinter as ctk
+    from virtual_list import VirtualList
+
+    started = time.perf_counter()
+    open_view()
+    top = newest_toplevel(root)
+    rows = descendants(top, VirtualList)[0]
+    pump(root, lambda: rows._items)
+    render = time.perf_counter() - started
+
+    entry = descendants(top, ctk.CTkEntry)[0]
+    keystrokes = []
+    for char in SEARCH_TEXT:
+        done = len(searches)
+        entry.insert("end", char)
+        entry._entry.event_generate("<KeyRelease>")
+        pump(root, lambda: len(searches) > done)
+        keystrokes.append(searches[-1])
+    return {"render_ms": render * 1000, "keystroke_ms": summarize(keystrokes)}
+
+
+def run_scenario(scenario, rows, latency):
+    workdir = tempfile.mkdtemp(prefix="ims-bench-")
+    os.chdir(workdir)
+    sys.path.insert(0, ROOT)
+    with open("config(44).json", "w") as f:
+        json.dump({"google_sheets_ids": {"inventory_sheet_id": "inventory",
+                                         "credentials_sheet_id": "credentials"},
+                   "storage": {"backend": "sqlite", "path": "bench.db"}}, f)
+    populate("bench.db", rows)
+
+    import storage
+    from fake_backend import LatencyBackend
+    from search_controller import SearchController
+
+    backend = LatencyBackend("bench.db", latency)
+    storage._backend = backend
+
+    if scenario == "usage_analytics":
+        return measure_analytics(backend)
+
+    # Time every search the views run (filtering plus rendering the result)
+    searches = []
+    run = SearchController._run
+
+    def timed_run(self, *args):
+        started = time.perf_counter()
+        run(self, *args)
+        searches.append((time.perf_counter() - started) * 1000)
+    SearchController._run = timed_run
+
+    import admin_page
+    import user_page
+    notices = []
+    for module in (admin_page, user_page):
+        # Success popups would wait for a click
+        module.show_info = lambda title, message: notices.append(message)
+        module.show_error = lambda title, message: notices.append(message)
+
+    if scenario == "view_inventory":
+        page = user_page.UserPage("user1@example.com", mainloop=False)
+    else:
+        page = admin_page.AdminPage(mainloop=False)
+    root = page.display
+    root.withdraw()
+    pump(root, lambda: True)
+    backend.reset_calls()
+
+    if scenario == "modify_inventory":
+        times = []
+        for i in range(20):
+            done = len(notices)
+            started = time.perf_counter()
+            page.modify_inventory(f"m{i * 7}", str(i))
+            pump(root, lambda: len(notices) > done)
+            times.append((time.perf_counter() - started) * 1000)
+        result = {"write_ms": summarize(times)}
+    else:
+        result = measure_list(root, getattr(page, scenario), searches)
+
+    result["api_calls"] = dict(backend.calls)
+    result["api_calls_total"] = sum(backend.calls.values())
+    # ru_maxrss is in kilobytes on Linux
+    result["peak_rss_mb"] = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / 1024
+    root.destroy()
+    return result
+
+
+def measure_analytics(backend):
+    """Aggregate the request log from scratch, then again after one new request"""
+    from usage_analytics import UsageAnalytics
+
+    rows = backend.get_worksheet("credentials", "user_assignments").get_all_values()
+    analytics = UsageAnalytics(None)
+    started = time.perf_counter()
+    analytics.update(rows)
+    analytics.report()
+    cold = time.perf_counter() - started
+
+    rows.append(["user1@example.com", "m1", "1", time.strftime("%Y-%m-%d")])
+    started = time.perf_counter()
+    analytics.update(rows)
+    analytics.report()
+    incremental = time.perf_counter() - started
+
+    return {"recompute_ms": cold * 1000, "incremental_ms": incremental * 1000, "api_calls": {},
+            "api_calls_total": 0,
+            "peak_rss_mb": resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / 1024}
+
+
+def summarize(values):
+    values = sorted(values)
+    return {"median": statistics.median(values), "p95": values[min(len(values) - 1, int(len(values) * 0.95))],
+            "max": values[-1]}
+
+
+# -- Parent process: run everything and compare ----------------------------------
+
+def run_isolated(scenario, rows, latency, timeout):
+    result = subprocess.run([sys.executable, os.path.abspath(__file__), "--child", scenario,
+                             "--rows", str(rows), "--latency", str(latency)],
+                            timeout=timeout, capture_output=True, text=True)
+    # The result is the last JSON line; anything else is the app's own logging
+    for line in reversed(result.stdout.splitlines()):
+        if line.startswith("{"):
+            return json.loads(line)
+    raise RuntimeError(f"No result from {scenario} ({rows} rows):\n{result.stdout}\n{result.stderr}")
+
+
+def headline(result):
+    """The one timing a scenario is judged by"""
+    if "write_ms" in result:
+        return result["write_ms"]["median"]
+    if "recompute_ms" in result:
+        return result["recompute_ms"]
+    return result["render_ms"]
+
+
+def compare(results, baseline):
+    regressions = []
+    for key, result in results.items():
+        if key not in baseline:
+            print(f"{key}: not in the baseline, not compared")
+            continue
+        old, new = headline(baseline[key]), headline(result)
+        if new > old * (1 + REGRESSION_TOLERANCE):
+            regressions.append(f"{key}: {old:.0f} ms -> {new:.0f} ms")
+        if result["api_calls_total"] > baseline[key]["api_calls_total"]:
+            regressions.append(f"{key}: {baseline[key]['api_calls_total']} -> "
+                               f"{result['api_calls_total']} API calls")
+    return regressions
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--scenarios", nargs="+", choices=SCENARIOS, default=list(SCENARIOS))
+    parser.add_argument("--rows", nargs="+", type=int, default=[1000, 10000, 100000])
+    parser.add_argument("--latency", type=float, default=100, help="milliseconds added to every API call")
+    parser.add_argument("--timeout", type=float, default=600)
+    parser.add_argument("--save-baseline", help="write the results to this JSON file")
+    parser.add_argument("--compare", help="compare against a baseline JSON file")
+    parser.add_argument("--child", choices=SCENARIOS, help=argparse.SUPPRESS)
+    args = parser.parse_args()
+
+    if args.child:
+        print(json.dumps(run_scenario(args.child, args.rows[0], args.latency / 1000)))
+        return
+
+    results = {}
+    for rows in args.rows:
+        for scenario in args.scenarios:
+            key = f"{scenario}/{rows}"
+            results[key] = result = run_isolated(scenario, rows, args.latency, args.timeout)
+            keystrokes = (f"  keystroke {result['keystroke_ms']['median']:.1f} ms"
+                          if "keystroke_ms" in result else "")
+            print(f"{key:28} {headline(result):8.0f} ms{keystrokes}  "
+                  f"{result['api_calls_total']:4} calls  {result['peak_rss_mb']:.0f} MB")
+
+    if args.save_baseline:
+        with open(args.save_baseline, "w") as f:
+            json.dump(results, f, indent=2)
+    if args.compare:
+        with open(args.compare) as f:
+            regressions = compare(results, json.load(f))
+        for regression in regressions:
+            print(f"REGRESSION {regression}")
+        if regressions:
+            sys.exit(1)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,293 @@
+import csv
+import re
+
+# openpyxl is optional: without it only CSV files can be imported
+try:
+    import openpyxl
+except ImportError:
+    openpyxl = None
+
+from inventory_model import (QUANTITY_COLUMN, REORDER_COLUMN, LEAD_TIME_COLUMN, checked_number, format_quantity,
+                             parse_quantity)
+from local_store import local_store
+from low_stock import add_reorder_header
+from passwords import hash_password, verify_password
+from staged_changes import cell_value
+
+# Rows per batchUpdate: a 4,000-row import is four requests
+CHUNK_ROWS = 1000
+
+# Shown instead of a stored password hash
+PASSWORD_MASK = "••••••"
+
+EMAIL = re.compile(r"^[^@\s]+@[^@\s]+\.[^@\s]+$")
+ROLES = ("admin", "user")
+
+# Header names accepted for each field (compared in lower case)
+INVENTORY_FIELDS = {
+    "name": ("material", "material name", "name", "sku"),
+    "quantity": ("quantity", "qty"),
+    "reorder_point": ("reorder point", "reorder"),
+    "lead_time": ("lead time (days)", "lead time", "lead time days"),
+}
+USER_FIELDS = {
+    "role": ("role",),
+    "email": ("email", "username", "username (email)"),
+    "password": ("password",),
+}
+
+# Sheet columns (0-based) of each field
+INVENTORY_COLUMNS = {"name": 0, "quantity": QUANTITY_COLUMN, "reorder_point": REORDER_COLUMN,
+                     "lead_time": LEAD_TIME_COLUMN}
+USER_COLUMNS = {"role": 0, "email": 1, "password": 2}
+
+
+class ImportFileError(Exception):
+    """The file cannot be read as an import (wrong format, missing columns)"""
+
+
+def iter_file_rows(path):
+    """Yield the rows of a CSV or XLSX file as lists of text, one at a time"""
+    if path.lower().endswith((".xlsx", ".xlsm")):
+        if openpyxl is None:
+            raise ImportFileError("Reading Excel files needs the openpyxl package; save the file as CSV instead")
+        workbook = openpyxl.load_workbook(path, read_only=True, data_only=True)
+        try:
+            for row in workbook.active.iter_rows(values_only=True):
+                yield [cell_text(value) for value in row]
+        finally:
+            workbook.close()
+        return
+
+    with open(path, newline="", encoding="utf-8-sig") as file:
+        sample = file.read(4096)
+        file.seek(0)
+        try:
+            dialect = csv.Sniffer().sniff(sample, delimiters=",;\t")
+        except csv.Error:
+            dialect = csv.excel
+        yield from csv.reader(file, dialect)
+
+
+def cell_text(value):
+    """An Excel cell value as the text a user would have typed (12.0 -> "12")"""
+    if value is None:
+        return ""
+    if isinstance(value, float):
+        return format_quantity(value)
+    return str(value)
+
+
+def read_records(path, fields, required):
+    """Yield (line number, {field: text}) for every non-blank row under the header"""
+    rows = iter_file_rows(path)
+    header = [name.strip().lower() for name in next(rows, [])]
+    columns = {}
+    for field, names in fields.items():
+        for name in names:
+            if name in header:
+                columns[field] = header.index(name)
+                break
+    missing = [field for field in required if field not in columns]
+    if missing:
+        raise ImportFileError(f"The first row must name the {', '.join(fields[field][0] for field in missing)} "
+                              f"column{'s' if len(missing) > 1 else ''}")
+
+    for line, row in enumerate(rows, start=2):
+        record = {field: row[column].strip() if column < len(row) else "" for field, column in columns.items()}
+        if any(record.values()):
+            yield line, record
+
+
+class BulkImport:
+    """One file of materials or users: plan() is the dry run, apply() writes it in chunked batches"""
+
+    def __init__(self, kind, path, add_quantities=False):
+        if kind not in ("inventory", "users"):
+            raise ValueError(f"Unknown import: {kind}")
+        self.kind = kind
+        self.path = path
+        self.add_quantities = add_quantities
+        self.records = None
+        self._password_checks = {}  # (password, stored hash) -> whether they match
+
+    @property
+    def columns(self):
+        return INVENTORY_COLUMNS if self.kind == "inventory" else USER_COLUMNS
+
+    def read(self):
+        if self.kind == "inventory":
+            self.records = list(read_records(self.path, INVENTORY_FIELDS, ("name",)))
+        else:
+            self.records = list(read_records(self.path, USER_FIELDS, ("email",)))
+        return self.records
+
+    def plan(self, cache, force=False):
+        """Decide every record against the cached rows: {"entries": [...], "counts": {...}}"""
+        if self.records is None:
+            self.read()
+        rows = cache.get_all_values(force=force)
+
+        entries = []
+        seen = {}
+        for line, record in self.records:
+            key = record.get("name" if self.kind == "inventory" else "email", "")
+            entry = {"line": line, "key": key, "action": "error", "row": cache.find_row(key) if key else None,
+                     "changes": {}, "error": None}
+            entries.append(entry)
+            if key and key in seen:
+                entry["error"] = f"Duplicate of line {seen[key]}"
+                continue
+            seen[key] = line
+            try:
+                values = self._values(record, key)
+            except ValueError as e:
+                entry["error"] = str(e)
+                continue
+
+            if entry["row"] is None:
+                if self.kind == "inventory" and not values.get(QUANTITY_COLUMN):
+                    entry["error"] = "A new material needs a quantity"
+                    continue
+                if self.kind == "users" and not values.get(USER_COLUMNS["password"]):
+                    entry["error"] = "A new user needs a password"
+                    continue
+                if self.kind == "users":
+                    values.setdefault(USER_COLUMNS["role"], "user")
+                entry["action"] = "add"
+                entry["changes"] = {column: ("", value) for column, value in values.items()}
+                continue
+
+            current = entry["current"] = list(rows[entry["row"] - 1])
+            for column, value in values.items():
+                old = current[column] if len(current) > column else ""
+                if column == QUANTITY_COLUMN and self.kind == "inventory" and self.add_quantities:
+                    if parse_quantity(old) is None:
+                        entry["error"] = f"The stock of {key} is not a number"
+                        break
+                    value = format_quantity(parse_quantity(old) + parse_quantity(value))
+                if column == USER_COLUMNS["password"] and self.kind == "users":
+                    # The sheet holds a hash: the password only changes if it does not match
+                    if old and self._same_password(value, old):
+                        continue
+                    old = PASSWORD_MASK if old else ""
+                if value != old:
+                    entry["changes"][column] = (old, value)
+            if entry["error"] is None:
+                entry["action"] = "update" if entry["changes"] else "unchanged"
+
+        counts = {"add": 0, "update": 0, "unchanged": 0, "error": 0}
+        for entry in entries:
+            counts[entry["action"]] += 1
+        return {"entries": entries, "counts": counts}
+
+    def _same_password(self, password, stored):
+        # Hashing is slow on purpose; apply() plans again with the same file
+        if (password, stored) not in self._password_checks:
+            self._password_checks[password, stored] = verify_password(password, stored)
+        return self._password_checks[password, stored]
+
+    def _values(self, record, key):
+        """The sheet values (by 0-based column) the record sets, raising ValueError if one is invalid"""
+        values = {}
+        if self.kind == "inventory":
+            if not key:
+                raise ValueError("Material name is empty")
+            values[0] = key
+            for field, label, minimum in (("quantity", "Quantity", None), ("reorder_point", "Reorder point", 0),
+                                          ("lead_time", "Lead time", 0)):
+                value = checked_number(label, record.get(field, ""), minimum=minimum)
+                if value:
+                    values[INVENTORY_COLUMNS[field]] = value
+            return values
+
+        if not EMAIL.match(key):
+            raise ValueError(f"Invalid email: {key}" if key else "Email is empty")
+        values[USER_COLUMNS["email"]] = key
+        role = record.get("role", "").lower()
+        if role and role not in ROLES:
+            raise ValueError(f"Invalid role: {role}")
+        if role:
+            values[USER_COLUMNS["role"]] = role
+        if record.get("password"):
+            values[USER_COLUMNS["password"]] = record["password"]
+        return values
+
+    def apply(self, cache):
+        """Plan against a fresh read of the sheet and write it; returns the plan with a status per entry"""
+        if local_store.pending_count():
+            raise RuntimeError("Sync the changes made offline before importing")
+        if cache.sheet is None:
+            raise RuntimeError("Sheet not available")
+        plan = self.plan(cache, force=True)
+        writes = [entry for entry in plan["entries"] if entry["action"] in ("add", "update")]
+
+        if self.kind == "users":
+            password = USER_COLUMNS["password"]
+            for entry in writes:
+                if password in entry["changes"]:
+                    old, new = entry["changes"][password]
+                    entry["changes"][password] = (old, hash_password(new))
+
+        if self.kind == "inventory" and any(REORDER_COLUMN in entry["changes"] or LEAD_TIME_COLUMN in entry["changes"]
+                                            for entry in writes):
+            add_reorder_header(cache)
+
+        sheet = cache.sheet
+        written = 0
+        try:
+            for batch in chunked(writes, CHUNK_ROWS):
+                sheet.spreadsheet.batch_update({"requests": self.build_requests(batch, sheet.id)})
+                for entry in batch:
+                    entry["status"] = "Imported"
+                written += len(batch)
+        except Exception as e:
+            # Each batch is all-or-nothing: the ones before the failure went through
+            for entry in writes[written:]:
+                entry["error"] = f"Batch failed: {e}"
+
+        # Read the result back so the cache (and the low-stock monitor) see the import
+        try:
+            cache.get_all_values(force=True)
+        except Exception as e:
+            print(f"Error reloading {cache.name}: {e}")
+            cache.invalidate()
+
+        plan["written"] = written
+        return plan
+
+    def build_requests(self, entries, sheet_id):
+        """updateCells requests for the updated rows and one appendCells for the added ones"""
+        requests = []
+        for entry in entries:
+            if entry["action"] != "update":
+                continue
+            # One range from the first to the last changed column of the row
+            first, last = min(entry["changes"]), max(entry["changes"])
+            requests.append({"updateCells": {
+                "range": {"sheetId": sheet_id, "startRowIndex": entry["row"] - 1, "endRowIndex": entry["row"],
+                          "startColumnIndex": first, "endColumnIndex": last + 1},
+                "rows": [{"values": [self._cell(entry, column) for column in range(first, last + 1)]}],
+                "fields": "userEnteredValue"}})
+
+        appended = [{"values": [self._cell(entry, column) for column in range(max(entry["changes"]) + 1)]}
+                    for entry in entries if entry["action"] == "add"]
+        if appended:
+            requests.append({"appendCells": {"sheetId": sheet_id, "rows": appended,
+                                             "fields": "userEnteredValue"}})
+        return requests
+
+    def _cell(self, entry, column):
+        if column in entry["changes"]:
+            value = entry["changes"][column][1]
+        else:
+            # A column between two changed ones keeps its value
+            current = entry.get("current", [])
+            value = current[column] if len(current) > column else ""
+        numeric = self.kind == "inventory" and column != INVENTORY_COLUMNS["name"]
+        return cell_value(value, text=not numeric)
+
+
+def chunked(items, size):
+    for start in range(0, len(items), size):
+        yield items[start:start + size]
@@ -2,13 +2,59 @@
 import json
 import os
 
+# Name of the site an older single-warehouse configuration becomes
+DEFAULT_SITE = "Main"
+
+
+def sheet_id_from_url(value):
+    """The spreadsheet ID in a Google Sheets URL (a bare ID is returned as it is)"""
+    value = value.strip()
+    if '/d/' in value:
+        return value.split('/d/')[1].split('/')[0]
+    return value
+
+
 class Config:
+    """Settings from config(44).json; every site has its own inventory spreadsheet"""
+
     def __init__(self):
         self.load_config()
 
     def get_inventory_sheet_id(self):
         return self.inventory_sheet_id
 
+    def get_sites(self):
+        """Site names, in the order they were added"""
+        return list(self.sites)
+
+    def get_active_site(self):
+        return self.active_site
+
+    def get_site_inventory_id(self, site):
+        return self.sites[site]["inventory_sheet_id"]
+
+    def set_active_site(self, site):
+        if site not in self.sites:
+            raise KeyError(f"Unknown site: {site}")
+        self.active_site = site
+        self.inventory_sheet_id = self.sites[site]["inventory_sheet_id"]
+        self.inventory_url = self.sites[site]["inventory_url"]
+        self.save()
+
+    def save_site(self, site, inventory_sheet_id, inventory_url=""):
+        """Add a site, or point an existing one at another inventory spreadsheet"""
+        self.sites[site] = {"inventory_sheet_id": inventory_sheet_id, "inventory_url": inventory_url}
+        if site == self.active_site:
+            self.inventory_sheet_id = inventory_sheet_id
+            self.inventory_url = inventory_url
+        self.save()
+
+    def remove_site(self, site):
+        if site == self.active_site:
+            raise ValueError("The active site cannot be removed; switch to another site first")
+        self.sites.pop(site, None)
+        self.save()
+
     def get_credentials_sheet_id(self):
         return self.credentials_sheet_id
 
@@ -18,21 +64,56 @@ class Config:
     def get_credentials_url(self):
         return self.credentials_url
 
+    def get_storage_backend(self):
+        """"sheets" (Google Sheets, the default) or "sqlite" (a local file)"""
+        return self.storage_backend
+
+    def get_storage_path(self):
+        return self.storage_path
+
+    def get_client_instances(self):
+        """How many copies of the app share the service account (each keeps to its share of the quota)"""
+        return self.client_instances
+
     def save_sheet_urls(self, inventory_url, credentials_url):
         self.inventory_url = inventory_url
         self.credentials_url = credentials_url
+        self.save()
+
+    def save_sheets(self, inventory_sheet_id, credentials_sheet_id, inventory_url, credentials_url):
+        self.inventory_sheet_id = inventory_sheet_id
+        self.credentials_sheet_id = credentials_sheet_id
+        self.save_sheet_urls(inventory_url, credentials_url)
+
+    def save(self):
+        # The active site's inventory is also kept in google_sheets_ids for older versions
+        self.sites[self.active_site] = {"inventory_sheet_id": self.inventory_sheet_id,
+                                        "inventory_url": self.inventory_url}
         config_data = {
             "google_sheets_ids": {
                 "inventory_sheet_id": self.inventory_sheet_id,
                 "credentials_sheet_id": self.credentials_sheet_id,
-                "inventory_url": inventory_url,
-                "credentials_url": credentials_url
+                "inventory_url": self.inventory_url,
+                "credentials_url": self.credentials_url
+            },
+            "sites": self.sites,
+            "active_site": self.active_site,
+            "storage": {
+                "backend": self.storage_backend,
+                "path": self.storage_path
+            },
+            "quota": {
+                "instances": self.client_instances
             }
         }
         with open('config(44).json', 'w') as f:
             json.dump(config_data, f, indent=2)
 
     def load_config(self):
+        self.storage_backend = "sheets"
+        self.storage_path = "local_sheets.db"
+        self.client_instances = 1
+        config_data = {}
         try:
             if os.path.exists('config(44).json'):
                 with open('config(44).json', 'r') as f:
@@ -42,12 +123,16 @@ class Config:
                     self.credentials_sheet_id = google_sheets_ids.get("credentials_sheet_id", "")
                     self.inventory_url = google_sheets_ids.get("inventory_url", "")
                     self.credentials_url = google_sheets_ids.get("credentials_url", "")
+                    storage = config_data.get("storage", {})
+                    self.storage_backend = storage.get("backend", "sheets")
+                    self.storage_path = storage.get("path", "local_sheets.db")
+                    self.client_instances = max(1, int(config_data.get("quota", {}).get("instances", 1)))
                     
                     # Extract sheet IDs from URLs if IDs are empty
                     if not self.inventory_sheet_id and self.inventory_url:
-                        self.inventory_sheet_id = self.inventory_url.split('/d/')[1].split('/')[0]
+                        self.inventory_sheet_id = sheet_id_from_url(self.inventory_url)
                     if not self.credentials_sheet_id and self.credentials_url:
-                        self.credentials_sheet_id = self.credentials_url.split('/d/')[1].split('/')[0]
+                        self.credentials_sheet_id = sheet_id_from_url(self.credentials_url)
             else:
                 self.inventory_sheet_id = ""
                 self.credentials_sheet_id = ""
@@ -59,3 +144,21 @@ class Config:
             self.credentials_sheet_id = ""
             self.inventory_url = ""
             self.credentials_url = ""
+            config_data = {}
+        self.load_sites(config_data)
+
+    def load_sites(self, config_data):
+        """The named sites; a configuration without them is one site, DEFAULT_SITE"""
+        self.sites = {}
+        for site, sheets in (config_data.get("sites") or {}).items():
+            url = sheets.get("inventory_url", "")
+            self.sites[site] = {"inventory_sheet_id": sheets.get("inventory_sheet_id") or sheet_id_from_url(url),
+                                "inventory_url": url}
+        if not self.sites:
+            self.sites[DEFAULT_SITE] = {"inventory_sheet_id": self.inventory_sheet_id,
+                                        "inventory_url": self.inventory_url}
+        self.active_site = config_data.get("active_site")
+        if self.active_site not in self.sites:
+            self.active_site = next(iter(self.sites))
+        self.inventory_sheet_id = self.sites[self.active_site]["inventory_sheet_id"]
+        self.inventory_url = self.sites[self.active_site]["inventory_url"]
@@ -51,8 +51,8 @@ class ConfigWindow:
         try:
             if os.path.exists('credentials.json'):
                 from sheets_manager import GoogleSheetsManager
-                manager = GoogleSheetsManager('credentials.json')
-                sheet = manager.client.open_by_key(self.config.get_credentials_sheet_id()).sheet1
+                manager = GoogleSheetsManager()
+                sheet = manager.backend.get_worksheet(self.config.get_credentials_sheet_id())
                 admins = [row for row in sheet.get_all_values()[1:] if row[0].lower() == 'admin']
                 has_admin = len(admins) > 0
         except Exception:
@@ -181,7 +181,7 @@ class ConfigWindow:
 
         try:
             from sheets_manager import GoogleSheetsManager
-            manager = GoogleSheetsManager('credentials.json')
+            manager = GoogleSheetsManager()
             sheet_ids = manager.create_and_share_sheets(email, password)
 
             if sheet_ids:
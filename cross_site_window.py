@@ -0,0 +1,91 @@
+import customtkinter as ctk
+
+from inventory_model import format_quantity
+from search_controller import SearchController
+from sheets_worker import sheets_executor
+from sites import site_inventories
+from virtual_list import VirtualList
+
+
+class CrossSiteWindow:
+    """Every material with its quantity at each site and the total, read from all sites at once"""
+
+    def __init__(self, root, config):
+        self.config = config
+        self.sites = config.get_sites()
+        self.top = ctk.CTkToplevel(root)
+        self.top.title("All Sites Inventory")
+        self.top.geometry(f"{max(600, 320 + 100 * len(self.sites))}x600")
+
+        ctk.CTkLabel(self.top, text="All Sites Inventory", font=("Helvetica", 18, 'bold'),
+                     text_color="#4CAF50").pack(pady=10)
+
+        controls_frame = ctk.CTkFrame(self.top, fg_color="transparent")
+        controls_frame.pack(pady=5)
+        self.search_var = ctk.StringVar()
+        search_entry = ctk.CTkEntry(controls_frame, textvariable=self.search_var,
+                                    placeholder_text="🔍 Search Materials", width=250)
+        search_entry.pack(side="left", padx=5)
+        ctk.CTkButton(controls_frame, text="Refresh", command=lambda: self.load(force=True), width=100,
+                      fg_color="#2196F3", text_color="white").pack(side="left", padx=5)
+
+        self.columns = [("Material", 180), ("Total", 80)] + [(site, 90) for site in self.sites]
+        header_frame = ctk.CTkFrame(self.top, fg_color="#333333", height=40)
+        header_frame.pack(fill="x", padx=10, pady=(10, 0))
+        for text, width in self.columns:
+            ctk.CTkLabel(header_frame, text=text + (" ●" if text == config.get_active_site() else ""),
+                         font=("Helvetica", 12, "bold"), text_color="#ffffff", width=width).pack(side="left", padx=5)
+
+        self.items_list = VirtualList(self.top, self.make_row, self.bind_row, row_height=36)
+        self.items_list.pack(fill="both", expand=True, padx=10, pady=(10, 0))
+
+        self.summary_label = ctk.CTkLabel(self.top, text="", font=("Helvetica", 11), text_color="#888888")
+        self.summary_label.pack(pady=5)
+
+        self.search = SearchController(self.top, self.render, text_func=lambda item: item["name"])
+        search_entry.bind("<KeyRelease>", lambda event: self.search.schedule(self.search_var.get()))
+        self.load()
+
+    def make_row(self, parent):
+        row_frame = ctk.CTkFrame(parent, corner_radius=5)
+        row_frame.labels = []
+        for text, width in self.columns:
+            label = ctk.CTkLabel(row_frame, text="", font=("Helvetica", 12), text_color="#ffffff",
+                                 width=width, anchor="w")
+            label.pack(side="left", padx=5)
+            row_frame.labels.append(label)
+        return row_frame
+
+    def bind_row(self, row_frame, item, index):
+        row_frame.configure(fg_color="#04090a" if index % 2 == 0 else "#0a0f10")
+        # A dash where the site does not stock the material
+        values = [item["name"], format_quantity(item["total"])] + [item["sites"].get(site, "—") for site in self.sites]
+        for label, value in zip(row_frame.labels, values):
+            label.configure(text=value)
+
+    def render(self, items):
+        self.items_list.set_rows(items, empty_text="No materials at any site" if not self.search.rows
+                                 else "No matching materials")
+
+    def load(self, force=False):
+        self.items_list.show_message("Reading every site...")
+        sheets_executor.submit(site_inventories.read_all, self.config, force,
+                               on_success=self.loaded, on_error=self.failed)
+
+    def loaded(self, result):
+        if not self.top.winfo_exists():
+            return
+        slowest = max(result["timings"].values(), default=0)
+        text = (f"{len(result['items'])} materials · {len(result['timings'])} of {len(result['sites'])} sites · "
+                f"slowest site {slowest:.0f} ms · all sites {result['elapsed_ms']:.0f} ms")
+        if result["offline"]:
+            text += f" · offline copy: {', '.join(result['offline'])}"
+        if result["errors"]:
+            text += f" · not read: {', '.join(result['errors'])}"
+        self.summary_label.configure(text=text, text_color="#F44336" if result["errors"] else "#888888")
+        self.search.set_rows(result["items"])
+        self.search.run_now(self.search_var.get())
+
+    def failed(self, e):
+        if self.top.winfo_exists():
+            self.items_list.show_message(f"Error: {e}", text_color="#F44336")
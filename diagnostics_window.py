@@ -0,0 +1,104 @@
+import time
+
+import customtkinter as ctk
+
+from api_trace import api_tracer
+from custom_messagebox import show_info, show_error
+
+SHORTCUT = "<Control-Shift-D>"
+REFRESH_INTERVAL = 2000
+RECENT_CALLS = 200
+
+
+def bind_diagnostics(root):
+    """Open the API diagnostics window with Ctrl+Shift+D from any window of root"""
+    root.bind_all(SHORTCUT, lambda event: DiagnosticsWindow(root))
+
+
+class DiagnosticsWindow:
+    """Hidden window listing the traced Sheets API requests, per UI action and one by one"""
+
+    def __init__(self, root):
+        self.top = ctk.CTkToplevel(root)
+        self.top.title("API Diagnostics")
+        self.top.geometry("900x600")
+
+        self.totals_label = ctk.CTkLabel(self.top, text="", font=("Helvetica", 14, "bold"),
+                                         text_color="#4CAF50")
+        self.totals_label.pack(pady=(10, 5))
+
+        ctk.CTkLabel(self.top, text="Requests per action", font=("Helvetica", 12, "bold"),
+                     text_color="#ffffff").pack(anchor="w", padx=10)
+        self.summary_box = ctk.CTkTextbox(self.top, height=160, font=("Courier", 12), wrap="none")
+        self.summary_box.pack(fill="x", padx=10, pady=(0, 10))
+
+        ctk.CTkLabel(self.top, text=f"Last {RECENT_CALLS} requests", font=("Helvetica", 12, "bold"),
+                     text_color="#ffffff").pack(anchor="w", padx=10)
+        self.calls_box = ctk.CTkTextbox(self.top, font=("Courier", 11), wrap="none")
+        self.calls_box.pack(fill="both", expand=True, padx=10)
+
+        button_frame = ctk.CTkFrame(self.top, fg_color="transparent")
+        button_frame.pack(pady=10)
+        ctk.CTkButton(button_frame, text="Export JSONL", command=self.export, width=120,
+                      fg_color="#009688").pack(side="left", padx=5)
+        ctk.CTkButton(button_frame, text="Clear", command=self.clear, width=120,
+                      fg_color="#F44336").pack(side="left", padx=5)
+        ctk.CTkButton(button_frame, text="Close", command=self.top.destroy, width=120).pack(side="left", padx=5)
+
+        self.refresh()
+        self.top.after(REFRESH_INTERVAL, self.tick)
+
+    def tick(self):
+        if self.top.winfo_exists():
+            self.refresh()
+            self.top.after(REFRESH_INTERVAL, self.tick)
+
+    def refresh(self):
+        calls = api_tracer.calls()
+        self.totals_label.configure(text=f"{api_tracer.total()} requests since start, "
+                                         f"{len(calls)} in the buffer")
+
+        lines = [f"{'Action':36} {'Requests':>8} {'Sent':>10} {'Received':>10} {'Total ms':>10} "
+                 f"{'Slowest':>9} {'Errors':>6}"]
+        for stats in api_tracer.summary():
+            lines.append(f"{stats['action'][:36]:36} {stats['requests']:>8} {stats['sent']:>10} "
+                         f"{stats['received']:>10} {stats['latency_ms']:>10.0f} {stats['slowest_ms']:>9.0f} "
+                         f"{stats['errors']:>6}")
+        self.set_text(self.summary_box, lines)
+
+        lines = []
+        for call in reversed(calls[-RECENT_CALLS:]):
+            status = call["status"] if call["status"] is not None else "ERR" if call["error"] else ""
+            lines.append(f"{time.strftime('%H:%M:%S', time.localtime(call['time']))} "
+                         f"{call['method']:6} {str(status):>4} {call['latency_ms']:>7.0f} ms "
+                         f"{call['received']:>9} B  {call['action'][:30]:30} {call['target']}")
+        self.set_text(self.calls_box, lines)
+
+    @staticmethod
+    def set_text(box, lines):
+        box.configure(state="normal")
+        box.delete("1.0", "end")
+        box.insert("1.0", "\n".join(lines))
+        box.configure(state="disabled")
+
+    def export(self):
+        from tkinter import filedialog
+
+        file_path = filedialog.asksaveasfilename(
+            parent=self.top,
+            defaultextension=".jsonl",
+            filetypes=[("JSON Lines", "*.jsonl"), ("All files", "*.*")],
+            initialfile=f"api_trace_{time.strftime('%Y%m%d_%H%M%S')}.jsonl"
+        )
+        if not file_path:
+            return
+        try:
+            count = api_tracer.export_jsonl(file_path)
+        except OSError as e:
+            show_error("Error", f"Could not export the trace: {e}")
+            return
+        show_info("Exported", f"{count} requests written to {file_path}")
+
+    def clear(self):
+        api_tracer.clear()
+        self.refresh()
@@ -0,0 +1,193 @@
+import random
+import threading
+import time
+from collections import deque
+
+from api_trace import action
+from local_store import is_offline_error
+
+# Upper bounds (ms) of the latency histogram buckets; the last bucket is open
+LATENCY_BUCKETS = (100, 200, 400, 800, 1600)
+SPARK_CHARS = "▁▂▃▄▅▆▇█"
+
+
+def status_code(error):
+    """The HTTP status of a gspread APIError (or similar), or None"""
+    response = getattr(error, "response", None)
+    return getattr(response, "status_code", None)
+
+
+class HealthMonitor:
+    """Connection health from the requests the app makes, probing only when idle"""
+
+    def __init__(self, window=200, idle_probe=60, base_backoff=5, max_backoff=600, tick=1000):
+        self.idle_probe = idle_probe
+        self.base_backoff = base_backoff
+        self.max_backoff = max_backoff
+        self.tick = tick
+        self._samples = deque(maxlen=window)  # (time, latency in s, ok, throttled)
+        self._lock = threading.Lock()
+        self._failures = 0
+        self._last_error = None
+        self._last_traffic = 0.0
+        self._next_probe = 0.0
+        self._version = 0
+        self._published = -1
+        self._probing = False
+        self._root = None
+        self._probe = None
+        self._listeners = []
+
+    def record(self, latency, error=None):
+        """Report one request (called from worker threads)"""
+        throttled = status_code(error) == 429
+        # Only errors about the connection itself count; a 404 means Google answered
+        failed = error is not None and (is_offline_error(error) or throttled
+                                        or (status_code(error) or 0) >= 500)
+        now = time.monotonic()
+        with self._lock:
+            self._samples.append((now, latency, not failed, throttled))
+            self._last_traffic = now
+            if failed:
+                self._failures += 1
+                self._last_error = error
+                delay = min(self.base_backoff * 2 ** (self._failures - 1), self.max_backoff)
+                self._next_probe = now + delay * random.uniform(0.8, 1.2)
+            else:
+                self._failures = 0
+                self._last_error = None
+                self._next_probe = now + self.idle_probe
+            self._version += 1
+
+    def status(self):
+        """A snapshot: state, latency percentiles, error rate, 429 count and histogram"""
+        with self._lock:
+            samples = list(self._samples)
+            failures = self._failures
+            last_error = self._last_error
+            last_traffic = self._last_traffic
+
+        if not samples:
+            state = "unknown"
+        elif failures and is_offline_error(last_error):
+            state = "offline"
+        elif failures:
+            state = "degraded"
+        else:
+            recent = samples[-20:]
+            errors = sum(1 for sample in recent if not sample[2])
+            state = "degraded" if errors / len(recent) > 0.2 else "connected"
+
+        latencies = sorted(sample[1] * 1000 for sample in samples if sample[2])
+        histogram = [0] * (len(LATENCY_BUCKETS) + 1)
+        for latency in latencies:
+            histogram[sum(1 for bound in LATENCY_BUCKETS if latency >= bound)] += 1
+
+        return {
+            "state": state,
+            "requests": len(samples),
+            "error_rate": sum(1 for sample in samples if not sample[2]) / len(samples) if samples else 0.0,
+            "throttled": sum(1 for sample in samples if sample[3]),
+            "p50": percentile(latencies, 50),
+            "p95": percentile(latencies, 95),
+            "histogram": histogram,
+            "last_error": str(last_error) if last_error else None,
+            "idle": time.monotonic() - last_traffic if samples else None,
+        }
+
+    def attach(self, root, probe=None):
+        """Publish through this Tk root (each page creates its own) and use probe() when idle"""
+        self._root = root
+        self._probe = probe
+        self._listeners = []
+        self._published = -1
+        root.after(self.tick, lambda: self._poll(root))
+
+    def add_listener(self, callback):
+        """Call callback(status) on the main thread whenever the health changes"""
+        self._listeners.append(callback)
+        callback(self.status())
+
+    def probe_now(self):
+        """Probe right away (e.g. the user asked to test the connection)"""
+        with self._lock:
+            self._next_probe = 0.0
+
+    def _poll(self, root):
+        if root is not self._root:
+            return  # A newer page took over
+        try:
+            root.after(self.tick, lambda: self._poll(root))
+        except Exception:
+            # The root window was destroyed
+            self._root = None
+            return
+
+        now = time.monotonic()
+        with self._lock:
+            # Real traffic keeps pushing the next probe back
+            due = self._probe is not None and not self._probing and now >= self._next_probe
+            version = self._version
+        if due:
+            self._start_probe()
+        if version != self._published:
+            self._published = version
+            status = self.status()
+            for callback in list(self._listeners):
+                try:
+                    callback(status)
+                except Exception:
+                    # The widget behind this listener is gone
+                    self._listeners.remove(callback)
+
+    def _start_probe(self):
+        from sheets_worker import sheets_executor
+
+        def done(result):
+            self._probing = False
+
+        def failed(e):
+            self._probing = False
+            with self._lock:
+                if self._next_probe <= time.monotonic():
+                    # Failed before any request was made (no credentials, no config)
+                    self._failures += 1
+                    self._next_probe = time.monotonic() + min(
+                        self.base_backoff * 2 ** (self._failures - 1), self.max_backoff)
+
+        self._probing = True
+        with action("health.probe"):
+            sheets_executor.submit(self._probe, on_success=done, on_error=failed)
+
+
+def percentile(values, p):
+    """The p-th percentile of sorted values, or None if there are none"""
+    if not values:
+        return None
+    return values[min(len(values) - 1, int(len(values) * p / 100))]
+
+
+def describe(status):
+    """Footer text and colour for a status"""
+    state = status["state"]
+    if state == "unknown":
+        return "● Checking connection...", "#888888"
+    if state == "offline":
+        return "● Offline", "#F44336"
+
+    text = "● Connected" if state == "connected" else "● Degraded"
+    if status["p50"] is not None:
+        text += f"  p50 {status['p50']:.0f} ms · p95 {status['p95']:.0f} ms  {sparkline(status['histogram'])}"
+    if status["throttled"]:
+        text += f"  {status['throttled']}× rate limited"
+    return text, "#4CAF50" if state == "connected" else "#FF9800"
+
+
+def sparkline(histogram):
+    peak = max(histogram) or 1
+    return "".join(SPARK_CHARS[round(count / peak * (len(SPARK_CHARS) - 1))] if count else " "
+                   for count in histogram)
+
+
+# Shared by every window of the application
+health_monitor = HealthMonitor()
@@ -0,0 +1,229 @@
+import math
+import re
+from array import array
+
+# numpy is optional: with it, filters, sorts and totals run on whole columns at once
+try:
+    import numpy as np
+except ImportError:
+    np = None
+
+NAME_COLUMN = 0
+QUANTITY_COLUMN = 1
+REORDER_COLUMN = 2
+LEAD_TIME_COLUMN = 3
+REORDER_HEADER = ["Reorder Point", "Lead Time (days)"]
+
+# "qty < 10", "quantity>=5", "qty = 0" in a search box
+CONDITION = re.compile(r"\b(?:qty|quantity)\s*(<=|>=|!=|==|=|<|>)\s*(-?\d+(?:\.\d+)?)", re.IGNORECASE)
+
+SORT_ORDERS = ("Sheet order", "Name", "Quantity ↑", "Quantity ↓")
+
+
+def parse_quantity(value):
+    """The number in a quantity cell, or None if it is not a number"""
+    try:
+        number = float(str(value).strip())
+    except ValueError:
+        return None
+    return None if math.isnan(number) else number
+
+
+def format_quantity(value):
+    """A quantity as it is written back to the sheet: 12 rather than 12.0"""
+    value = float(value)
+    return str(int(value)) if value.is_integer() else str(value)
+
+
+def checked_number(label, text, minimum=None, required=False):
+    """A number typed by the user as written to the sheet ("" if empty); ValueError if not a number"""
+    text = text.strip()
+    if not text and not required:
+        return ""
+    number = parse_quantity(text)
+    if number is None:
+        raise ValueError(f"{label} must be a number")
+    if minimum is not None and number < minimum:
+        raise ValueError(f"{label} cannot be below {format_quantity(minimum)}")
+    return format_quantity(number)
+
+
+def normalize_row(row):
+    """An inventory row with its quantity written the canonical way (text that is not a number is kept)"""
+    if len(row) <= QUANTITY_COLUMN:
+        return row
+    quantity = parse_quantity(row[QUANTITY_COLUMN])
+    if quantity is None:
+        return row
+    return row[:QUANTITY_COLUMN] + [format_quantity(quantity)] + row[QUANTITY_COLUMN + 1:]
+
+
+def split_query(query):
+    """Split "bolt qty < 10" into its text and [(operator, number), ...]"""
+    conditions = [(operator.replace("==", "="), float(number)) for operator, number in CONDITION.findall(query)]
+    return CONDITION.sub(" ", query).strip(), conditions
+
+
+class InventoryTable:
+    """The inventory as column arrays (NaN where a cell is not a number), quantities parsed once"""
+
+    __slots__ = ("names", "texts", "quantities", "reorder_points", "lead_times", "positions", "_by_position")
+
+    def __init__(self):
+        self.names = []
+        self.texts = []
+        self.quantities = self._column([])
+        self.reorder_points = self._column([])
+        self.lead_times = self._column([])
+        self.positions = []
+        self._by_position = {}
+
+    @classmethod
+    def from_rows(cls, rows):
+        """Build the table from worksheet rows (rows without a quantity column are left out)"""
+        table = cls()
+        numbers = []
+        for position, row in enumerate(rows):
+            if len(row) > QUANTITY_COLUMN:
+                table._by_position[position] = len(table.names)
+                table.names.append(row[NAME_COLUMN])
+                table.texts.append(row[QUANTITY_COLUMN])
+                table.positions.append(position)
+                numbers.append(cls._numbers(row))
+        columns = list(zip(*numbers)) or [(), (), ()]
+        table.quantities, table.reorder_points, table.lead_times = (cls._column(column) for column in columns)
+        return table
+
+    def __len__(self):
+        return len(self.names)
+
+    def sheet_row(self, index):
+        """The 1-indexed sheet row of a table position"""
+        return self.positions[index] + 1
+
+    def patch(self, changes):
+        """Apply a SheetCache.sync() result; None if the table has to be rebuilt"""
+        updated = []
+        for position, row in changes["changed"].items():
+            index = self._by_position.get(position)
+            if (index is None) != (len(row) <= QUANTITY_COLUMN):
+                return None
+            if index is not None:
+                self.names[index] = row[NAME_COLUMN]
+                self.texts[index] = row[QUANTITY_COLUMN]
+                (self.quantities[index], self.reorder_points[index],
+                 self.lead_times[index]) = self._numbers(row)
+                updated.append(index)
+
+        appended = []
+        for position, row in sorted(changes["appended"].items()):
+            if len(row) > QUANTITY_COLUMN:
+                self._by_position[position] = len(self.names)
+                self.names.append(row[NAME_COLUMN])
+                self.texts.append(row[QUANTITY_COLUMN])
+                self.positions.append(position)
+                appended.append(len(self.names) - 1)
+        if appended:
+            added = list(zip(*(self._numbers(changes["appended"][self.positions[index]]) for index in appended)))
+            if np is not None:
+                self.quantities, self.reorder_points, self.lead_times = (
+                    np.concatenate([column, np.array(values, dtype=float)])
+                    for column, values in zip((self.quantities, self.reorder_points, self.lead_times), added))
+            else:
+                for column, values in zip((self.quantities, self.reorder_points, self.lead_times), added):
+                    column.extend(values)
+        return updated, appended
+
+    def where(self, conditions):
+        """A predicate over table positions for the quantity conditions, or None if there are none"""
+        if not conditions:
+            return None
+        mask = []
+
+        def matches(index):
+            if not mask:
+                mask.append(self.mask(conditions))
+            return mask[0][index]
+        return matches
+
+    def mask(self, conditions):
+        """One boolean per row: does its quantity meet every condition (NaN never does)"""
+        if np is not None:
+            result = ~np.isnan(self.quantities)
+            for operator, number in conditions:
+                result &= COMPARE[operator](self.quantities, number)
+            return result
+        return [not math.isnan(quantity) and all(COMPARE[operator](quantity, number)
+                                                 for operator, number in conditions)
+                for quantity in self.quantities]
+
+    def below_reorder_point(self):
+        """Table positions whose quantity is at or below their reorder point"""
+        if np is not None:
+            # NaN compares False, so incomplete rows drop out on their own
+            return np.flatnonzero(self.quantities <= self.reorder_points).tolist()
+        return [index for index, (quantity, reorder_point) in enumerate(zip(self.quantities, self.reorder_points))
+                if quantity <= reorder_point]
+
+    def is_low(self, index):
+        return self.quantities[index] <= self.reorder_points[index]
+
+    def sort(self, indexes, order):
+        """Reorder table positions by one of SORT_ORDERS; rows without a number go last"""
+        indexes = list(indexes)
+        if order == "Name":
+            return sorted(indexes, key=lambda index: self.names[index].lower())
+        if order not in ("Quantity ↑", "Quantity ↓"):
+            return indexes
+        descending = order == "Quantity ↓"
+        if np is not None and indexes:
+            selected = np.asarray(indexes)
+            values = self.quantities[selected]
+            # NaN sorts last either way; stable so equal quantities keep sheet order
+            keys = np.where(np.isnan(values), -np.inf if descending else np.inf, values)
+            ordered = selected[np.argsort(-keys if descending else keys, kind="stable")]
+            return ordered.tolist()
+        missing = -math.inf if descending else math.inf
+        return sorted(indexes, key=lambda index: missing if math.isnan(self.quantities[index])
+                      else self.quantities[index], reverse=descending)
+
+    def total(self, indexes=None):
+        """Sum of the numeric quantities of the given positions (all rows by default)"""
+        if np is not None:
+            values = self.quantities if indexes is None else self.quantities[np.asarray(list(indexes), dtype=int)]
+            return float(np.nansum(values))
+        values = self.quantities if indexes is None else (self.quantities[index] for index in indexes)
+        return math.fsum(value for value in values if not math.isnan(value))
+
+    def summary(self, indexes):
+        """Footer text for a view: how many rows are shown and their total quantity"""
+        indexes = list(indexes)
+        return (f"{len(indexes)} of {len(self)} materials · total quantity "
+                f"{format_quantity(self.total(indexes))}")
+
+    @staticmethod
+    def _number(text):
+        quantity = parse_quantity(text)
+        return math.nan if quantity is None else quantity
+
+    @classmethod
+    def _numbers(cls, row):
+        """The quantity, reorder point and lead time of a row, NaN where missing"""
+        return tuple(cls._number(row[column]) if len(row) > column else math.nan
+                     for column in (QUANTITY_COLUMN, REORDER_COLUMN, LEAD_TIME_COLUMN))
+
+    @staticmethod
+    def _column(values):
+        if np is not None:
+            return np.array(values, dtype=float)
+        return array("d", values)
+
+
+COMPARE = {
+    "<": lambda a, b: a < b,
+    "<=": lambda a, b: a <= b,
+    ">": lambda a, b: a > b,
+    ">=": lambda a, b: a >= b,
+    "=": lambda a, b: a == b,
+    "!=": lambda a, b: a != b,
+}
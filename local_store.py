@@ -0,0 +1,188 @@
+import json
+import sqlite3
+import threading
+import time
+
+DATABASE_FILE = 'local_store.db'
+
+
+def is_offline_error(error):
+    """True for errors meaning Google could not be reached (as opposed to an API error)"""
+    # requests' ConnectionError and Timeout are OSErrors; google-auth raises its
+    # own TransportError when the token cannot be refreshed
+    return isinstance(error, OSError) or type(error).__name__ == "TransportError"
+
+
+class LocalStore:
+    """SQLite mirror of the worksheets, the outbox of offline writes and the audit journal"""
+
+    def __init__(self, path=DATABASE_FILE):
+        self.path = path
+        self._connection = None
+        self._lock = threading.RLock()
+
+    def _db(self):
+        # Opened on first use so importing the module never touches the disk
+        if self._connection is None:
+            self._connection = sqlite3.connect(self.path, check_same_thread=False)
+            self._connection.executescript("""
+                CREATE TABLE IF NOT EXISTS sheet_rows (
+                    sheet TEXT NOT NULL, position INTEGER NOT NULL, data TEXT NOT NULL,
+                    PRIMARY KEY (sheet, position));
+                CREATE TABLE IF NOT EXISTS sheet_sync (
+                    sheet TEXT PRIMARY KEY, synced_at REAL NOT NULL);
+                CREATE TABLE IF NOT EXISTS outbox (
+                    id INTEGER PRIMARY KEY AUTOINCREMENT, sheet TEXT NOT NULL,
+                    action TEXT NOT NULL, args TEXT NOT NULL, expected TEXT,
+                    created REAL NOT NULL, status TEXT NOT NULL DEFAULT 'pending', error TEXT);
+                CREATE TABLE IF NOT EXISTS audit (
+                    id INTEGER PRIMARY KEY AUTOINCREMENT, data TEXT NOT NULL, created REAL NOT NULL);
+                CREATE TABLE IF NOT EXISTS audit_flushed (
+                    id INTEGER PRIMARY KEY CHECK (id = 1), through INTEGER NOT NULL);
+            """)
+        return self._connection
+
+    def save_rows(self, sheet, rows):
+        """Replace the mirrored copy of a worksheet"""
+        with self._lock:
+            db = self._db()
+            with db:
+                db.execute("DELETE FROM sheet_rows WHERE sheet = ?", (sheet,))
+                db.executemany("INSERT INTO sheet_rows (sheet, position, data) VALUES (?, ?, ?)",
+                               [(sheet, i, json.dumps(row)) for i, row in enumerate(rows)])
+                db.execute("INSERT OR REPLACE INTO sheet_sync (sheet, synced_at) VALUES (?, ?)",
+                           (sheet, time.time()))
+
+    def append_rows(self, sheet, rows):
+        """Add rows to the end of the mirrored copy of a worksheet"""
+        with self._lock:
+            db = self._db()
+            with db:
+                start = db.execute("SELECT COALESCE(MAX(position) + 1, 0) FROM sheet_rows WHERE sheet = ?",
+                                   (sheet,)).fetchone()[0]
+                db.executemany("INSERT INTO sheet_rows (sheet, position, data) VALUES (?, ?, ?)",
+                               [(sheet, start + i, json.dumps(row)) for i, row in enumerate(rows)])
+                db.execute("INSERT OR REPLACE INTO sheet_sync (sheet, synced_at) VALUES (?, ?)",
+                           (sheet, time.time()))
+
+    def update_rows(self, sheet, rows, length=None):
+        """Replace some rows ({position: row}) of the mirrored copy; length drops the rows past it"""
+        with self._lock:
+            db = self._db()
+            with db:
+                db.executemany("INSERT OR REPLACE INTO sheet_rows (sheet, position, data) VALUES (?, ?, ?)",
+                               [(sheet, position, json.dumps(row)) for position, row in rows.items()])
+                if length is not None:
+                    # The rows given are all that changed in a fresh copy of the whole sheet
+                    db.execute("DELETE FROM sheet_rows WHERE sheet = ? AND position >= ?", (sheet, length))
+                    db.execute("INSERT OR REPLACE INTO sheet_sync (sheet, synced_at) VALUES (?, ?)",
+                               (sheet, time.time()))
+
+    def delete_row(self, sheet, position):
+        """Remove a row from the mirrored copy; the rows below it move up by one"""
+        with self._lock:
+            db = self._db()
+            with db:
+                db.execute("DELETE FROM sheet_rows WHERE sheet = ? AND position = ?", (sheet, position))
+                # Through negative positions, so no row lands on one that is still taken
+                db.execute("UPDATE sheet_rows SET position = -position WHERE sheet = ? AND position > ?",
+                           (sheet, position))
+                db.execute("UPDATE sheet_rows SET position = -position - 1 WHERE sheet = ? AND position < 0",
+                           (sheet,))
+
+    def load_rows(self, sheet):
+        """Return the mirrored rows of a worksheet, or None if it was never mirrored"""
+        with self._lock:
+            db = self._db()
+            if db.execute("SELECT 1 FROM sheet_sync WHERE sheet = ?", (sheet,)).fetchone() is None:
+                return None
+            return [json.loads(data) for (data,) in db.execute(
+                "SELECT data FROM sheet_rows WHERE sheet = ? ORDER BY position", (sheet,))]
+
+    def synced_at(self, sheet):
+        """Time (epoch seconds) the mirror of a worksheet was last refreshed, or None"""
+        with self._lock:
+            row = self._db().execute("SELECT synced_at FROM sheet_sync WHERE sheet = ?",
+                                     (sheet,)).fetchone()
+            return row[0] if row else None
+
+    def enqueue(self, sheet, action, args, expected=None):
+        """Queue a write (a worksheet method name and its arguments) for later replay"""
+        with self._lock:
+            db = self._db()
+            with db:
+                cursor = db.execute(
+                    "INSERT INTO outbox (sheet, action, args, expected, created) VALUES (?, ?, ?, ?, ?)",
+                    (sheet, action, json.dumps(args),
+                     json.dumps(expected) if expected is not None else None, time.time()))
+            return cursor.lastrowid
+
+    def outbox(self, status="pending"):
+        """Return the outbox entries with the given status, oldest first"""
+        with self._lock:
+            rows = self._db().execute(
+                "SELECT id, sheet, action, args, expected, created, error FROM outbox "
+                "WHERE status = ? ORDER BY id", (status,)).fetchall()
+        return [{"id": id, "sheet": sheet, "action": action, "args": json.loads(args),
+                 "expected": json.loads(expected) if expected else None,
+                 "created": created, "error": error}
+                for id, sheet, action, args, expected, created, error in rows]
+
+    def pending_count(self, sheet=None):
+        """Writes waiting in the outbox, for one worksheet or all of them"""
+        with self._lock:
+            if sheet is not None:
+                return self._db().execute("SELECT COUNT(*) FROM outbox WHERE status = 'pending' AND sheet = ?",
+                                          (sheet,)).fetchone()[0]
+            return self._db().execute(
+                "SELECT COUNT(*) FROM outbox WHERE status = 'pending'").fetchone()[0]
+
+    def mark_sent(self, entry_id):
+        with self._lock:
+            db = self._db()
+            with db:
+                db.execute("DELETE FROM outbox WHERE id = ?", (entry_id,))
+
+    def mark_conflict(self, entry_id, error):
+        with self._lock:
+            db = self._db()
+            with db:
+                db.execute("UPDATE outbox SET status = 'conflict', error = ? WHERE id = ?",
+                           (error, entry_id))
+
+    def append_audit(self, row):
+        """Add an entry (a row of the audit worksheet) to the journal; returns its id"""
+        with self._lock:
+            db = self._db()
+            with db:
+                cursor = db.execute("INSERT INTO audit (data, created) VALUES (?, ?)",
+                                    (json.dumps(row), time.time()))
+            return cursor.lastrowid
+
+    def audit_entries(self, after=0, limit=None):
+        """(id, row) of the journal entries past id after, oldest first"""
+        with self._lock:
+            rows = self._db().execute("SELECT id, data FROM audit WHERE id > ? ORDER BY id LIMIT ?",
+                                      (after, -1 if limit is None else limit)).fetchall()
+        return [(id, json.loads(data)) for id, data in rows]
+
+    def audit_flushed(self):
+        """Id of the last journal entry copied to the audit worksheet (0 for none)"""
+        with self._lock:
+            row = self._db().execute("SELECT through FROM audit_flushed WHERE id = 1").fetchone()
+            return row[0] if row else 0
+
+    def audit_pending(self):
+        with self._lock:
+            return self._db().execute("SELECT COUNT(*) FROM audit WHERE id > ?",
+                                      (self.audit_flushed(),)).fetchone()[0]
+
+    def mark_audit_flushed(self, through):
+        with self._lock:
+            db = self._db()
+            with db:
+                db.execute("INSERT OR REPLACE INTO audit_flushed (id, through) VALUES (1, ?)", (through,))
+
+
+# Shared by every cache of the application
+local_store = LocalStore()
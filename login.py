@@ -1,91 +1,97 @@
 import customtkinter as ctk
-import gspread
-import os
-from google.oauth2.service_account import Credentials
+from storage import get_backend
+import startup_timing
 from config import Config
+from sheet_cache import credentials_cache
+from local_store import is_offline_error
+from passwords import hash_password, is_hashed, verify_password, verify_unknown_user
 from custom_messagebox import show_error
+from sheets_worker import sheets_executor
+from api_trace import traced_action
 
 config = Config()
 
-scopes = [
-    "https://www.googleapis.com/auth/spreadsheets",
-    "https://www.googleapis.com/auth/drive"
-]
+# Used only while no credentials sheet (or local copy of it) can be read at all
+FALLBACK_USER = ("admin@example.com", "admin123", "admin")
 
-def get_credentials():
-    """Get Google API credentials from environment or file"""
+def prepare_login():
+    """Connect to Google Sheets and make sure the credentials sheet exists; returns an error message, if any"""
     try:
-
-        if os.path.exists('credentials.json'):
-            #print("Using credentials from file")
-            return Credentials.from_service_account_file('credentials.json', scopes=scopes)
-        
-        else:
-            print("No credentials found")
-            show_error("Error", "Google API credentials not found. Please configure them in the Settings.")
-            return None
-        
+        get_backend().connect()
+    except FileNotFoundError as e:
+        print("No credentials found")
+        return str(e)
     except Exception as e:
         print(f"Error getting credentials: {e}")
         import traceback
         traceback.print_exc()
-        show_error("Error", f"Failed to load Google credentials: {str(e)}")
-        return None
+        return f"Failed to load Google credentials: {str(e)}"
 
-def get_sheet_client():
-    creds = get_credentials()
-    if creds:
-        return gspread.authorize(creds)
-    return None
-
-client = get_sheet_client()
-
-def fetch_credentials():
-    """Fetch user credentials from Google Sheets"""
     try:
-        # Check if client is not None
-        if not client:
-            print("Google Sheets client is not initialized")
-            return {"admin@example.com": ("admin123", "admin")}
-        
         # If config is empty, create new sheets
         if not config.get_credentials_sheet_id():
             from sheets_manager import GoogleSheetsManager
-            sheets_manager = GoogleSheetsManager('credentials.json')
-            sheet_data = sheets_manager.create_and_share_sheets("admin@example.com", "admin123")
+            sheets_manager = GoogleSheetsManager()
+            sheet_data = sheets_manager.create_and_share_sheets(*FALLBACK_USER[:2])
             if sheet_data:
-                config.save_sheet_urls(sheet_data["inventory_url"], sheet_data["credentials_url"])   
-        
-        sheet = client.open_by_key(config.get_credentials_sheet_id()).sheet1
-        data = sheet.get_all_values()
-        
-        if not data:
-            print("No data found in credentials sheet")
-            return {"admin@example.com": ("admin123", "admin")}
-            
-        # Skip header row if it exists
-        if len(data) > 1:
-            data = data[1:]
-        
-        credentials = {}
-        for row in data:
-            if len(row) >= 3:  # Make sure row has enough elements
-                role, email, password = row[0], row[1], row[2]
-                credentials[email] = (password, role)
-        
-        # If no valid credentials were found, use fallback
-        if not credentials:
-            print("Using fallback credentials")
-            return {"admin@example.com": ("admin123", "admin")}
-
-        return credentials
-    
+                config.save_sheet_urls(sheet_data["inventory_url"], sheet_data["credentials_url"])
+        credentials_cache.set_sheet(get_backend().get_worksheet(config.get_credentials_sheet_id()))
+    except Exception as e:
+        print(f"Error opening credentials sheet, using the local copy: {e}")
+    return None
+
+def lookup_user(email):
+    """Return (role, stored password hash, sheet row) for one user, or None"""
+    if not email:
+        return None
+    if credentials_cache.sheet is not None and not credentials_cache.is_fresh():
+        try:
+            emails = credentials_cache.sheet.col_values(2)
+            # Row 1 is the header
+            row_index = emails.index(email, 1) + 1 if email in emails[1:] else None
+            if row_index is None:
+                return None
+            row = credentials_cache.sheet.row_values(row_index)
+            return (row[0], row[2], row_index) if len(row) >= 3 else None
+        except Exception as e:
+            if not is_offline_error(e):
+                raise
+            print(f"Error looking up user, using the local copy: {e}")
+
+    row_index = credentials_cache.find_row(email)
+    if row_index is None or row_index == 1:
+        return None
+    row = credentials_cache.row_values(row_index)
+    return (row[0], row[2], row_index) if len(row) >= 3 else None
+
+def authenticate(email, password):
+    """Return the user's role if the password is right, else None (runs in the background)"""
+    try:
+        record = lookup_user(email)
     except Exception as e:
         print(f"Error fetching credentials: {e}")
         import traceback
         traceback.print_exc()
-        # Fallback credentials for testing
-        return {"admin@example.com": ("admin123", "admin")}
+        record = None
+        if credentials_cache.store is None or credentials_cache.store.load_rows("credentials") is None:
+            # Nothing to check against at all; fallback credentials for testing
+            if (email, password) == FALLBACK_USER[:2]:
+                return FALLBACK_USER[2]
+
+    if record is None:
+        return verify_unknown_user(password) or None
+
+    role, stored, row_index = record
+    if not verify_password(password, stored):
+        return None
+
+    if not is_hashed(stored):
+        # Not migrated yet: store the hash now that we know the password
+        try:
+            credentials_cache.update_cell(row_index, 3, hash_password(password))
+        except Exception as e:
+            print(f"Error storing password hash: {e}")
+    return role
 
 class LoginPage(ctk.CTk):
     def __init__(self):
@@ -96,10 +102,39 @@ class LoginPage(ctk.CTk):
         ctk.set_appearance_mode("dark")
         ctk.set_default_color_theme("blue")
 
-        self.credentials = fetch_credentials()
+        # The window is painted first; the Google libraries are loaded and the
+        # connection is set up in the background once it is on screen
+        self.loading_started = False
         self.setup_ui()
+        sheets_executor.attach(self)
+        self.bind("<Map>", self.on_first_frame)
         self.mainloop()
 
+    @traced_action("login.prepare")
+    def on_first_frame(self, event):
+        if event.widget is not self or self.loading_started:
+            return
+        self.loading_started = True
+        startup_timing.mark("first_frame")
+        sheets_executor.submit(prepare_login, on_success=self.login_prepared,
+                               on_error=self.login_prepared_failed)
+
+    def login_prepared(self, error):
+        self.login_button.configure(state="normal")
+        self.error_label.configure(text="", text_color="red")
+        startup_timing.mark("login_ready")
+        if startup_timing.benchmark_enabled():
+            startup_timing.report()
+            self.destroy()
+            return
+        if error:
+            show_error("Error", error)
+
+    def login_prepared_failed(self, error):
+        # prepare_login already reports its errors, so this only guards against surprises
+        print(f"Error preparing login: {error}")
+        self.login_prepared(None)
+
     def setup_ui(self):
         # Main Frame
         frame = ctk.CTkFrame(self)
@@ -121,9 +156,10 @@ class LoginPage(ctk.CTk):
         self.password_entry.pack(pady=5)
 
         # Login Button
-        login_button = ctk.CTkButton(frame, text="Login", command=self.login_action, fg_color="#007BFF",
-                                     hover_color="#0056b3")
-        login_button.pack(pady=10)
+        # Disabled until the credentials have been loaded
+        self.login_button = ctk.CTkButton(frame, text="Login", command=self.login_action, fg_color="#007BFF",
+                                          hover_color="#0056b3", state="disabled")
+        self.login_button.pack(pady=10)
 
 
         frame_frame = ctk.CTkFrame(frame, width=10, fg_color="transparent")
@@ -137,7 +173,7 @@ class LoginPage(ctk.CTk):
         help_button.pack(side = "left", anchor = "sw")
 
         # Error Label
-        self.error_label = ctk.CTkLabel(frame, text="", text_color="red")
+        self.error_label = ctk.CTkLabel(frame, text="Connecting to Google Sheets...", text_color="#888888")
         self.error_label.pack()
 
         def show_first_run_help(self):
@@ -153,10 +189,30 @@ class LoginPage(ctk.CTk):
         from help import getStarted
         getStarted()
 
+    @traced_action("login.authenticate")
     def login_action(self):
         email = self.email_entry.get()
         password = self.password_entry.get()
-        role = self.validate_credentials(email, password)
+
+        # Looking the user up and checking the hash both take a moment
+        self.login_button.configure(state="disabled")
+        self.error_label.configure(text="Checking...", text_color="#888888")
+        sheets_executor.submit(authenticate, email, password,
+                               on_success=lambda role: self.login_checked(email, role),
+                               on_error=self.login_failed)
+
+    def login_failed(self, error):
+        print(f"Error checking credentials: {error}")
+        self.login_checked(None, None)
+
+    def login_checked(self, email, role):
+        self.login_button.configure(state="normal")
+        self.error_label.configure(text="", text_color="red")
+
+        if role in ("admin", "user"):
+            # Changes made from here on are attributed to this user in the audit log
+            from audit_log import audit_log
+            audit_log.set_actor(email)
 
         if role == "admin":
             self.destroy()
@@ -168,8 +224,3 @@ class LoginPage(ctk.CTk):
             UserPage(email)
         else:
             self.error_label.configure(text="Invalid Email or Password!")
-
-    def validate_credentials(self, email, password):
-        if email in self.credentials and self.credentials[email][0] == password:
-            return self.credentials[email][1]  
-        return None
\ No newline at end of file
@@ -0,0 +1,112 @@
+import threading
+
+from inventory_model import (InventoryTable, QUANTITY_COLUMN, REORDER_COLUMN, LEAD_TIME_COLUMN, REORDER_HEADER,
+                             parse_quantity)
+from sheet_cache import inventory_cache
+
+
+def alert_for(position, row):
+    """The low-stock alert for one inventory row, or None if it is not below its reorder point"""
+    quantity, reorder_point, lead_time = (parse_quantity(row[column]) if len(row) > column else None
+                                          for column in (QUANTITY_COLUMN, REORDER_COLUMN, LEAD_TIME_COLUMN))
+    if quantity is None or reorder_point is None or quantity > reorder_point:
+        return None
+    return {"row": position + 1, "name": row[0], "quantity": quantity,
+            "reorder_point": reorder_point, "lead_time": lead_time}
+
+
+def urgency(alert):
+    """Sort key: the emptiest stock first, then the longest wait for a delivery"""
+    ratio = alert["quantity"] / alert["reorder_point"] if alert["reorder_point"] > 0 else 0.0
+    return ratio, -(alert["lead_time"] or 0), alert["name"].lower()
+
+
+class LowStockMonitor:
+    """Materials at or below their reorder point, re-checked as the inventory cache changes"""
+
+    def __init__(self, cache):
+        self.cache = cache
+        self._alerts = {}  # 0-based sheet position -> alert
+        self._lock = threading.Lock()
+        self._version = 0
+        self._listeners = []
+        cache.add_listener(self.inventory_changed)
+
+    def alerts(self):
+        with self._lock:
+            return sorted((dict(alert) for alert in self._alerts.values()), key=urgency)
+
+    def add_listener(self, callback):
+        """Call callback(alerts) on the main thread whenever the low-stock set changes"""
+        self._listeners.append(callback)
+        callback(self.alerts())
+
+    def inventory_changed(self, changes):
+        """Cache listener (runs on whichever thread changed the cache)"""
+        with self._lock:
+            before = dict(self._alerts)
+            if changes["reloaded"]:
+                self._evaluate_all(changes["rows"])
+            else:
+                for position in sorted(changes["deleted"], reverse=True):
+                    self._remove_row(position)
+                for position, row in list(changes["changed"].items()) + list(changes["appended"].items()):
+                    self._evaluate(position, row)
+            if self._alerts == before:
+                return
+            self._version += 1
+            version = self._version
+
+        from sheets_worker import sheets_executor
+        sheets_executor.post(self._publish, version)
+
+    def _evaluate_all(self, rows):
+        table = InventoryTable.from_rows(rows)
+        self._alerts = {}
+        for index in table.below_reorder_point():
+            position = table.positions[index]
+            self._alerts[position] = alert_for(position, rows[position])
+
+    def _evaluate(self, position, row):
+        alert = alert_for(position, row)
+        if alert is None:
+            self._alerts.pop(position, None)
+        else:
+            self._alerts[position] = alert
+
+    def _remove_row(self, position):
+        # Every later row moved up by one
+        alerts = {}
+        for other, alert in self._alerts.items():
+            if other > position:
+                alerts[other - 1] = dict(alert, row=other)
+            elif other < position:
+                alerts[other] = alert
+        self._alerts = alerts
+
+    def _publish(self, version):
+        # A burst of changes only needs the list after the last one
+        if version != self._version:
+            return
+        alerts = self.alerts()
+        for callback in list(self._listeners):
+            try:
+                callback(alerts)
+            except Exception:
+                # The widget behind this listener is gone
+                self._listeners.remove(callback)
+
+
+def add_reorder_header(cache):
+    """Title the reorder columns when the inventory has a header row without them"""
+    header = cache.row_values(1)
+    if len(header) <= QUANTITY_COLUMN or parse_quantity(header[QUANTITY_COLUMN]) is not None:
+        return  # No header row
+    for offset, title in enumerate(REORDER_HEADER):
+        column = REORDER_COLUMN + offset
+        if len(header) <= column or not header[column]:
+            cache.update_cell(1, column + 1, title)
+
+
+# Shared by every window of the application
+low_stock = LowStockMonitor(inventory_cache)
@@ -1,3 +1,4 @@
+import startup_timing  # Imported first so start-up is timed from here
 from login import LoginPage
 
 if __name__ == "__main__":
@@ -0,0 +1,40 @@
+"""Hash the plain-text passwords in the credentials sheet (one-time migration)
+
+    python migrate_passwords.py [--dry-run]
+"""
+import argparse
+
+from config import Config
+from storage import get_backend
+from passwords import hash_password, is_hashed
+
+PASSWORD_COLUMN = 3
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--dry-run", action="store_true", help="only report how many rows would change")
+    args = parser.parse_args()
+
+    config = Config()
+    if not config.get_credentials_sheet_id():
+        raise SystemExit("No credentials sheet configured")
+    sheet = get_backend().get_worksheet(config.get_credentials_sheet_id())
+
+    # Row 1 is the header
+    passwords = sheet.col_values(PASSWORD_COLUMN)[1:]
+    migrated = [password if not password or is_hashed(password) else hash_password(password)
+                for password in passwords]
+    changed = sum(1 for old, new in zip(passwords, migrated) if old != new)
+
+    print(f"{changed} of {len(passwords)} passwords need hashing")
+    if args.dry_run or not changed:
+        return
+
+    sheet.batch_update([{"range": f"C2:C{len(migrated) + 1}",
+                         "values": [[password] for password in migrated]}])
+    print("Passwords hashed")
+
+
+if __name__ == "__main__":
+    main()
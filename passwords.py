@@ -0,0 +1,60 @@
+import base64
+import hashlib
+import hmac
+import os
+
+# scrypt cost parameters (about 16 MB of memory and a few tens of ms per hash)
+SCRYPT_N = 2 ** 14
+SCRYPT_R = 8
+SCRYPT_P = 1
+PBKDF2_ITERATIONS = 600000
+SALT_BYTES = 16
+
+_dummy_hash = None
+
+
+def hash_password(password):
+    """Hash a password with a random salt (scrypt, or PBKDF2 without it)"""
+    salt = os.urandom(SALT_BYTES)
+    if hasattr(hashlib, "scrypt"):
+        digest = hashlib.scrypt(password.encode(), salt=salt, n=SCRYPT_N, r=SCRYPT_R, p=SCRYPT_P)
+        return f"scrypt${SCRYPT_N}${SCRYPT_R}${SCRYPT_P}${_b64(salt)}${_b64(digest)}"
+    digest = hashlib.pbkdf2_hmac("sha256", password.encode(), salt, PBKDF2_ITERATIONS)
+    return f"pbkdf2_sha256${PBKDF2_ITERATIONS}${_b64(salt)}${_b64(digest)}"
+
+
+def is_hashed(stored):
+    return stored.startswith(("scrypt$", "pbkdf2_sha256$"))
+
+
+def verify_password(password, stored):
+    """Check a password against a stored hash; plain-text passwords not yet migrated still match"""
+    try:
+        if stored.startswith("scrypt$"):
+            _, n, r, p, salt, expected = stored.split("$")
+            digest = hashlib.scrypt(password.encode(), salt=_unb64(salt), n=int(n), r=int(r), p=int(p))
+        elif stored.startswith("pbkdf2_sha256$"):
+            _, iterations, salt, expected = stored.split("$")
+            digest = hashlib.pbkdf2_hmac("sha256", password.encode(), _unb64(salt), int(iterations))
+        else:
+            return hmac.compare_digest(password.encode(), stored.encode())
+        return hmac.compare_digest(digest, _unb64(expected))
+    except (ValueError, TypeError):
+        return False
+
+
+def verify_unknown_user(password):
+    """Spend as long as a real check, so unknown emails cannot be told apart by timing"""
+    global _dummy_hash
+    if _dummy_hash is None:
+        _dummy_hash = hash_password(os.urandom(SALT_BYTES).hex())
+    verify_password(password, _dummy_hash)
+    return False
+
+
+def _b64(data):
+    return base64.b64encode(data).decode()
+
+
+def _unb64(text):
+    return base64.b64decode(text.encode())
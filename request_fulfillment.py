@@ -0,0 +1,211 @@
+import time
+
+from inventory_model import parse_quantity, format_quantity
+from local_store import local_store
+from sheet_export import column_letter, trimmed
+from staged_changes import cell_value
+
+# Columns of user_assignments the engine writes, after Email, Material, Quantity, Date, Notes
+STATUS_COLUMN = 6
+GRANTED_COLUMN = 7
+PROCESSED_COLUMN = 8
+RESULT_HEADER = ["Status", "Fulfilled", "Processed"]
+
+PENDING = ("", "pending")
+
+# Requests handled per run; the rest stay pending for the next one
+MAX_BATCH = 500
+
+
+class FulfillmentError(Exception):
+    """The batch could not be applied; nothing was changed"""
+
+
+class RequestProcessor:
+    """Fulfils pending requests in one batch per spreadsheet, restoring the stock if the second fails"""
+
+    def __init__(self, inventory_cache, assignments_cache, request_index, allow_partial=True):
+        self.inventory_cache = inventory_cache
+        self.assignments_cache = assignments_cache
+        self.request_index = request_index
+        self.allow_partial = allow_partial
+
+    def plan(self, limit=MAX_BATCH):
+        """Decide every pending request; returns the plan apply() takes"""
+        if local_store.pending_count():
+            raise FulfillmentError("Sync the changes made offline before processing requests")
+        self.request_index.refresh()
+        if self.request_index.offline:
+            raise FulfillmentError("Requests can only be processed while connected")
+
+        pending = self.pending_rows()
+        requests = self.request_index.fetch(pending[:limit])
+        inventory = self.inventory_cache.get_all_values(force=True)
+        return plan_fulfillment(requests, inventory, self.allow_partial, remaining=len(pending) - len(requests))
+
+    def pending_rows(self):
+        """Row numbers of the requests without a final status, oldest first"""
+        sheet = self.assignments_cache.sheet
+        column = column_letter(STATUS_COLUMN)
+        statuses = sheet.batch_get([f"{column}1:{column}"])[0]
+        rows = sorted(row for row, email, date in self.request_index.entries())
+        return [row for row in rows
+                if (statuses[row - 1][0] if row <= len(statuses) and statuses[row - 1] else "").lower()
+                in PENDING]
+
+    def apply(self, plan):
+        """Write the plan; returns it with "applied" set, raising FulfillmentError on a conflict"""
+        if not plan["entries"]:
+            plan["applied"] = True
+            return plan
+
+        inventory_sheet = self.inventory_cache.sheet
+        requests_sheet = self.assignments_cache.sheet
+        self.check_unchanged(plan)
+
+        inventory_batch = quantity_requests(plan["stock"], inventory_sheet.id, "new")
+        if inventory_batch:
+            try:
+                inventory_sheet.spreadsheet.batch_update({"requests": inventory_batch})
+            except Exception as e:
+                raise FulfillmentError(f"Inventory update failed, nothing was changed: {e}")
+        try:
+            # Without a header row the first request is in row 1
+            header = all(row != 1 for row, email, date in self.request_index.entries())
+            requests_sheet.spreadsheet.batch_update({"requests": status_requests(
+                plan, requests_sheet.id, time.strftime("%Y-%m-%d %H:%M"), header)})
+        except Exception as e:
+            if inventory_batch:
+                self.compensate(plan, inventory_sheet, e)
+            raise FulfillmentError(f"Status update failed, the inventory was restored: {e}")
+        finally:
+            self.inventory_cache.invalidate()
+            self.assignments_cache.invalidate()
+
+        # The batch bypassed the cache; record the new quantities so its listeners
+        # (the low-stock monitor) see them without a re-read
+        self.inventory_cache.patch_cells({item["row"]: {2: item["new"]} for item in plan["stock"].values()})
+        plan["applied"] = True
+        return plan
+
+    def check_unchanged(self, plan):
+        """Re-read the rows the plan touches; raise if any of them changed since plan()"""
+        rows = [entry["row"] for entry in plan["entries"]]
+        try:
+            current = dict(self.request_index.fetch(rows))
+        except Exception as e:
+            raise FulfillmentError(f"The requests changed since the review: {e}")
+        for entry in plan["entries"]:
+            row = current[entry["row"]]
+            status = row[STATUS_COLUMN - 1].lower() if len(row) >= STATUS_COLUMN else ""
+            if trimmed(row[:3]) != trimmed(entry["source"][:3]) or status not in PENDING:
+                raise FulfillmentError(f"Request in row {entry['row']} changed since the review")
+
+        sheet = self.inventory_cache.sheet
+        stock = plan["consulted"]
+        blocks = sheet.batch_get([f"A{item['row']}:B{item['row']}" for item in stock]) if stock else []
+        for item, block in zip(stock, blocks):
+            row = list(block[0]) if block else []
+            if trimmed(row) != trimmed([item["name"], item["old"]]):
+                raise FulfillmentError(f"The stock of {item['name']} changed since the review")
+
+    def compensate(self, plan, inventory_sheet, error):
+        """Write the old quantities back after the status batch failed"""
+        try:
+            inventory_sheet.spreadsheet.batch_update(
+                {"requests": quantity_requests(plan["stock"], inventory_sheet.id, "old")})
+        except Exception as e:
+            raise FulfillmentError(f"Status update failed ({error}) and the inventory could not be "
+                                   f"restored ({e}); check the quantities of "
+                                   f"{', '.join(sorted(plan['stock']))}")
+
+
+def plan_fulfillment(requests, inventory, allow_partial=True, remaining=0):
+    """Allocate the inventory to (row number, row) requests, oldest first"""
+    positions = {}
+    for i, row in enumerate(inventory):
+        if row and row[0] and row[0] not in positions:
+            positions[row[0]] = i + 1
+
+    stock = {}
+    entries = []
+    for row_number, row in requests:
+        email, material = (row + ["", ""])[:2]
+        entry = {"row": row_number, "email": email, "material": material,
+                 "requested": row[2] if len(row) > 2 else "", "granted": 0, "reason": "",
+                 "source": list(row)}
+        entries.append(entry)
+
+        requested = parse_quantity(entry["requested"])
+        if requested is None or requested <= 0:
+            entry["status"], entry["reason"] = "rejected", "Invalid quantity"
+            continue
+        if material not in positions:
+            entry["status"], entry["reason"] = "rejected", "Material not found"
+            continue
+
+        if material not in stock:
+            inventory_row = inventory[positions[material] - 1]
+            old = inventory_row[1] if len(inventory_row) > 1 else ""
+            stock[material] = {"row": positions[material], "name": material, "old": old,
+                               "available": parse_quantity(old)}
+        item = stock[material]
+        available = item["available"]
+        if available is None:
+            entry["status"], entry["reason"] = "rejected", f"Stock of {material} is not a number"
+        elif available >= requested:
+            entry["status"], entry["granted"] = "approved", requested
+        elif available > 0 and allow_partial:
+            entry["status"], entry["granted"] = "partial", available
+            entry["reason"] = f"Only {format_quantity(available)} in stock"
+        else:
+            entry["status"], entry["reason"] = "rejected", "Out of stock" if available <= 0 else \
+                f"Only {format_quantity(available)} in stock"
+        if entry["granted"]:
+            item["available"] = available - entry["granted"]
+
+    # Every quantity a decision was based on is checked again before writing,
+    # but only the ones that change are written
+    consulted = [{"row": item["row"], "name": item["name"], "old": item["old"]} for item in stock.values()]
+    for name, item in list(stock.items()):
+        available = item.pop("available")
+        if available is None or available == parse_quantity(item["old"]):
+            del stock[name]
+        else:
+            item["new"] = format_quantity(available)
+
+    counts = {"approved": 0, "partial": 0, "rejected": 0}
+    for entry in entries:
+        counts[entry["status"]] += 1
+    return {"entries": entries, "stock": stock, "consulted": consulted, "counts": counts,
+            "remaining": remaining, "applied": False}
+
+
+def quantity_requests(stock, sheet_id, which):
+    """updateCells requests setting the Quantity of each material to its "old" or "new" value"""
+    return [{"updateCells": {
+        "range": {"sheetId": sheet_id, "startRowIndex": item["row"] - 1, "endRowIndex": item["row"],
+                  "startColumnIndex": 1, "endColumnIndex": 2},
+        "rows": [{"values": [cell_value(item[which])]}],
+        "fields": "userEnteredValue"}} for item in stock.values()]
+
+
+def status_requests(plan, sheet_id, processed_at, header=True):
+    """updateCells requests writing the Status, Fulfilled and Processed cells (and their header)"""
+    requests = []
+    if header:
+        requests.append({"updateCells": {
+            "range": {"sheetId": sheet_id, "startRowIndex": 0, "endRowIndex": 1,
+                      "startColumnIndex": STATUS_COLUMN - 1, "endColumnIndex": PROCESSED_COLUMN},
+            "rows": [{"values": [cell_value(title, text=True) for title in RESULT_HEADER]}],
+            "fields": "userEnteredValue"}})
+    for entry in plan["entries"]:
+        requests.append({"updateCells": {
+            "range": {"sheetId": sheet_id, "startRowIndex": entry["row"] - 1, "endRowIndex": entry["row"],
+                      "startColumnIndex": STATUS_COLUMN - 1, "endColumnIndex": PROCESSED_COLUMN},
+            "rows": [{"values": [cell_value(entry["status"], text=True),
+                                 cell_value(format_quantity(entry["granted"])),
+                                 cell_value(processed_at, text=True)]}],
+            "fields": "userEnteredValue"}})
+    return requests
+
@@ -0,0 +1,186 @@
+import threading
+
+from local_store import local_store, is_offline_error
+from sheet_cache import assignments_cache
+from sheet_export import column_letter
+
+# Columns of the user_assignments worksheet (Email, Material, Quantity, Date, Notes)
+EMAIL_COLUMN = "A"
+DATE_COLUMN = "D"
+LAST_COLUMN = 5
+
+PAGE_SIZE = 50
+
+# refresh() re-reads this many indexed rows to confirm nothing above them moved
+TAIL_OVERLAP = 3
+
+
+class StaleIndex(Exception):
+    """The worksheet no longer matches the index (rows were inserted or deleted)"""
+
+
+class RequestIndex:
+    """Email and date of every user_assignments row, extended with only the rows added since the last refresh"""
+
+    def __init__(self, cache, store, page_size=PAGE_SIZE):
+        self.cache = cache
+        self.store = store
+        self.page_size = page_size
+        self.offline = False
+        self._emails = None
+        self._dates = None
+        self._by_email = {}
+        self._lock = threading.RLock()
+
+    @property
+    def name(self):
+        return f"{self.cache.name}_index"
+
+    def refresh(self):
+        """Bring the index up to date with the sheet; returns True if it changed"""
+        with self._lock:
+            try:
+                if self._emails is None or self.offline:
+                    mirrored = None if self.offline else self.store.load_rows(self.name)
+                    if not mirrored:
+                        self._rebuild()
+                        return True
+                    self._set_rows(mirrored)
+                return self._read_tail()
+            except Exception as e:
+                if self.cache.sheet is not None and not is_offline_error(e):
+                    raise
+                print(f"Error reading {self.cache.name}, using the local copy: {e}")
+                # Rows of the local copy, with requests made offline at the end
+                rows = self.cache.get_all_values()
+                self._set_rows([[self._cell(row, 0), self._cell(row, 3)] for row in rows])
+                self.offline = True
+                return True
+
+    def entries(self):
+        """(row number, email, date) of every request, newest first"""
+        with self._lock:
+            if self._emails is None:
+                return []
+            return [(i + 1, self._emails[i], self._dates[i])
+                    for i in range(len(self._emails) - 1, -1, -1) if self._is_request(i)]
+
+    def rows_for(self, email):
+        """Sheet row numbers of one user's requests, newest first"""
+        with self._lock:
+            return list(reversed(self._by_email.get(email, [])))
+
+    def page(self, row_numbers, page):
+        """Read one page of the given rows: {"rows": [(row number, values)], "page", "pages", "total"}"""
+        pages = max(1, -(-len(row_numbers) // self.page_size))
+        page = min(max(page, 0), pages - 1)
+        wanted = row_numbers[page * self.page_size:(page + 1) * self.page_size]
+        return {"rows": self.fetch(wanted), "page": page, "pages": pages, "total": len(row_numbers)}
+
+    def user_page(self, email, page=0):
+        """Refresh the index and read one page of a user's requests"""
+        self.refresh()
+        try:
+            return self.page(self.rows_for(email), page)
+        except StaleIndex:
+            return self.page(self.rows_for(email), page)
+
+    def fetch(self, row_numbers):
+        """Read the given sheet rows as (row number, values) pairs; StaleIndex if one moved"""
+        if not row_numbers:
+            return []
+        with self._lock:
+            if max(row_numbers) > len(self._emails):
+                raise StaleIndex(f"{self.cache.name} was re-indexed")
+            expected = {row: (self._emails[row - 1], self._dates[row - 1]) for row in row_numbers}
+            if self.offline:
+                rows = self.cache.get_all_values()
+                return [(row, rows[row - 1] if row <= len(rows) else []) for row in row_numbers]
+
+        runs = []
+        for row in sorted(set(row_numbers)):
+            if runs and row == runs[-1][1] + 1:
+                runs[-1][1] = row
+            else:
+                runs.append([row, row])
+        last_column = column_letter(max(self.cache.sheet.col_count, LAST_COLUMN))
+        blocks = self.cache.sheet.batch_get([f"A{first}:{last_column}{last}" for first, last in runs])
+
+        values = {}
+        for (first, last), block in zip(runs, blocks):
+            for offset in range(last - first + 1):
+                values[first + offset] = list(block[offset]) if offset < len(block) else []
+
+        for row in row_numbers:
+            found = (self._cell(values[row], 0), self._cell(values[row], 3))
+            if found != expected[row]:
+                with self._lock:
+                    self._rebuild()
+                raise StaleIndex(f"Row {row} of {self.cache.name} moved")
+        return [(row, values[row]) for row in row_numbers]
+
+    def _read_tail(self):
+        count = len(self._emails)
+        first = max(1, count - TAIL_OVERLAP + 1)
+        emails, dates = self._read_columns(first)
+        overlap = count - first + 1
+        if not self._overlap_matches(first, emails, dates):
+            self._rebuild()
+            return True
+        added = [[email, date] for email, date in zip(emails[overlap:], dates[overlap:])]
+        if not added:
+            return False
+        self._add_rows(added)
+        self.store.append_rows(self.name, added)
+        return True
+
+    def _overlap_matches(self, first, emails, dates):
+        """Whether the rows read from first on still hold the indexed requests"""
+        for offset, i in enumerate(range(first - 1, len(self._emails))):
+            found = (emails[offset], dates[offset]) if offset < len(emails) else ("", "")
+            # Blank rows are trimmed off the end of the read; one still blank has not moved
+            if not self._emails[i] and not found[0]:
+                continue
+            if found != (self._emails[i], self._dates[i]):
+                return False
+        return True
+
+    def _rebuild(self):
+        emails, dates = self._read_columns(1)
+        rows = [[email, date] for email, date in zip(emails, dates)]
+        self._set_rows(rows)
+        self.store.save_rows(self.name, rows)
+        self.offline = False
+
+    def _read_columns(self, first):
+        """The Email and Date values from row first to the end, as two equally long lists"""
+        if self.cache.sheet is None:
+            raise RuntimeError("Sheet not available")
+        emails, dates = self.cache.sheet.batch_get([f"{EMAIL_COLUMN}{first}:{EMAIL_COLUMN}",
+                                                    f"{DATE_COLUMN}{first}:{DATE_COLUMN}"])
+        length = max(len(emails), len(dates))
+        return ([self._cell(emails[i], 0) if i < len(emails) else "" for i in range(length)],
+                [self._cell(dates[i], 0) if i < len(dates) else "" for i in range(length)])
+
+    def _set_rows(self, rows):
+        self._emails, self._dates, self._by_email = [], [], {}
+        self._add_rows(rows)
+
+    def _add_rows(self, rows):
+        for email, date in rows:
+            self._emails.append(email)
+            self._dates.append(date)
+            if self._is_request(len(self._emails) - 1):
+                self._by_email.setdefault(email, []).append(len(self._emails))
+
+    def _is_request(self, i):
+        # Skip the header row and blank rows
+        return bool(self._emails[i]) and not (i == 0 and self._emails[i].lower() == "email")
+
+    @staticmethod
+    def _cell(row, column):
+        return row[column] if len(row) > column else ""
+
+
+# Shared by the request views of both pages
+request_index = RequestIndex(assignments_cache, local_store)
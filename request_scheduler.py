@@ -0,0 +1,126 @@
+import random
+import threading
+import time
+
+from health_monitor import status_code
+
+# Sheets API quotas per minute: each user (the service account) and the project.
+# Every running copy of the app shares both, so each one keeps to its share of them
+READ_QUOTA_PER_USER = 60
+WRITE_QUOTA_PER_USER = 60
+READ_QUOTA_PER_PROJECT = 300
+WRITE_QUOTA_PER_PROJECT = 300
+
+RETRY_STATUSES = (429, 500, 502, 503, 504)
+
+
+class TokenBucket:
+    """Allows rate requests per period on average, with bursts of up to capacity"""
+
+    def __init__(self, rate, period=60.0, capacity=None):
+        self.rate = rate / period
+        self.capacity = capacity if capacity is not None else rate
+        self._tokens = float(self.capacity)
+        self._updated = time.monotonic()
+        self._lock = threading.Lock()
+
+    def reserve(self):
+        """Take a token, returning how long to wait before it may be used"""
+        with self._lock:
+            now = time.monotonic()
+            self._tokens = min(self.capacity, self._tokens + (now - self._updated) * self.rate)
+            self._updated = now
+            self._tokens -= 1
+            return 0.0 if self._tokens >= 0 else -self._tokens / self.rate
+
+
+class RequestScheduler:
+    """Wraps a gspread request function with per-process quotas, retries and coalescing"""
+
+    def __init__(self, send, max_retries=5, base_delay=1.0, max_delay=32.0, sleep=time.sleep, instances=1):
+        self.send = send
+        self.max_retries = max_retries
+        self.base_delay = base_delay
+        self.max_delay = max_delay
+        self.sleep = sleep
+        instances = max(1, instances)
+        self.buckets = {
+            "read": (TokenBucket(READ_QUOTA_PER_USER / instances), TokenBucket(READ_QUOTA_PER_PROJECT / instances)),
+            "write": (TokenBucket(WRITE_QUOTA_PER_USER / instances),
+                      TokenBucket(WRITE_QUOTA_PER_PROJECT / instances)),
+        }
+        self._in_flight = {}
+        self._lock = threading.Lock()
+
+    def request(self, method, endpoint, *args, **kwargs):
+        if str(method).upper() != "GET":
+            return self._send_with_retries("write", method, endpoint, args, kwargs)
+
+        key = (endpoint, repr(args), repr(sorted(kwargs.items(), key=lambda item: item[0])))
+        with self._lock:
+            call = self._in_flight.get(key)
+            leader = call is None
+            if leader:
+                call = self._in_flight[key] = SharedCall()
+        if not leader:
+            return call.wait()
+
+        try:
+            call.result = self._send_with_retries("read", method, endpoint, args, kwargs)
+        except Exception as e:
+            call.error = e
+            raise
+        finally:
+            with self._lock:
+                del self._in_flight[key]
+            call.done.set()
+        return call.result
+
+    def _send_with_retries(self, kind, method, endpoint, args, kwargs):
+        attempt = 0
+        while True:
+            self._acquire(kind)
+            try:
+                return self.send(method, endpoint, *args, **kwargs)
+            except Exception as e:
+                status = status_code(e)
+                retryable = status == 429 or (kind == "read" and status in RETRY_STATUSES)
+                if not retryable or attempt >= self.max_retries:
+                    raise
+                delay = retry_after(e)
+                if delay is None:
+                    # Full jitter: anywhere up to the exponential bound
+                    delay = random.uniform(0, min(self.max_delay, self.base_delay * 2 ** attempt))
+                # The failed attempt is already in the trace and the health monitor (via send)
+                self.sleep(min(delay, self.max_delay))
+                attempt += 1
+
+    def _acquire(self, kind):
+        wait = max(bucket.reserve() for bucket in self.buckets[kind])
+        if wait > 0:
+            self.sleep(wait)
+
+
+class SharedCall:
+    """The result of a GET that other callers are waiting on"""
+
+    def __init__(self):
+        self.done = threading.Event()
+        self.result = None
+        self.error = None
+
+    def wait(self):
+        self.done.wait()
+        if self.error is not None:
+            raise self.error
+        return self.result
+
+
+def retry_after(error):
+    """Seconds from a Retry-After header, or None"""
+    response = getattr(error, "response", None)
+    headers = getattr(response, "headers", None) or {}
+    try:
+        return float(headers.get("Retry-After"))
+    except (TypeError, ValueError):
+        return None
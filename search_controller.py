@@ -0,0 +1,136 @@
+import re
+
+# Longest prefix stored in the index; longer query terms are checked with startswith
+MAX_PREFIX_LENGTH = 12
+
+TOKEN_SPLIT = re.compile(r"[^0-9a-z]+")
+
+
+def tokenize(text):
+    """Split text into lowercase search terms (the whole string is kept as a term too)"""
+    text = text.lower().strip()
+    if not text:
+        return []
+    tokens = [token for token in TOKEN_SPLIT.split(text) if token]
+    if text not in tokens:
+        tokens.append(text)
+    return tokens
+
+
+class SearchController:
+    """Debounced search over a snapshot of rows, indexed by word prefix"""
+
+    def __init__(self, widget, on_results, text_func=None, delay=250):
+        self.widget = widget
+        self.on_results = on_results
+        self.text_func = text_func or (lambda row: " ".join(row))
+        self.delay = delay
+        self.rows = []
+        self._terms = []
+        self._index = {}
+        self._pending = None
+        self._generation = 0
+        self._last_query = None
+        self._last_matches = None
+
+    def set_rows(self, rows):
+        """Replace the snapshot and rebuild the index"""
+        self.rows = list(rows)
+        self._terms = []
+        self._index = {}
+        for position, row in enumerate(self.rows):
+            self._add_to_index(position, row)
+        self._last_query = None
+        self._last_matches = None
+
+    def update_row(self, position, row):
+        """Replace one row of the snapshot, keeping the index in sync"""
+        for term in self._terms[position]:
+            for length in range(1, min(len(term), MAX_PREFIX_LENGTH) + 1):
+                bucket = self._index.get(term[:length])
+                if bucket is not None:
+                    bucket.discard(position)
+        self.rows[position] = row
+        self._add_to_index(position, row, replace=True)
+        self._last_query = None
+        self._last_matches = None
+
+    def append_row(self, row):
+        """Add a row to the end of the snapshot"""
+        self.rows.append(row)
+        self._add_to_index(len(self.rows) - 1, row)
+        self._last_query = None
+        self._last_matches = None
+
+    def _add_to_index(self, position, row, replace=False):
+        terms = tokenize(self.text_func(row))
+        if replace:
+            self._terms[position] = terms
+        else:
+            self._terms.append(terms)
+        for term in terms:
+            for length in range(1, min(len(term), MAX_PREFIX_LENGTH) + 1):
+                self._index.setdefault(term[:length], set()).add(position)
+
+    def schedule(self, query, predicate=None):
+        """Run a search after the debounce delay, replacing any pending one"""
+        self.cancel()
+        self._generation += 1
+        generation = self._generation
+        self._pending = self.widget.after(
+            self.delay, lambda: self._run(generation, query, predicate))
+
+    def cancel(self):
+        if self._pending is not None:
+            try:
+                self.widget.after_cancel(self._pending)
+            except Exception:
+                pass
+            self._pending = None
+
+    def run_now(self, query="", predicate=None):
+        """Search immediately, e.g. for the first render of a view"""
+        self.cancel()
+        self._generation += 1
+        self._run(self._generation, query, predicate)
+
+    def _run(self, generation, query, predicate):
+        self._pending = None
+        if generation != self._generation:
+            return
+        results = self.filter(query, predicate)
+        # A newer search may have been scheduled while filtering
+        if generation == self._generation:
+            self.on_results(results)
+
+    def filter(self, query, predicate=None):
+        """Return the rows matching every term of the query, in snapshot order"""
+        terms = [term for term in TOKEN_SPLIT.split(query.lower()) if term]
+        if not terms:
+            matches = range(len(self.rows))
+        elif self._last_query is not None and query.lower().startswith(self._last_query):
+            # Typing more characters can only narrow the previous result
+            matches = [position for position in self._last_matches
+                       if self._matches(position, terms)]
+        else:
+            matches = self._lookup(terms)
+        if terms:
+            self._last_query = query.lower()
+            self._last_matches = matches
+        results = [self.rows[position] for position in matches]
+        if predicate is not None:
+            results = [row for row in results if predicate(row)]
+        return results
+
+    def _lookup(self, terms):
+        candidates = None
+        for term in terms:
+            bucket = self._index.get(term[:MAX_PREFIX_LENGTH], set())
+            candidates = set(bucket) if candidates is None else candidates & bucket
+            if not candidates:
+                return []
+        return [position for position in sorted(candidates) if self._matches(position, terms)]
+
+    def _matches(self, position, terms):
+        row_terms = self._terms[position]
+        return all(any(row_term.startswith(term) for row_term in row_terms) for term in terms)
@@ -0,0 +1,527 @@
+import math
+import threading
+import time
+
+from local_store import local_store, is_offline_error
+from sheet_export import column_letter, trimmed
+
+# sync() re-reads this many rows before the end of the snapshot to confirm that
+# nothing above them moved, and verifies one block of at least this many rows per call
+TAIL_OVERLAP = 3
+VERIFY_BLOCK_ROWS = 100
+
+# Seconds between the syncs of an open view
+SYNC_INTERVAL = 15
+
+
+class SheetCache:
+    """In-process, write-through cache of a worksheet's values, mirrored to the local store"""
+
+    def __init__(self, sheet=None, ttl=60, key_column=0, name=None, store=None, unique_keys=True,
+                 sync_interval=SYNC_INTERVAL):
+        self.sheet = sheet
+        self.ttl = ttl
+        self.sync_interval = sync_interval
+        self.key_column = key_column
+        self.name = name
+        self.store = store
+        self.unique_keys = unique_keys
+        self.offline = False
+        self._rows = None
+        self._index = {}
+        self._loaded_at = 0.0
+        self._modified = None
+        self._verify_from = 0
+        self._dirty_since = None  # When sync() first saw a change not yet verified on every row
+        self._verified = 0  # Rows re-read since the last change seen
+        self._listeners = []
+        self._lock = threading.RLock()
+
+    def set_sheet(self, sheet):
+        """Point the cache at a (new) worksheet and drop whatever it held"""
+        with self._lock:
+            self.sheet = sheet
+            self._rows = None
+            self._index = {}
+            self._loaded_at = 0.0
+
+    def add_listener(self, callback):
+        """Call callback(changes) after the local copy changed, on the thread that changed it
+
+        The cache is locked meanwhile, so callback must not read it back.
+        """
+        self._listeners.append(callback)
+
+    def remove_listener(self, callback):
+        if callback in self._listeners:
+            self._listeners.remove(callback)
+
+    def _notify(self, reloaded=False, changed=(), appended=(), deleted=None):
+        if not self._listeners:
+            return
+        if reloaded:
+            changes = self._reloaded()
+        else:
+            changes = {"reloaded": False,
+                       "changed": {i: list(self._rows[i]) for i in changed},
+                       "appended": {i: list(self._rows[i]) for i in appended},
+                       "deleted": deleted or {}}
+        for callback in list(self._listeners):
+            try:
+                callback(changes)
+            except Exception as e:
+                print(f"Error in {self.name} listener: {e}")
+
+    def invalidate(self):
+        """Force the next read to go back to the sheet"""
+        with self._lock:
+            self._loaded_at = 0.0
+
+    def is_fresh(self):
+        with self._lock:
+            return self._rows is not None and time.monotonic() - self._loaded_at < self.ttl
+
+    def get_all_values(self, force=False):
+        """Return a copy of all rows, fetching from the sheet only when stale"""
+        with self._lock:
+            if force or not self.is_fresh():
+                self._load()
+            return [list(row) for row in self._rows]
+
+    def sync(self):
+        """Bring the snapshot up to date, downloading only the new rows and one block of old ones
+
+        Returns {"reloaded": True, "rows"} or {"reloaded": False, "changed", "appended"}.
+        """
+        with self._lock:
+            if self._rows is None or self.offline or self.sheet is None or \
+                    (self.store is not None and self.store.pending_count(self.name)):
+                self._load()
+                return self._reloaded()
+
+            modified = self._modified_time()
+            moved = modified is None or modified != self._modified
+            if not moved and self._dirty_since is None:
+                # Nothing changed since every row was last confirmed
+                self._loaded_at = time.monotonic()
+                return {"reloaded": False, "changed": {}, "appended": {}}
+
+            if self._dirty_since is not None and time.monotonic() - self._dirty_since >= self.ttl:
+                # The rotation has not caught up: edits may hide in rows it has not reached
+                self._load()
+                self._modified = modified
+                return self._reloaded()
+
+            appended = self._read_tail()
+            if appended is None:
+                self._load()
+                self._modified = modified
+                return self._reloaded()
+            if moved and (modified is None or not appended or self._dirty_since is not None):
+                # Not just an append: rows may have been edited in place
+                if self._dirty_since is None:
+                    self._dirty_since = time.monotonic()
+                # Blocks verified before this change may be out of date again
+                self._verified = 0
+            changed = self._verify_block()
+            self._modified = modified
+            self._verified += len(appended)
+            if self._verified >= len(self._rows):
+                # Every row was re-read since the last change: the snapshot is current again
+                self._dirty_since = None
+            if self._dirty_since is None:
+                self._loaded_at = time.monotonic()
+
+            self._mirror(changed=changed, appended=appended)
+            if changed or appended:
+                self._notify(changed=changed, appended=appended)
+            return {"reloaded": False,
+                    "changed": {i: list(self._rows[i]) for i in changed},
+                    "appended": {i: list(self._rows[i]) for i in appended}}
+
+    def _reloaded(self):
+        return {"reloaded": True, "rows": [list(row) for row in self._rows]}
+
+    def _modified_time(self):
+        """The spreadsheet's last modification time, or None if it cannot be read"""
+        try:
+            spreadsheet = self.sheet.spreadsheet
+            if hasattr(spreadsheet, "get_lastUpdateTime"):
+                return spreadsheet.get_lastUpdateTime()
+            return spreadsheet.lastUpdateTime
+        except Exception as e:
+            if is_offline_error(e):
+                raise
+            return None
+
+    def _range(self, first, last=None):
+        last_column = column_letter(max(self.sheet.col_count, 1))
+        return f"A{first}:{last_column}{last if last is not None else ''}"
+
+    def _read_tail(self):
+        """Append new rows to the snapshot; returns their positions, or None on a mismatch"""
+        count = len(self._rows)
+        first = max(1, count - TAIL_OVERLAP + 1)
+        values = self.sheet.get(self._range(first))
+        overlap = count - first + 1
+        if len(values) < overlap:
+            return None  # Rows were deleted
+        for offset in range(overlap):
+            if trimmed(values[offset]) != trimmed(self._rows[first - 1 + offset]):
+                return None
+        width = len(self._rows[0]) if self._rows else 0
+        appended = []
+        for row in values[overlap:]:
+            row = list(row) + [""] * (width - len(row))
+            self._rows.append(row)
+            key = self._key_of(row)
+            if key and key not in self._index:
+                self._index[key] = len(self._rows)
+            appended.append(len(self._rows) - 1)
+        return appended
+
+    def _block_rows(self):
+        # A rotation takes one sync fewer than fit in a TTL, leaving room for a late timer
+        rounds = max(1, int(self.ttl // self.sync_interval) - 1) if self.sync_interval else 1
+        return max(VERIFY_BLOCK_ROWS, math.ceil(len(self._rows) / rounds))
+
+    def _verify_block(self):
+        """Re-read the next block of rows and patch the ones edited in place"""
+        if not self._rows:
+            return []
+        if self._verify_from >= len(self._rows):
+            self._verify_from = 0
+        first = self._verify_from
+        last = min(first + self._block_rows(), len(self._rows))
+        self._verify_from = last
+        values = self.sheet.get(self._range(first + 1, last))
+        self._verified += last - first
+
+        changed = []
+        for position in range(first, last):
+            fresh = values[position - first] if position - first < len(values) else []
+            if trimmed(fresh) != trimmed(self._rows[position]):
+                old_key = self._key_of(self._rows[position])
+                width = len(self._rows[position])
+                self._rows[position] = list(fresh) + [""] * (width - len(fresh))
+                self._reindex_key(old_key)
+                self._reindex_key(self._key_of(self._rows[position]))
+                changed.append(position)
+        return changed
+
+    def row_values(self, row_index):
+        """Return the cached values of a 1-indexed sheet row"""
+        with self._lock:
+            if not self.is_fresh():
+                self._load()
+            if 1 <= row_index <= len(self._rows):
+                return list(self._rows[row_index - 1])
+            return []
+
+    def find_row(self, key):
+        """Return the 1-indexed row whose key column equals key, or None"""
+        with self._lock:
+            if not self.is_fresh():
+                self._load()
+            return self._index.get(key)
+
+    # Writes go to the sheet first, outside the lock, so readers are never held up
+    # by a slow request; the local copy is only patched once the sheet accepted it
+    # (or the write was queued for later). Each returns False if it was queued.
+
+    def update_cell(self, row_index, col_index, value):
+        with self._lock:
+            current = self._rows[row_index - 1] if self._rows and 1 <= row_index <= len(self._rows) else []
+            expected = {"key": self._key_of(current),
+                        "value": current[col_index - 1] if len(current) >= col_index else "",
+                        "row": list(current)}
+        sent = self._send("update_cell", [row_index, col_index, value], expected)
+        with self._lock:
+            if self._rows is not None and 1 <= row_index <= len(self._rows):
+                row = self._rows[row_index - 1]
+                while len(row) < col_index:
+                    row.append("")
+                old_key = self._key_of(row)
+                row[col_index - 1] = str(value)
+                if col_index - 1 == self.key_column:
+                    self._reindex_key(old_key)
+                    self._reindex_key(self._key_of(row))
+                self._mirror(changed=[row_index - 1])
+                self._notify(changed=[row_index - 1])
+        return sent
+
+    def patch_cells(self, values):
+        """Record cells already written to the sheet some other way, as {row: {column: value}}"""
+        with self._lock:
+            if self._rows is None:
+                return
+            changed = []
+            for row_index, cells in values.items():
+                if not 1 <= row_index <= len(self._rows):
+                    continue
+                row = self._rows[row_index - 1]
+                old_key = self._key_of(row)
+                for col_index, value in cells.items():
+                    while len(row) < col_index:
+                        row.append("")
+                    row[col_index - 1] = str(value)
+                if self._key_of(row) != old_key:
+                    self._reindex_key(old_key)
+                    self._reindex_key(self._key_of(row))
+                changed.append(row_index - 1)
+            self._mirror(changed=changed)
+            self._notify(changed=changed)
+
+    def append_row(self, values):
+        sent = self._send("append_row", [list(values)])
+        with self._lock:
+            if self._rows is not None:
+                row = [str(value) for value in values]
+                self._rows.append(row)
+                key = self._key_of(row)
+                if key and key not in self._index:
+                    self._index[key] = len(self._rows)
+                self._mirror(appended=[len(self._rows) - 1])
+                self._notify(appended=[len(self._rows) - 1])
+        return sent
+
+    def delete_row(self, row_index):
+        with self._lock:
+            expected = list(self._rows[row_index - 1]) if self._rows and 1 <= row_index <= len(self._rows) else []
+        sent = self._send("delete_rows", [row_index], {"row": expected})
+        with self._lock:
+            if self._rows is not None and 1 <= row_index <= len(self._rows):
+                key = self._key_of(self._rows[row_index - 1])
+                removed = self._rows.pop(row_index - 1)
+                # Every later row moved up by one
+                for other, other_row in self._index.items():
+                    if other_row > row_index:
+                        self._index[other] = other_row - 1
+                if self._index.get(key) == row_index:
+                    self._reindex_key(key)
+                if self.store is not None:
+                    self.store.delete_row(self.name, row_index - 1)
+                self._notify(deleted={row_index - 1: list(removed)})
+        return sent
+
+    def _send(self, action, args, expected=None):
+        """Make a write on the sheet, or queue it if the sheet cannot be reached"""
+        if self.store is None:
+            getattr(self.sheet, action)(*args)
+            return True
+        # Later writes wait behind queued ones so the sheet sees them in order
+        if self.sheet is not None and not self.store.pending_count():
+            try:
+                getattr(self.sheet, action)(*args)
+                self.offline = False
+                return True
+            except Exception as e:
+                if not is_offline_error(e):
+                    raise
+                print(f"Error writing to {self.name}, queued for later: {e}")
+        self.store.enqueue(self.name, action, args, expected)
+        self.offline = True
+        return False
+
+    def _mirror(self, changed=(), appended=()):
+        """Store the rows of the snapshot that changed in the local mirror"""
+        if self.store is None:
+            return
+        if changed:
+            self.store.update_rows(self.name, {i: self._rows[i] for i in changed})
+        if appended:
+            self.store.append_rows(self.name, [self._rows[i] for i in appended])
+
+    def _mirror_load(self, rows):
+        """Store a full read in the local mirror, writing only the rows that differ from the snapshot"""
+        if self._rows is None:
+            self.store.save_rows(self.name, rows)
+            return
+        # The mirror holds the snapshot (every change to it is mirrored)
+        self.store.update_rows(self.name, {i: row for i, row in enumerate(rows)
+                                           if i >= len(self._rows) or row != self._rows[i]}, length=len(rows))
+
+    def replay(self, entry):
+        """Apply a queued write to the row it was made against, raising Conflict if that is gone or changed"""
+        action, args, expected = entry["action"], entry["args"], entry["expected"] or {}
+        if self.sheet is None:
+            raise RuntimeError("Sheet not available")
+
+        if action == "append_row":
+            key = self._key_of(args[0])
+            if self.unique_keys and key and key in self._sheet_keys():
+                raise Conflict(f"'{key}' was added on the sheet in the meantime")
+            self.sheet.append_row(args[0])
+
+        elif action == "update_cell":
+            row_index, col_index, value = args
+            if not self.unique_keys and expected.get("row") is not None:
+                # The row as it was, or as it is with this very write already applied
+                done = list(expected["row"]) + [""] * (col_index - len(expected["row"]))
+                done[col_index - 1] = str(value)
+                row_index = self._locate_row(row_index, [expected["row"], done])
+            else:
+                row_index = self._locate(row_index, expected["key"])
+            current = self.sheet.row_values(row_index)
+            current_value = current[col_index - 1] if len(current) >= col_index else ""
+            if current_value not in (expected["value"], str(value)):
+                raise Conflict(f"'{expected['key']}' changed on the sheet from "
+                               f"{expected['value']} to {current_value}")
+            self.sheet.update_cell(row_index, col_index, value)
+
+        elif action == "delete_rows":
+            if self.unique_keys:
+                row_index = self._locate(args[0], self._key_of(expected["row"]))
+            else:
+                row_index = self._locate_row(args[0], [expected["row"]])
+            if trimmed(self.sheet.row_values(row_index)) != trimmed(expected["row"]):
+                raise Conflict(f"'{self._key_of(expected['row'])}' changed on the sheet "
+                               "after it was removed locally")
+            self.sheet.delete_rows(row_index)
+
+    def _sheet_keys(self):
+        return self.sheet.col_values(self.key_column + 1)
+
+    def _locate(self, row_index, key):
+        """Find the current sheet row of a key, starting from where it used to be"""
+        current = self.sheet.row_values(row_index)
+        if self._key_of(current) == key:
+            return row_index
+        keys = self._sheet_keys()
+        if key in keys:
+            return keys.index(key) + 1
+        raise Conflict(f"'{key}' no longer exists on the sheet")
+
+    def _locate_row(self, row_index, candidates):
+        """Find the current sheet row equal to one of candidates, nearest to where it used to be"""
+        wanted = [trimmed(row) for row in candidates]
+        if trimmed(self.sheet.row_values(row_index)) in wanted:
+            return row_index
+        rows = self.sheet.get_all_values()
+        matches = [i + 1 for i, row in enumerate(rows) if trimmed(row) in wanted]
+        if not matches:
+            raise Conflict(f"The row of '{self._key_of(candidates[0])}' changed or no longer exists on the sheet")
+        return min(matches, key=lambda match: abs(match - row_index))
+
+    def _with_queued_writes(self, rows):
+        for entry in self.store.outbox():
+            if entry["sheet"] != self.name:
+                continue
+            args, expected = entry["args"], entry["expected"] or {}
+            if entry["action"] == "append_row":
+                rows.append([str(value) for value in args[0]])
+                continue
+            position = self._queued_position(rows, args[0] - 1, expected)
+            if position is None:
+                continue
+            if entry["action"] == "update_cell":
+                row = rows[position]
+                while len(row) < args[1]:
+                    row.append("")
+                row[args[1] - 1] = str(args[2])
+            else:
+                del rows[position]
+        return rows
+
+    def _queued_position(self, rows, position, expected):
+        """The position of the row a queued write was made against, or None if it is gone"""
+        row = expected.get("row")
+        if row is not None:
+            # Where the write was made, or the nearest identical row if rows moved since
+            matches = [i for i, other in enumerate(rows) if trimmed(other) == trimmed(row)]
+            if matches:
+                return min(matches, key=lambda match: abs(match - position))
+        if not self.unique_keys:
+            # The key could be any of many rows
+            return None
+        key = expected["key"] if "key" in expected else self._key_of(row)
+        for i, other in enumerate(rows):
+            if self._key_of(other) == key:
+                return i
+        return None
+
+    def _key_of(self, row):
+        return row[self.key_column] if len(row) > self.key_column else ""
+
+    def _reindex_key(self, key):
+        # First occurrence wins, like worksheet.find
+        self._index.pop(key, None)
+        if not key:
+            return
+        for i, row in enumerate(self._rows):
+            if self._key_of(row) == key:
+                self._index[key] = i + 1
+                return
+
+    def _load(self):
+        try:
+            if self.sheet is None:
+                raise RuntimeError("Sheet not available")
+            rows = [list(row) for row in self.sheet.get_all_values()]
+        except Exception as e:
+            mirrored = self.store.load_rows(self.name) if self.store is not None else None
+            if mirrored is None or not (self.sheet is None or is_offline_error(e)):
+                raise
+            print(f"Error reading {self.name}, using the local copy: {e}")
+            rows = mirrored
+            self.offline = True
+        else:
+            if self.store is not None:
+                # Writes made offline that are still waiting stay visible
+                rows = self._with_queued_writes(rows)
+                self._mirror_load(rows)
+            self.offline = False
+        self._rows = rows
+        self._modified = None
+        self._dirty_since = None
+        self._verified = 0
+        self._index = {}
+        for i, row in enumerate(self._rows):
+            key = self._key_of(row)
+            if key and key not in self._index:
+                self._index[key] = i + 1  # Sheet rows are 1-indexed
+        self._loaded_at = time.monotonic()
+        self._notify(reloaded=True)
+
+
+class Conflict(Exception):
+    """A queued write no longer matches the sheet"""
+
+
+def sync_outbox(caches=None):
+    """Replay the outbox in order; returns (sent, conflicts, still pending)"""
+    caches = {cache.name: cache for cache in (caches or all_caches)}
+    sent, conflicts = 0, []
+    for entry in local_store.outbox():
+        cache = caches.get(entry["sheet"])
+        if cache is None or cache.sheet is None:
+            break
+        try:
+            cache.replay(entry)
+        except Conflict as e:
+            local_store.mark_conflict(entry["id"], str(e))
+            conflicts.append(str(e))
+        except Exception as e:
+            if is_offline_error(e):
+                break
+            local_store.mark_conflict(entry["id"], str(e))
+            conflicts.append(str(e))
+        else:
+            local_store.mark_sent(entry["id"])
+            sent += 1
+    if sent or conflicts:
+        for cache in caches.values():
+            cache.invalidate()
+    return sent, conflicts, local_store.pending_count()
+
+
+# Shared by every view that reads the inventory worksheet (keyed by material name)
+inventory_cache = SheetCache(name="inventory", store=local_store)
+
+# The credentials worksheet, keyed by email (Role, Email, Password)
+credentials_cache = SheetCache(key_column=1, name="credentials", store=local_store)
+
+# Material requests (Email, Material, Quantity, Date, Notes); a user has many
+assignments_cache = SheetCache(name="user_assignments", store=local_store, unique_keys=False)
+
+all_caches = (inventory_cache, credentials_cache, assignments_cache)
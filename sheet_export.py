@@ -0,0 +1,74 @@
+import csv
+import gzip
+
+REDACTED = "[REDACTED]"
+
+
+def column_letter(column):
+    """Convert a 1-indexed column number to its A1 letters (1 -> A, 27 -> AA)"""
+    letters = ""
+    while column > 0:
+        column, remainder = divmod(column - 1, 26)
+        letters = chr(ord("A") + remainder) + letters
+    return letters
+
+
+def column_index(letters):
+    """Convert A1 column letters to a 1-indexed column number (A -> 1, AA -> 27)"""
+    index = 0
+    for letter in letters:
+        index = index * 26 + ord(letter) - ord("A") + 1
+    return index
+
+
+def trimmed(row):
+    """A row without trailing empty cells, as the values API returns it"""
+    row = list(row)
+    while row and row[-1] == "":
+        row.pop()
+    return row
+
+
+def iter_row_chunks(worksheet, chunk_rows=500):
+    """Yield (first_row, last_row, total_rows, rows) one A1 range at a time, up to row_count"""
+    total = worksheet.row_count
+    last_column = column_letter(max(worksheet.col_count, 1))
+    for first in range(1, total + 1, chunk_rows):
+        last = min(first + chunk_rows - 1, total)
+        yield first, last, total, worksheet.get(f"A{first}:{last_column}{last}")
+
+
+def export_worksheet(worksheet, file_path, chunk_rows=500, redact_columns=(), progress=None, transform=None):
+    """Stream a worksheet into a CSV file (gzip-compressed if the name ends in .gz)"""
+    opener = gzip.open if file_path.endswith(".gz") else open
+    written = 0
+    with opener(file_path, "wt", newline="") as file:
+        writer = csv.writer(file)
+        blank_rows = 0
+        for first, last, total, rows in iter_row_chunks(worksheet, chunk_rows):
+            # Empty rows at the end of a chunk are left out of the response; they
+            # only matter if more data follows
+            writer.writerows([] for _ in range(blank_rows))
+            written += blank_rows
+
+            for offset, row in enumerate(rows):
+                if first + offset > 1:
+                    if transform:
+                        row = transform(list(row))
+                    if redact_columns:
+                        row = redact(row, redact_columns)
+                writer.writerow(row)
+            written += len(rows)
+            blank_rows = (last - first + 1) - len(rows)
+
+            if progress:
+                progress(last, total)
+    return written
+
+
+def redact(row, columns):
+    row = list(row)
+    for column in columns:
+        if column < len(row) and row[column]:
+            row[column] = REDACTED
+    return row
@@ -0,0 +1,182 @@
+import json
+import os
+import threading
+import time
+
+from api_trace import api_tracer, payload_size
+from config import Config
+from health_monitor import health_monitor, status_code
+from request_scheduler import RequestScheduler
+
+# gspread and google-auth are imported on first use: they take a noticeable part
+# of a cold start, and the login window should not wait for them
+
+scopes = [
+    "https://www.googleapis.com/auth/spreadsheets",
+    "https://www.googleapis.com/auth/drive"
+]
+
+CREDENTIALS_FILE = 'credentials.json'
+
+# One set of credentials, one authorized client and one Sheets API service for
+# the whole process; spreadsheet and worksheet handles are cached by key/title
+_lock = threading.RLock()
+_credentials = None
+_client = None
+_service = None
+_spreadsheets = {}
+_worksheets = {}
+
+
+def get_credentials():
+    """Load the service account credentials once (GOOGLE_CREDENTIALS or credentials.json)"""
+    global _credentials
+    with _lock:
+        if _credentials is None:
+            from google.oauth2.service_account import Credentials
+
+            if 'GOOGLE_CREDENTIALS' in os.environ and os.environ['GOOGLE_CREDENTIALS'].strip():
+                credentials_dict = json.loads(os.environ['GOOGLE_CREDENTIALS'])
+                _credentials = Credentials.from_service_account_info(credentials_dict, scopes=scopes)
+            elif os.path.exists(CREDENTIALS_FILE):
+                _credentials = Credentials.from_service_account_file(CREDENTIALS_FILE, scopes=scopes)
+            else:
+                raise FileNotFoundError(
+                    "Google API credentials not found. Please configure them in the Settings.")
+        return _credentials
+
+
+def get_client():
+    """Return the shared gspread client, authorizing on first use"""
+    global _client
+    with _lock:
+        if _client is None:
+            import gspread
+            _client = gspread.authorize(get_credentials())
+            _instrument(_client)
+        return _client
+
+
+def _instrument(client):
+    """Schedule every request the client makes, trace it and report its latency and outcome"""
+    # gspread 6 sends through client.http_client, gspread 5 through the client
+    target = getattr(client, "http_client", client)
+    send = target.request
+
+    def timed(method, endpoint, params=None, data=None, json=None, **kwargs):
+        sent = payload_size(data, json)
+        started = time.monotonic()
+        try:
+            response = send(method, endpoint, params=params, data=data, json=json, **kwargs)
+        except Exception as e:
+            latency = time.monotonic() - started
+            health_monitor.record(latency, e)
+            api_tracer.record("gspread", method, endpoint, params, sent=sent, latency=latency,
+                              status=status_code(e), error=e)
+            raise
+        latency = time.monotonic() - started
+        health_monitor.record(latency)
+        api_tracer.record("gspread", method, endpoint, params, sent=sent,
+                          received=len(getattr(response, "content", b"") or b""), latency=latency,
+                          status=getattr(response, "status_code", None))
+        return response
+
+    # Each attempt, retries included, is reported to the health monitor and the trace
+    target.request = RequestScheduler(timed, instances=Config().get_client_instances()).request
+
+
+def get_sheets_service():
+    """Return the shared Sheets API service (used for calls gspread does not cover)"""
+    global _service
+    with _lock:
+        if _service is None:
+            from googleapiclient.discovery import build
+            _service = build('sheets', 'v4', credentials=get_credentials(), cache_discovery=False,
+                             requestBuilder=_traced_request_class())
+        return _service
+
+
+def _traced_request_class():
+    """An HttpRequest for the discovery client that records each execute() in the trace"""
+    from googleapiclient.http import HttpRequest
+
+    class TracedHttpRequest(HttpRequest):
+        def execute(self, *args, **kwargs):
+            received = []
+            postproc = self.postproc
+
+            def measured(response, content):
+                received.append(len(content or b""))
+                return postproc(response, content)
+
+            self.postproc = measured
+            started = time.monotonic()
+            try:
+                result = super().execute(*args, **kwargs)
+            except Exception as e:
+                api_tracer.record("discovery", self.method, self.uri, sent=payload_size(self.body),
+                                  received=sum(received), latency=time.monotonic() - started,
+                                  status=getattr(getattr(e, "resp", None), "status", None), error=e)
+                raise
+            finally:
+                self.postproc = postproc
+            api_tracer.record("discovery", self.method, self.uri, sent=payload_size(self.body),
+                              received=sum(received), latency=time.monotonic() - started, status=200)
+            return result
+
+    return TracedHttpRequest
+
+
+def open_spreadsheet(key):
+    # Opening is a request: it runs outside the lock so that several
+    # spreadsheets (the inventories of different sites) can open at once
+    with _lock:
+        if key in _spreadsheets:
+            return _spreadsheets[key]
+    spreadsheet = get_client().open_by_key(key)
+    with _lock:
+        return _spreadsheets.setdefault(key, spreadsheet)
+
+
+def get_worksheet(key, title=None):
+    """Return a worksheet of the spreadsheet by title, or its first sheet"""
+    with _lock:
+        if (key, title) in _worksheets:
+            return _worksheets[(key, title)]
+    spreadsheet = open_spreadsheet(key)
+    worksheet = spreadsheet.sheet1 if title is None else spreadsheet.worksheet(title)
+    with _lock:
+        return _worksheets.setdefault((key, title), worksheet)
+
+
+def get_or_create_worksheet(key, title, header, rows=100, cols=20):
+    """Return a worksheet by title, creating it with a header row if it is missing"""
+    import gspread
+
+    try:
+        return get_worksheet(key, title)
+    except gspread.exceptions.WorksheetNotFound:
+        pass
+    with _lock:
+        if (key, title) in _worksheets:
+            return _worksheets[(key, title)]
+        worksheet = open_spreadsheet(key).add_worksheet(title=title, rows=rows, cols=cols)
+        worksheet.append_row(header)
+        _worksheets[(key, title)] = worksheet
+        return worksheet
+
+
+def probe(key):
+    """A cheap request to check that the spreadsheet can be reached"""
+    open_spreadsheet(key).fetch_sheet_metadata({"fields": "spreadsheetId"})
+
+
+def reset():
+    """Forget the client and every cached handle, e.g. after the configuration changed"""
+    global _credentials, _client, _service
+    with _lock:
+        _credentials = None
+        _client = None
+        _service = None
+        _spreadsheets.clear()
+        _worksheets.clear()
@@ -1,40 +1,18 @@
-import json
-import gspread
-from google.oauth2 import service_account
-from googleapiclient.discovery import build
+from passwords import hash_password
+from storage import get_backend
 
 class GoogleSheetsManager:
-    def __init__(self, json_keyfile):
-        self.creds = service_account.Credentials.from_service_account_file(
-            json_keyfile,
-            scopes=[
-                'https://www.googleapis.com/auth/spreadsheets',
-                'https://www.googleapis.com/auth/drive'
-            ]
-        )
-        self.service = build('sheets', 'v4', credentials=self.creds)
-        self.client = gspread.authorize(self.creds)
+    """Creates and shares the inventory and credentials spreadsheets on the configured backend"""
+
+    def __init__(self):
+        self.backend = get_backend()
 
     def create_spreadsheet(self, title):
-        spreadsheet_body = {
-            'properties': {
-                'title': title
-            }
-        }
-        spreadsheet = self.service.spreadsheets().create(body=spreadsheet_body, fields='spreadsheetId').execute()
-        return spreadsheet.get('spreadsheetId')
+        return self.backend.create_spreadsheet(title)
 
     def share_spreadsheet(self, spreadsheet_id, email):
         try:
-            # Share with the user with editor access
-            self.client.open_by_key(spreadsheet_id).share(
-                email,
-                perm_type='user',
-                role='writer',
-                notify=True,
-                with_link=True
-            )
-            return True
+            return self.backend.share_spreadsheet(spreadsheet_id, email)
         except Exception as e:
             error_msg = str(e)
             if "drive.googleapis.com" in error_msg:
@@ -50,8 +28,8 @@ class GoogleSheetsManager:
             credentials_id = self.create_spreadsheet('Credentials')
             
             # Generate URLs
-            inventory_url = f"https://docs.google.com/spreadsheets/d/{inventory_id}"
-            credentials_url = f"https://docs.google.com/spreadsheets/d/{credentials_id}"
+            inventory_url = self.backend.spreadsheet_url(inventory_id)
+            credentials_url = self.backend.spreadsheet_url(credentials_id)
             
             # Share spreadsheets
             self.share_spreadsheet(inventory_id, user_email)
@@ -62,17 +40,7 @@ class GoogleSheetsManager:
 
             # Save sheet IDs to config
             from config import Config
-            config = Config()
-            config_data = {
-                "google_sheets_ids": {
-                    "inventory_sheet_id": inventory_id,
-                    "credentials_sheet_id": credentials_id,
-                    "inventory_url": inventory_url,
-                    "credentials_url": credentials_url
-                }
-            }
-            with open('config(44).json', 'w') as f:
-                json.dump(config_data, f, indent=2)
+            Config().save_sheets(inventory_id, credentials_id, inventory_url, credentials_url)
             
             # Return the IDs for config
             return {
@@ -86,21 +54,13 @@ class GoogleSheetsManager:
             return None
 
     def add_user_to_credentials(self, credentials_sheet_id, user_email, user_password):
+        sheet = self.backend.get_worksheet(credentials_sheet_id)
+
         # First clear any existing data
-        self.service.spreadsheets().values().clear(
-            spreadsheetId=credentials_sheet_id,
-            range='A1:Z1000'
-        ).execute()
-        
+        sheet.clear()
+
         # Then add the header and admin user
-        values = [
+        sheet.append_rows([
             ['Role', 'Email', 'Password'],
-            ['admin', user_email, user_password]
-        ]
-        body = {'values': values}
-        self.service.spreadsheets().values().update(
-            spreadsheetId=credentials_sheet_id,
-            range='A1',
-            valueInputOption='RAW',
-            body=body
-        ).execute()
\ No newline at end of file
+            ['admin', user_email, hash_password(user_password)]
+        ], value_input_option='RAW')
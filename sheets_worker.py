@@ -0,0 +1,100 @@
+import contextvars
+import queue
+import threading
+import traceback
+from concurrent.futures import ThreadPoolExecutor
+
+
+class SheetsExecutor:
+    """Runs Google Sheets calls off the Tk main thread; writes run one at a time, in order"""
+
+    def __init__(self, max_workers=4, poll_interval=50):
+        self.poll_interval = poll_interval
+        self._reads = ThreadPoolExecutor(max_workers=max_workers, thread_name_prefix="sheets-read")
+        self._writes = ThreadPoolExecutor(max_workers=1, thread_name_prefix="sheets-write")
+        self._results = queue.Queue()
+        self._lock = threading.Lock()
+        self._pending = 0
+        self._root = None
+        self._busy_listeners = []
+
+    def attach(self, root):
+        """Deliver results through this Tk root (each page creates its own)"""
+        self._root = root
+        self._busy_listeners = []
+        root.after(self.poll_interval, lambda: self._poll(root))
+
+    def add_busy_listener(self, callback):
+        """Call callback(pending_count) on the main thread whenever the count changes"""
+        self._busy_listeners.append(callback)
+        callback(self.pending())
+
+    def pending(self):
+        with self._lock:
+            return self._pending
+
+    def submit(self, func, *args, on_success=None, on_error=None, write=False, **kwargs):
+        """Run func(*args, **kwargs) in the background and report back on the main thread"""
+        with self._lock:
+            self._pending += 1
+        self._notify_busy()
+        pool = self._writes if write else self._reads
+        context = contextvars.copy_context()
+        return pool.submit(context.run, self._run, func, args, kwargs, on_success, on_error)
+
+    def post(self, callback, value):
+        """Call callback(value) on the main thread, e.g. progress from a running job"""
+        self._results.put((callback, value, False, False, contextvars.copy_context()))
+
+    def _run(self, func, args, kwargs, on_success, on_error):
+        try:
+            result = func(*args, **kwargs)
+        except Exception as e:
+            self._results.put((on_error, e, True, True, contextvars.copy_context()))
+        else:
+            self._results.put((on_success, result, False, True, contextvars.copy_context()))
+
+    def _poll(self, root):
+        if root is not self._root:
+            return  # A newer page took over
+
+        # Schedule the next poll first: a callback may open a modal dialog, whose
+        # nested event loop must keep delivering results
+        try:
+            root.after(self.poll_interval, lambda: self._poll(root))
+        except Exception:
+            # The root window was destroyed
+            self._root = None
+            return
+
+        while True:
+            try:
+                callback, value, failed, finished, context = self._results.get_nowait()
+            except queue.Empty:
+                break
+            if finished:
+                with self._lock:
+                    self._pending -= 1
+                self._notify_busy()
+            if callback is not None:
+                try:
+                    context.run(callback, value)
+                except Exception:
+                    traceback.print_exc()
+            elif failed:
+                print(f"Error in background Sheets call: {value}")
+
+    def _notify_busy(self):
+        if threading.current_thread() is not threading.main_thread():
+            return
+        count = self.pending()
+        for callback in list(self._busy_listeners):
+            try:
+                callback(count)
+            except Exception:
+                # The widget behind this listener is gone
+                self._busy_listeners.remove(callback)
+
+
+# Shared by every window of the application
+sheets_executor = SheetsExecutor()
@@ -0,0 +1,113 @@
+import contextvars
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+from inventory_model import NAME_COLUMN, QUANTITY_COLUMN, parse_quantity
+from local_store import local_store
+from sheet_cache import SheetCache, inventory_cache
+from storage import get_backend
+
+# Inventories read at the same time by read_all(); more sites wait for a free slot
+MAX_PARALLEL_SITES = 8
+
+
+class SiteInventories:
+    """The inventories of every configured site, read in parallel"""
+
+    def __init__(self, max_workers=MAX_PARALLEL_SITES):
+        self._pool = ThreadPoolExecutor(max_workers=max_workers, thread_name_prefix="sites-read")
+        self._caches = {}  # Site -> (inventory sheet ID, cache)
+        self._lock = threading.Lock()
+
+    def read_all(self, config, force=False):
+        """Every site's inventory merged by material, with per-site timings and errors"""
+        started = time.perf_counter()
+        sites = config.get_sites()
+        futures = {site: self._pool.submit(contextvars.copy_context().run, self._read_site, config, site, force)
+                   for site in sites}
+
+        items = {}
+        timings, errors, offline = {}, {}, []
+        for site, future in futures.items():
+            try:
+                rows, elapsed_ms, from_copy = future.result()
+            except Exception as e:
+                print(f"Error reading the inventory of {site}: {e}")
+                errors[site] = str(e)
+                continue
+            timings[site] = elapsed_ms
+            if from_copy:
+                offline.append(site)
+            for name, quantity in inventory_rows(rows):
+                item = items.setdefault(name, {"name": name, "total": 0.0, "sites": {}})
+                if site not in item["sites"]:
+                    item["sites"][site] = quantity
+                    item["total"] += parse_quantity(quantity) or 0.0
+
+        return {"items": sorted(items.values(), key=lambda item: item["name"].lower()),
+                "sites": sites, "timings": timings, "errors": errors, "offline": offline,
+                "elapsed_ms": (time.perf_counter() - started) * 1000}
+
+    def _read_site(self, config, site, force):
+        started = time.perf_counter()
+        cache = self.cache_for(config, site)
+        rows = cache.get_all_values(force=force)
+        return rows, (time.perf_counter() - started) * 1000, cache.offline
+
+    def cache_for(self, config, site):
+        """The cache holding a site's inventory"""
+        if site == config.get_active_site():
+            return inventory_cache
+        sheet_id = config.get_site_inventory_id(site)
+        with self._lock:
+            known = self._caches.get(site)
+            if known is None or known[0] != sheet_id:
+                # A new site, or one pointed at another spreadsheet
+                known = self._caches[site] = (sheet_id, SheetCache(name=f"inventory@{site}", store=local_store))
+        cache = known[1]
+        if cache.sheet is None:
+            try:
+                cache.set_sheet(get_backend().get_worksheet(sheet_id))
+            except Exception as e:
+                # Without the sheet the cache serves its local copy, if it has one
+                print(f"Error opening the inventory of {site}: {e}")
+        return cache
+
+    def switch_site(self, config, site):
+        """Make site the one requests are fulfilled from, going back if it cannot be read (blocking)"""
+        if local_store.pending_count():
+            # Queued inventory writes would be replayed on the other site's sheet
+            raise RuntimeError("Sync the changes made offline before switching sites")
+        if site == config.get_active_site():
+            return inventory_cache.sheet
+        previous_sheet = inventory_cache.sheet
+        sheet_id = config.get_site_inventory_id(site)
+        try:
+            sheet = get_backend().get_worksheet(sheet_id)
+            inventory_cache.set_sheet(sheet)
+            inventory_cache.get_all_values(force=True)
+            if inventory_cache.offline:
+                raise ConnectionError(f"The inventory of {site} cannot be reached")
+        except Exception:
+            inventory_cache.set_sheet(previous_sheet)
+            raise
+        config.set_active_site(site)
+        with self._lock:
+            # The previous site is now read like any other
+            self._caches.pop(site, None)
+        return sheet
+
+
+def inventory_rows(rows):
+    """(material name, quantity text) of each inventory row, without the header row"""
+    for position, row in enumerate(rows):
+        if len(row) <= QUANTITY_COLUMN or not row[NAME_COLUMN].strip():
+            continue
+        if position == 0 and parse_quantity(row[QUANTITY_COLUMN]) is None:
+            continue  # The header row
+        yield row[NAME_COLUMN].strip(), row[QUANTITY_COLUMN]
+
+
+# Shared by every window of the application
+site_inventories = SiteInventories()
@@ -0,0 +1,331 @@
+import json
+import re
+import sqlite3
+import threading
+import time
+import uuid
+
+from sheet_export import column_index, trimmed
+
+A1_RANGE = re.compile(r"^([A-Z]*)(\d*)(?::([A-Z]*)(\d*))?$")
+
+
+class WorksheetNotFound(Exception):
+    pass
+
+
+class SQLiteBackend:
+    """Spreadsheets kept in a local SQLite file, behind the subset of gspread the app uses"""
+
+    name = "sqlite"
+
+    def __init__(self, path):
+        self.path = path
+        self._connection = None
+        self._lock = threading.RLock()
+
+    def connect(self):
+        self._db()
+        return self
+
+    def get_worksheet(self, key, title=None):
+        spreadsheet = self.open_spreadsheet(key)
+        return spreadsheet.sheet1 if title is None else spreadsheet.worksheet(title)
+
+    def get_or_create_worksheet(self, key, title, header, rows=100, cols=20):
+        with self._lock:
+            try:
+                return self.get_worksheet(key, title)
+            except WorksheetNotFound:
+                worksheet = self.open_spreadsheet(key).add_worksheet(title=title, rows=rows, cols=cols)
+                worksheet.append_row(header)
+                return worksheet
+
+    def open_spreadsheet(self, key):
+        with self._lock:
+            db = self._db()
+            row = db.execute("SELECT title FROM spreadsheets WHERE key = ?", (key,)).fetchone()
+            if row is None:
+                with db:
+                    db.execute("INSERT INTO spreadsheets (key, title, modified) VALUES (?, ?, ?)",
+                               (key, key, time.time()))
+                return SQLiteSpreadsheet(self, key, key)
+            return SQLiteSpreadsheet(self, key, row[0])
+
+    def create_spreadsheet(self, title):
+        key = uuid.uuid4().hex
+        with self._lock:
+            db = self._db()
+            with db:
+                db.execute("INSERT INTO spreadsheets (key, title, modified) VALUES (?, ?, ?)",
+                           (key, title, time.time()))
+        return key
+
+    def share_spreadsheet(self, key, email):
+        return True  # Nothing to share in a local file
+
+    def spreadsheet_url(self, key):
+        return f"sqlite:{self.path}/d/{key}"
+
+    def probe(self, key):
+        self.open_spreadsheet(key)
+
+    def reset(self):
+        with self._lock:
+            if self._connection is not None:
+                self._connection.close()
+                self._connection = None
+
+    def _db(self):
+        with self._lock:
+            if self._connection is None:
+                self._connection = sqlite3.connect(self.path, check_same_thread=False)
+                self._connection.executescript("""
+                    CREATE TABLE IF NOT EXISTS spreadsheets (
+                        key TEXT PRIMARY KEY, title TEXT NOT NULL, modified REAL NOT NULL);
+                    CREATE TABLE IF NOT EXISTS worksheets (
+                        id INTEGER PRIMARY KEY AUTOINCREMENT, spreadsheet TEXT NOT NULL,
+                        title TEXT NOT NULL, position INTEGER NOT NULL);
+                    CREATE TABLE IF NOT EXISTS sheet_rows (
+                        worksheet INTEGER NOT NULL, position INTEGER NOT NULL,
+                        width INTEGER NOT NULL, data TEXT NOT NULL);
+                    CREATE INDEX IF NOT EXISTS sheet_rows_position ON sheet_rows (worksheet, position);
+                """)
+            return self._connection
+
+    def _touch(self, db, key):
+        db.execute("UPDATE spreadsheets SET modified = ? WHERE key = ?", (time.time(), key))
+
+
+class SQLiteSpreadsheet:
+    def __init__(self, backend, key, title):
+        self.backend = backend
+        self.id = key
+        self.title = title
+
+    @property
+    def sheet1(self):
+        with self.backend._lock:
+            db = self.backend._db()
+            row = db.execute("SELECT id, title FROM worksheets WHERE spreadsheet = ? ORDER BY position LIMIT 1",
+                             (self.id,)).fetchone()
+            if row is None:
+                return self.add_worksheet("Sheet1")
+            return SQLiteWorksheet(self, *row)
+
+    def worksheet(self, title):
+        with self.backend._lock:
+            row = self.backend._db().execute(
+                "SELECT id, title FROM worksheets WHERE spreadsheet = ? AND title = ?",
+                (self.id, title)).fetchone()
+        if row is None:
+            raise WorksheetNotFound(title)
+        return SQLiteWorksheet(self, *row)
+
+    def add_worksheet(self, title, rows=100, cols=20):
+        with self.backend._lock:
+            db = self.backend._db()
+            with db:
+                position = db.execute("SELECT COUNT(*) FROM worksheets WHERE spreadsheet = ?",
+                                      (self.id,)).fetchone()[0]
+                cursor = db.execute("INSERT INTO worksheets (spreadsheet, title, position) VALUES (?, ?, ?)",
+                                    (self.id, title, position))
+            return SQLiteWorksheet(self, cursor.lastrowid, title)
+
+    def get_lastUpdateTime(self):
+        with self.backend._lock:
+            return self.backend._db().execute("SELECT modified FROM spreadsheets WHERE key = ?",
+                                              (self.id,)).fetchone()[0]
+
+    def fetch_sheet_metadata(self, params=None):
+        return {"spreadsheetId": self.id}
+
+    def share(self, *args, **kwargs):
+        pass
+
+    def batch_update(self, body):
+        """Apply updateCells, appendCells and deleteDimension requests in one transaction"""
+        worksheets = {}
+        with self.backend._lock:
+            db = self.backend._db()
+            with db:
+                for request in body["requests"]:
+                    (kind, spec), = request.items()
+                    sheet_id = spec["range"]["sheetId"] if "range" in spec else spec["sheetId"]
+                    worksheet = worksheets.setdefault(sheet_id, SQLiteWorksheet(self, sheet_id, ""))
+                    if kind == "updateCells":
+                        grid = spec["range"]
+                        worksheet._update_cells(db, {
+                            (grid["startRowIndex"] + offset + 1, grid["startColumnIndex"] + column + 1): cell_text(cell)
+                            for offset, row in enumerate(spec["rows"]) for column, cell in enumerate(row["values"])})
+                    elif kind == "appendCells":
+                        worksheet._append_rows(db, [[cell_text(cell) for cell in row["values"]] for row in spec["rows"]])
+                    elif kind == "deleteDimension":
+                        grid = spec["range"]
+                        worksheet._delete_rows(db, grid["startIndex"] + 1, grid["endIndex"])
+                    else:
+                        raise ValueError(f"Unsupported request: {kind}")
+                self.backend._touch(db, self.id)
+        return {"spreadsheetId": self.id}
+
+
+class SQLiteWorksheet:
+    def __init__(self, spreadsheet, worksheet_id, title):
+        self.spreadsheet = spreadsheet
+        self.id = worksheet_id
+        self.title = title
+        self._backend = spreadsheet.backend
+
+    @property
+    def row_count(self):
+        with self._backend._lock:
+            return self._backend._db().execute(
+                "SELECT COUNT(*) FROM sheet_rows WHERE worksheet = ?", (self.id,)).fetchone()[0]
+
+    @property
+    def col_count(self):
+        with self._backend._lock:
+            width = self._backend._db().execute(
+                "SELECT MAX(width) FROM sheet_rows WHERE worksheet = ?", (self.id,)).fetchone()[0]
+        return max(width or 0, 1)
+
+    def get_all_values(self):
+        rows = self._rows()
+        width = max((len(row) for row in rows), default=0)
+        return [row + [""] * (width - len(row)) for row in rows]
+
+    def get(self, range_name):
+        """Values of an A1 range, trimmed like the Sheets values API"""
+        match = A1_RANGE.match(range_name.split("!")[-1])
+        if not match:
+            raise ValueError(f"Unsupported range: {range_name}")
+        first_col, first_row, last_col, last_row = match.groups()
+        if last_col is None and last_row is None:
+            last_col, last_row = first_col, first_row
+        first = int(first_row) if first_row else 1
+        last = int(last_row) if last_row else None
+        start = column_index(first_col) - 1 if first_col else 0
+        end = column_index(last_col) if last_col else None
+
+        values = [trimmed(row[start:end]) for row in self._rows(first, last)]
+        while values and not values[-1]:
+            values.pop()
+        return values
+
+    def batch_get(self, ranges):
+        """Values of several A1 ranges at once"""
+        return [self.get(range_name) for range_name in ranges]
+
+    def row_values(self, row):
+        rows = self._rows(row, row)
+        return trimmed(rows[0]) if rows else []
+
+    def col_values(self, col):
+        return trimmed([row[col - 1] if len(row) >= col else "" for row in self._rows()])
+
+    def cell(self, row, col):
+        values = self.row_values(row)
+        return Cell(row, col, values[col - 1] if len(values) >= col else "")
+
+    def update_cell(self, row, col, value):
+        with self._backend._lock:
+            db = self._backend._db()
+            with db:
+                self._update_cells(db, {(row, col): value})
+                self._backend._touch(db, self.spreadsheet.id)
+
+    def append_row(self, values, **kwargs):
+        self.append_rows([values])
+
+    def append_rows(self, rows, **kwargs):
+        with self._backend._lock:
+            db = self._backend._db()
+            with db:
+                self._append_rows(db, rows)
+                self._backend._touch(db, self.spreadsheet.id)
+
+    def delete_rows(self, start_index, end_index=None):
+        end_index = end_index or start_index
+        with self._backend._lock:
+            db = self._backend._db()
+            with db:
+                self._delete_rows(db, start_index, end_index)
+                self._backend._touch(db, self.spreadsheet.id)
+
+    def batch_update(self, data, **kwargs):
+        """Write each {"range": A1 range, "values": rows} block, all in one transaction"""
+        cells = {}
+        for block in data:
+            match = A1_RANGE.match(block["range"].split("!")[-1])
+            first_col, first_row = match.group(1) or "A", int(match.group(2) or 1)
+            for row_offset, row in enumerate(block["values"]):
+                for col_offset, value in enumerate(row):
+                    cells[first_row + row_offset, column_index(first_col) + col_offset] = value
+        with self._backend._lock:
+            db = self._backend._db()
+            with db:
+                self._update_cells(db, cells)
+                self._backend._touch(db, self.spreadsheet.id)
+
+    def clear(self):
+        with self._backend._lock:
+            db = self._backend._db()
+            with db:
+                db.execute("DELETE FROM sheet_rows WHERE worksheet = ?", (self.id,))
+                self._backend._touch(db, self.spreadsheet.id)
+
+    def _rows(self, first=1, last=None):
+        with self._backend._lock:
+            rows = self._backend._db().execute(
+                "SELECT data FROM sheet_rows WHERE worksheet = ? AND position >= ? AND position <= ? "
+                "ORDER BY position", (self.id, first, last if last is not None else 2 ** 62)).fetchall()
+        return [json.loads(data) for (data,) in rows]
+
+    # The writers below run inside the caller's transaction
+
+    def _update_cells(self, db, cells):
+        """Set {(row, col): value}, reading and rewriting each row touched once"""
+        if not cells:
+            return
+        positions = sorted({row for row, col in cells})
+        count = self.row_count
+        if positions[-1] > count:
+            db.executemany("INSERT INTO sheet_rows (worksheet, position, width, data) VALUES (?, ?, 0, '[]')",
+                           [(self.id, position) for position in range(count + 1, positions[-1] + 1)])
+        rows = dict(db.execute(
+            "SELECT position, data FROM sheet_rows WHERE worksheet = ? AND position BETWEEN ? AND ?",
+            (self.id, positions[0], positions[-1])).fetchall())
+        rows = {position: json.loads(rows[position]) for position in positions}
+        for (row, col), value in cells.items():
+            values = rows[row]
+            values += [""] * (col - len(values))
+            values[col - 1] = str(value)
+        db.executemany("UPDATE sheet_rows SET width = ?, data = ? WHERE worksheet = ? AND position = ?",
+                       [(len(values), json.dumps(values), self.id, position) for position, values in rows.items()])
+
+    def _append_rows(self, db, rows):
+        count = self.row_count
+        db.executemany("INSERT INTO sheet_rows (worksheet, position, width, data) VALUES (?, ?, ?, ?)",
+                       [(self.id, count + offset + 1, len(row), json.dumps([str(v) for v in row]))
+                        for offset, row in enumerate(rows)])
+
+    def _delete_rows(self, db, start_index, end_index):
+        db.execute("DELETE FROM sheet_rows WHERE worksheet = ? AND position BETWEEN ? AND ?",
+                   (self.id, start_index, end_index))
+        db.execute("UPDATE sheet_rows SET position = position - ? WHERE worksheet = ? AND position > ?",
+                   (end_index - start_index + 1, self.id, end_index))
+
+
+class Cell:
+    def __init__(self, row, col, value):
+        self.row = row
+        self.col = col
+        self.value = value
+
+
+def cell_text(cell):
+    value = cell.get("userEnteredValue", {})
+    if "numberValue" in value:
+        number = value["numberValue"]
+        return str(int(number)) if float(number).is_integer() else str(number)
+    return str(value.get("stringValue", ""))
@@ -0,0 +1,117 @@
+class StagedChanges:
+    """Inventory adds, updates and removes queued locally until committed in one batchUpdate"""
+
+    def __init__(self):
+        self.changes = {}
+
+    def __len__(self):
+        return len(self.changes)
+
+    def stage(self, name, quantity=None, remove=False):
+        name = name.strip()
+        if not name:
+            return
+        self.changes[name] = ("remove", None) if remove else ("set", str(quantity).strip())
+
+    def discard(self, name):
+        self.changes.pop(name, None)
+
+    def clear(self):
+        self.changes = {}
+
+    def diff(self, rows):
+        """Compare the staged changes with the current sheet rows, one entry per change"""
+        positions = {}
+        for i, row in enumerate(rows):
+            if row and row[0] and row[0] not in positions:
+                positions[row[0]] = i + 1  # Sheet rows are 1-indexed
+
+        entries = []
+        for name, (action, quantity) in list(self.changes.items()):
+            row_index = positions.get(name)
+            old = rows[row_index - 1][1] if row_index and len(rows[row_index - 1]) > 1 else ""
+            entry = {"name": name, "row": row_index, "old": old, "new": quantity, "error": None,
+                     "staged": (action, quantity)}
+            if action == "remove":
+                entry["action"] = "remove"
+                if row_index is None:
+                    entry["error"] = "Material not found"
+            else:
+                entry["action"] = "update" if row_index else "add"
+                if not quantity:
+                    entry["error"] = "Quantity is empty"
+                else:
+                    try:
+                        float(quantity)
+                    except ValueError:
+                        entry["error"] = "Quantity must be a number"
+            entries.append(entry)
+        return entries
+
+    def build_requests(self, entries, sheet_id):
+        """Build the batchUpdate requests for the entries without an error"""
+        valid = [entry for entry in entries if entry["error"] is None]
+        requests = []
+
+        for entry in valid:
+            if entry["action"] == "update":
+                requests.append({"updateCells": {
+                    "range": {"sheetId": sheet_id,
+                              "startRowIndex": entry["row"] - 1, "endRowIndex": entry["row"],
+                              "startColumnIndex": 1, "endColumnIndex": 2},
+                    "rows": [{"values": [cell_value(entry["new"])]}],
+                    "fields": "userEnteredValue"}})
+
+        appended = [{"values": [cell_value(entry["name"], text=True), cell_value(entry["new"])]}
+                    for entry in valid if entry["action"] == "add"]
+        if appended:
+            requests.append({"appendCells": {"sheetId": sheet_id, "rows": appended,
+                                             "fields": "userEnteredValue"}})
+
+        removed = [entry["row"] for entry in valid if entry["action"] == "remove"]
+        for start, end in collapse_ranges(removed):
+            requests.append({"deleteDimension": {"range": {
+                "sheetId": sheet_id, "dimension": "ROWS",
+                "startIndex": start - 1, "endIndex": end}}})
+        return requests
+
+    def commit(self, worksheet, rows):
+        """Apply the staged changes to the worksheet and return a per-row report; failed ones stay staged"""
+        entries = self.diff(rows)
+        requests = self.build_requests(entries, worksheet.id)
+        if requests:
+            try:
+                worksheet.spreadsheet.batch_update({"requests": requests})
+            except Exception as e:
+                # The batch is applied all-or-nothing, so every row failed
+                for entry in entries:
+                    if entry["error"] is None:
+                        entry["error"] = f"Batch failed: {e}"
+                return entries
+
+        for entry in entries:
+            # Keep the change if it was re-staged while the batch was in flight
+            if entry["error"] is None and self.changes.get(entry["name"]) == entry["staged"]:
+                self.discard(entry["name"])
+        return entries
+
+
+def cell_value(value, text=False):
+    """A CellData entry; numbers are written as numbers like update_cell does"""
+    if not text:
+        try:
+            return {"userEnteredValue": {"numberValue": float(value)}}
+        except (TypeError, ValueError):
+            pass
+    return {"userEnteredValue": {"stringValue": str(value)}}
+
+
+def collapse_ranges(row_indexes):
+    """Collapse row numbers into (start, end) ranges, highest range first"""
+    ranges = []
+    for row_index in sorted(set(row_indexes), reverse=True):
+        if ranges and ranges[-1][0] == row_index + 1:
+            ranges[-1] = (row_index, ranges[-1][1])
+        else:
+            ranges.append((row_index, row_index))
+    return ranges
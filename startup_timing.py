@@ -0,0 +1,23 @@
+import json
+import os
+import time
+
+# Set by benchmarks/startup.py to the time the process was launched, so the
+# interpreter start-up is part of the measurement
+_started = float(os.environ.get("IMS_STARTUP_T0") or time.time())
+
+marks = {}
+
+
+def mark(name):
+    """Record the seconds since start-up at which a milestone was first reached"""
+    marks.setdefault(name, round(time.time() - _started, 4))
+
+
+def benchmark_enabled():
+    return bool(os.environ.get("IMS_STARTUP_BENCHMARK"))
+
+
+def report():
+    """Print the milestones as one JSON line (read by benchmarks/startup.py)"""
+    print(json.dumps(marks), flush=True)
@@ -0,0 +1,81 @@
+import sheets_client
+from config import Config
+
+# A storage backend holds spreadsheets of worksheets. Worksheets are whatever
+# the backend hands out, as long as they answer the part of the gspread
+# Worksheet API the app uses:
+#
+#   read:   get_all_values(), get(a1_range), batch_get(a1_ranges), row_values(row),
+#           col_values(col), row_count, col_count, id, spreadsheet
+#   write:  update_cell(row, col, value), append_row(values), append_rows(rows),
+#           delete_rows(start, end=None), batch_update([{"range", "values"}]), clear()
+#
+# and whose spreadsheet answers batch_update({"requests": [...]}),
+# get_lastUpdateTime() and fetch_sheet_metadata(). Finding a row by key is done
+# on the col_values() of the key column (see SheetCache and login.lookup_user).
+
+_backend = None
+
+
+class GoogleSheetsBackend:
+    """Worksheets in Google Sheets, through the shared gspread client"""
+
+    name = "sheets"
+
+    def connect(self):
+        return sheets_client.get_client()
+
+    def get_worksheet(self, key, title=None):
+        return sheets_client.get_worksheet(key, title)
+
+    def get_or_create_worksheet(self, key, title, header, rows=100, cols=20):
+        return sheets_client.get_or_create_worksheet(key, title, header, rows, cols)
+
+    def open_spreadsheet(self, key):
+        return sheets_client.open_spreadsheet(key)
+
+    def create_spreadsheet(self, title):
+        spreadsheet = sheets_client.get_sheets_service().spreadsheets().create(
+            body={'properties': {'title': title}}, fields='spreadsheetId').execute()
+        return spreadsheet.get('spreadsheetId')
+
+    def share_spreadsheet(self, key, email):
+        # Share with the user with editor access
+        sheets_client.open_spreadsheet(key).share(
+            email,
+            perm_type='user',
+            role='writer',
+            notify=True,
+            with_link=True
+        )
+        return True
+
+    def spreadsheet_url(self, key):
+        return f"https://docs.google.com/spreadsheets/d/{key}"
+
+    def probe(self, key):
+        sheets_client.probe(key)
+
+    def reset(self):
+        sheets_client.reset()
+
+
+def get_backend():
+    """The storage backend chosen in the configuration ("sheets" or "sqlite")"""
+    global _backend
+    if _backend is None:
+        config = Config()
+        if config.get_storage_backend() == "sqlite":
+            from sqlite_backend import SQLiteBackend
+            _backend = SQLiteBackend(config.get_storage_path())
+        else:
+            _backend = GoogleSheetsBackend()
+    return _backend
+
+
+def reset():
+    """Forget the backend, e.g. after the configuration changed"""
+    global _backend
+    if _backend is not None:
+        _backend.reset()
+    _backend = None
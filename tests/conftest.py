@@ -0,0 +1,33 @@
+import os
+import sys
+
+import pytest
+
+# The modules live at the repository root
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from local_store import LocalStore
+from sqlite_backend import SQLiteBackend
+
+
+class Unreachable:
+    """Wraps a worksheet so every call fails like a lost connection while down is set"""
+
+    def __init__(self, sheet):
+        self._sheet = sheet
+        self.down = False
+
+    def __getattr__(self, name):
+        if self.down:
+            raise ConnectionError("Google cannot be reached")
+        return getattr(self._sheet, name)
+
+
+@pytest.fixture
+def backend(tmp_path):
+    return SQLiteBackend(str(tmp_path / "sheets.db")).connect()
+
+
+@pytest.fixture
+def store(tmp_path):
+    return LocalStore(str(tmp_path / "local_store.db"))
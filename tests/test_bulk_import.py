@@ -0,0 +1,112 @@
+import pytest
+
+from bulk_import import BulkImport, ImportFileError, PASSWORD_MASK
+from passwords import hash_password
+from sheet_cache import SheetCache
+
+INVENTORY = [["Material", "Quantity", "Reorder Point"], ["bolts", "10", "2"], ["nuts", "5"], ["pins", "n/a"]]
+USERS = [["Role", "Email", "Password"], ["admin", "boss@example.com", hash_password("boss")],
+         ["user", "ann@example.com", hash_password("ann")]]
+
+
+@pytest.fixture
+def sheet(backend, store):
+    """sheet(rows, key_column) is a cache over a worksheet holding rows"""
+    def sheet(rows, key_column=0):
+        worksheet = backend.get_worksheet(f"sheet{key_column}")
+        worksheet.append_rows(rows)
+        return SheetCache(sheet=worksheet, key_column=key_column, name=f"sheet{key_column}", store=store)
+    return sheet
+
+
+def csv_file(tmp_path, text):
+    path = tmp_path / "import.csv"
+    path.write_text(text, encoding="utf-8")
+    return str(path)
+
+
+def by_key(plan):
+    return {entry["key"]: entry for entry in plan["entries"]}
+
+
+def test_plan_inventory(tmp_path, sheet):
+    path = csv_file(tmp_path, "Material,Qty,Reorder point\n"
+                              "bolts,10,3\n"
+                              "nuts,5,\n"
+                              "washers,4,\n"
+                              "gears,,1\n"
+                              "bolts,1,\n"
+                              "springs,many,\n")
+
+    plan = BulkImport("inventory", path).plan(sheet(INVENTORY))
+    entries = by_key(plan)
+
+    assert plan["counts"] == {"add": 1, "update": 1, "unchanged": 1, "error": 3}
+    assert entries["nuts"]["action"] == "unchanged"
+    assert (entries["washers"]["action"], entries["washers"]["changes"]) == \
+        ("add", {0: ("", "washers"), 1: ("", "4")})
+    assert entries["gears"]["error"] == "A new material needs a quantity"
+    assert entries["springs"]["error"] == "Quantity must be a number"
+    assert [entry["error"] for entry in plan["entries"] if entry["key"] == "bolts"] == \
+        [None, "Duplicate of line 2"]
+    bolts = plan["entries"][0]
+    assert (bolts["action"], bolts["row"], bolts["changes"]) == ("update", 2, {2: ("2", "3")})
+
+
+def test_plan_adds_quantities_to_the_stock(tmp_path, sheet):
+    path = csv_file(tmp_path, "material,quantity\nbolts,2.5\npins,1\n")
+
+    entries = by_key(BulkImport("inventory", path, add_quantities=True).plan(sheet(INVENTORY)))
+
+    assert entries["bolts"]["changes"] == {1: ("10", "12.5")}
+    assert entries["pins"]["error"] == "The stock of pins is not a number"
+
+
+def test_plan_users(tmp_path, sheet):
+    path = csv_file(tmp_path, "email;role;password\n"
+                              "ann@example.com;admin;\n"
+                              "new@example.com;;secret\n"
+                              "nopass@example.com;user;\n"
+                              "not-an-email;user;x\n"
+                              "boss@example.com;owner;x\n")
+
+    entries = by_key(BulkImport("users", path).plan(sheet(USERS, key_column=1)))
+
+    assert entries["ann@example.com"]["changes"] == {0: ("user", "admin")}
+    assert entries["new@example.com"]["action"] == "add"
+    assert entries["new@example.com"]["changes"][0] == ("", "user")  # Default role
+    assert entries["nopass@example.com"]["error"] == "A new user needs a password"
+    assert entries["not-an-email"]["error"] == "Invalid email: not-an-email"
+    assert entries["boss@example.com"]["error"] == "Invalid role: owner"
+
+
+def test_a_file_without_the_key_column_is_rejected(tmp_path, sheet):
+    path = csv_file(tmp_path, "quantity\n3\n")
+    with pytest.raises(ImportFileError):
+        BulkImport("inventory", path).plan(sheet(INVENTORY))
+
+
+def test_build_requests_keeps_the_columns_between_changed_ones(tmp_path, sheet):
+    path = csv_file(tmp_path, "material,reorder point,lead time\nnuts,1,4\n")
+    importer = BulkImport("inventory", path)
+    plan = importer.plan(sheet([["Material", "Quantity", "Reorder Point", "Lead Time (days)"],
+                                ["nuts", "5", "", "2"]]))
+
+    request, = importer.build_requests(plan["entries"], 3)
+
+    assert request["updateCells"]["range"]["startColumnIndex"] == 2
+    assert request["updateCells"]["rows"] == [{"values": [{"userEnteredValue": {"numberValue": 1.0}},
+                                                          {"userEnteredValue": {"numberValue": 4.0}}]}]
+
+
+def test_reimporting_the_same_passwords_changes_nothing(tmp_path, sheet):
+    path = csv_file(tmp_path, "email,role,password\n"
+                              "boss@example.com,admin,boss\n"
+                              "ann@example.com,user,new\n")
+
+    plan = BulkImport("users", path).plan(sheet(USERS, key_column=1))
+    entries = by_key(plan)
+
+    assert entries["boss@example.com"]["action"] == "unchanged"
+    # The stored hash is never shown
+    assert entries["ann@example.com"]["changes"] == {2: (PASSWORD_MASK, "new")}
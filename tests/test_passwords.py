@@ -0,0 +1,105 @@
+import hashlib
+
+import pytest
+
+import migrate_passwords
+import passwords
+from passwords import hash_password, is_hashed, verify_password, verify_unknown_user
+from sheet_cache import SheetCache
+
+CREDENTIALS = [["Role", "Email", "Password"], ["admin", "boss@example.com", hash_password("s3cret")],
+               ["user", "ann@example.com", "legacy"]]
+
+
+def test_hash_and_verify_round_trip():
+    stored = hash_password("s3cret")
+
+    assert stored.startswith("scrypt$") and is_hashed(stored)
+    assert verify_password("s3cret", stored)
+    assert not verify_password("S3cret", stored)
+    assert hash_password("s3cret") != stored  # Salted
+
+
+def test_pbkdf2_is_used_without_scrypt(monkeypatch):
+    monkeypatch.delattr(hashlib, "scrypt")
+    monkeypatch.setattr(passwords, "PBKDF2_ITERATIONS", 1000)
+    stored = hash_password("s3cret")
+
+    assert stored.startswith("pbkdf2_sha256$1000$")
+    assert verify_password("s3cret", stored)
+    assert not verify_password("wrong", stored)
+
+
+def test_plain_text_and_malformed_passwords():
+    assert verify_password("legacy", "legacy")
+    assert not is_hashed("legacy")
+    assert not verify_password("legacy", "scrypt$not$a$hash")
+    assert verify_unknown_user("anything") is False
+
+
+@pytest.fixture
+def credentials(backend, store):
+    worksheet = backend.get_worksheet("credentials")
+    worksheet.append_rows(CREDENTIALS)
+    return worksheet, SheetCache(sheet=worksheet, key_column=1, name="credentials", store=store)
+
+
+@pytest.fixture
+def login(credentials, monkeypatch):
+    login = pytest.importorskip("login")  # Needs customtkinter
+    monkeypatch.setattr(login, "credentials_cache", credentials[1])
+    return login
+
+
+def test_authenticate(login):
+    assert login.authenticate("boss@example.com", "s3cret") == "admin"
+    assert login.authenticate("boss@example.com", "wrong") is None
+    assert login.lookup_user("boss@example.com")[::2] == ("admin", 2)
+
+
+def test_unknown_users_take_as_long_as_known_ones(login, monkeypatch):
+    checked = []
+    monkeypatch.setattr(login, "verify_unknown_user", lambda password: checked.append(password) or False)
+
+    assert login.authenticate("nobody@example.com", "s3cret") is None
+    assert login.authenticate("Email", "Password") is None  # The header row is not a user
+    assert checked == ["s3cret", "Password"]
+
+
+def test_a_plain_text_password_is_hashed_on_login(login, credentials):
+    worksheet, cache = credentials
+
+    assert login.authenticate("ann@example.com", "wrong") is None
+    assert worksheet.row_values(3)[2] == "legacy"
+    assert login.authenticate("ann@example.com", "legacy") == "user"
+
+    stored = worksheet.row_values(3)[2]
+    assert is_hashed(stored) and verify_password("legacy", stored)
+    cache.invalidate()
+    assert login.authenticate("ann@example.com", "legacy") == "user"
+
+
+def test_migration_hashes_plain_text_passwords_in_one_batch(backend, monkeypatch, capsys):
+    worksheet = backend.get_worksheet("credentials")
+    worksheet.append_rows(CREDENTIALS + [["user", "new@example.com", ""], ["user", "bob@example.com", "pw"]])
+    batches = []
+    batch_update = worksheet.batch_update
+    worksheet.batch_update = lambda data, **kwargs: batches.append(data) or batch_update(data, **kwargs)
+    monkeypatch.setattr(migrate_passwords, "Config", lambda: type("Config", (), {
+        "get_credentials_sheet_id": lambda self: "credentials"})())
+    monkeypatch.setattr(migrate_passwords, "get_backend", lambda: type("Backend", (), {
+        "get_worksheet": lambda self, key: worksheet})())
+    monkeypatch.setattr("sys.argv", ["migrate_passwords.py"])
+
+    migrate_passwords.main()
+
+    assert [block["range"] for data in batches for block in data] == ["C2:C5"]
+    column = worksheet.col_values(3)
+    assert column[1] == CREDENTIALS[1][2]  # Already hashed: left alone
+    assert verify_password("legacy", column[2]) and verify_password("pw", column[4])
+    assert column[3] == ""
+    assert "2 of 4 passwords need hashing" in capsys.readouterr().out
+
+    batches.clear()
+    migrate_passwords.main()  # Running it again changes nothing
+    assert batches == []
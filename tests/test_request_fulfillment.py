@@ -0,0 +1,122 @@
+import pytest
+
+import request_fulfillment
+from conftest import Unreachable
+from request_fulfillment import RequestProcessor, FulfillmentError, plan_fulfillment, STATUS_COLUMN
+from request_history import RequestIndex
+from sheet_cache import SheetCache
+
+INVENTORY = [["Material", "Quantity"], ["bolts", "10"], ["nuts", "3"], ["pins", "many"]]
+REQUESTS = [["Email", "Material", "Quantity", "Date", "Notes"],
+            ["ann@example.com", "bolts", "6", "2024-01-01"],
+            ["bob@example.com", "bolts", "6", "2024-01-02"],
+            ["ann@example.com", "nuts", "5", "2024-01-03"]]
+
+
+def by_row(plan):
+    return {entry["row"]: entry for entry in plan["entries"]}
+
+
+def test_plan_allocates_the_oldest_requests_first():
+    requests = [(2, ["ann@example.com", "bolts", "6"]), (3, ["bob@example.com", "bolts", "6"]),
+                (4, ["cid@example.com", "bolts", "1"]), (5, ["ann@example.com", "nuts", "5"]),
+                (6, ["bob@example.com", "gears", "1"]), (7, ["bob@example.com", "pins", "1"]),
+                (8, ["bob@example.com", "nuts", "zero"])]
+
+    plan = plan_fulfillment(requests, INVENTORY)
+    entries = by_row(plan)
+
+    assert (entries[2]["status"], entries[2]["granted"]) == ("approved", 6)
+    assert (entries[3]["status"], entries[3]["granted"], entries[3]["reason"]) == \
+        ("partial", 4, "Only 4 in stock")
+    assert (entries[4]["status"], entries[4]["reason"]) == ("rejected", "Out of stock")
+    assert (entries[5]["status"], entries[5]["granted"]) == ("partial", 3)
+    assert entries[6]["reason"] == "Material not found"
+    assert entries[7]["reason"] == "Stock of pins is not a number"
+    assert entries[8]["reason"] == "Invalid quantity"
+    assert plan["stock"] == {"bolts": {"row": 2, "name": "bolts", "old": "10", "new": "0"},
+                             "nuts": {"row": 3, "name": "nuts", "old": "3", "new": "0"}}
+    assert plan["counts"] == {"approved": 1, "partial": 2, "rejected": 4}
+    # pins was consulted but not written
+    assert [item["name"] for item in plan["consulted"]] == ["bolts", "nuts", "pins"]
+
+
+def test_plan_without_partial_approvals():
+    plan = plan_fulfillment([(2, ["ann@example.com", "nuts", "5"])], INVENTORY, allow_partial=False)
+
+    assert (plan["entries"][0]["status"], plan["entries"][0]["reason"]) == ("rejected", "Only 3 in stock")
+    assert plan["stock"] == {}
+
+
+@pytest.fixture
+def sheets(backend, store, monkeypatch):
+    monkeypatch.setattr(request_fulfillment, "local_store", store)
+    inventory = backend.get_worksheet("inventory")
+    inventory.append_rows(INVENTORY)
+    assignments = Unreachable(backend.get_or_create_worksheet("credentials", "user_assignments", REQUESTS[0]))
+    assignments.append_rows(REQUESTS[1:])
+    inventory_cache = SheetCache(sheet=inventory, name="inventory", store=store)
+    assignments_cache = SheetCache(sheet=assignments, name="user_assignments", store=store, unique_keys=False)
+    processor = RequestProcessor(inventory_cache, assignments_cache, RequestIndex(assignments_cache, store))
+    return processor, inventory, assignments
+
+
+def test_apply_writes_quantities_and_statuses(sheets):
+    processor, inventory, assignments = sheets
+
+    processor.apply(processor.plan())
+
+    assert [row[1] for row in inventory.get_all_values()] == ["Quantity", "0", "0", "many"]
+    assert [row[STATUS_COLUMN - 1:STATUS_COLUMN + 1] for row in assignments.get_all_values()] == \
+        [["Status", "Fulfilled"], ["approved", "6"], ["partial", "4"], ["partial", "3"]]
+    assert processor.plan()["entries"] == []
+    assert processor.inventory_cache.row_values(2) == ["bolts", "0"]
+
+
+def test_apply_refuses_when_the_stock_changed_since_the_plan(sheets):
+    processor, inventory, assignments = sheets
+    plan = processor.plan()
+    inventory.update_cell(3, 2, "30")
+
+    with pytest.raises(FulfillmentError):
+        processor.apply(plan)
+    assert [row[1] for row in inventory.get_all_values()] == ["Quantity", "10", "30", "many"]
+    assert all(len(row) < STATUS_COLUMN or not row[STATUS_COLUMN - 1] for row in assignments.get_all_values())
+
+
+def test_apply_refuses_when_a_request_changed_since_the_plan(sheets):
+    processor, inventory, assignments = sheets
+    plan = processor.plan()
+    assignments.update_cell(3, 3, "1")
+
+    with pytest.raises(FulfillmentError):
+        processor.apply(plan)
+    assert [row[1] for row in inventory.get_all_values()] == ["Quantity", "10", "3", "many"]
+
+
+def test_stock_is_restored_when_the_status_batch_fails(sheets):
+    processor, inventory, assignments = sheets
+    plan = processor.plan()
+    spreadsheet = inventory.spreadsheet
+    update = spreadsheet.batch_update
+
+    def inventory_batch(body):
+        result = update(body)
+        assignments.down = True  # The connection drops before the second batch
+        return result
+
+    spreadsheet.batch_update = inventory_batch
+
+    with pytest.raises(FulfillmentError, match="inventory was restored"):
+        processor.apply(plan)
+    assignments.down = False
+    assert inventory.get_all_values() == INVENTORY
+    assert all(len(row) < STATUS_COLUMN or not row[STATUS_COLUMN - 1] for row in assignments.get_all_values())
+
+
+def test_plan_refuses_while_offline_writes_are_queued(sheets, store):
+    processor, inventory, assignments = sheets
+    store.enqueue("inventory", "update_cell", [2, 2, "1"], {"key": "bolts", "value": "10"})
+
+    with pytest.raises(FulfillmentError):
+        processor.plan()
@@ -0,0 +1,85 @@
+import pytest
+
+from conftest import Unreachable
+from request_history import RequestIndex, StaleIndex
+from sheet_cache import SheetCache
+
+HEADER = ["Email", "Material", "Quantity", "Date"]
+
+
+@pytest.fixture
+def worksheet(backend):
+    worksheet = Unreachable(backend.get_worksheet("credentials"))
+    worksheet.append_rows([HEADER,
+                           ["ann@example.com", "bolts", "1", "2024-01-01"],
+                           ["bob@example.com", "nuts", "2", "2024-01-02"],
+                           ["ann@example.com", "pins", "3", "2024-01-03"],
+                           ["ann@example.com", "gears", "4", "2024-01-04"]])
+    return worksheet
+
+
+@pytest.fixture
+def cache(worksheet, store):
+    return SheetCache(sheet=worksheet, name="user_assignments", store=store, unique_keys=False)
+
+
+def materials(page):
+    return [values[1] for row, values in page["rows"]]
+
+
+def test_index_pages_a_users_requests_newest_first(cache, store):
+    index = RequestIndex(cache, store, page_size=2)
+
+    assert index.refresh()
+    assert index.rows_for("ann@example.com") == [5, 4, 2]
+    assert [email for row, email, date in index.entries()] == \
+        ["ann@example.com", "ann@example.com", "bob@example.com", "ann@example.com"]
+
+    first = index.user_page("ann@example.com")
+    assert (materials(first), first["pages"], first["total"]) == (["gears", "pins"], 2, 3)
+    assert materials(index.user_page("ann@example.com", 1)) == ["bolts"]
+
+
+def test_refresh_only_adds_new_rows(worksheet, cache, store):
+    index = RequestIndex(cache, store)
+    index.refresh()
+    index._rebuild = lambda: pytest.fail("rebuilt the index")
+
+    assert not index.refresh()
+    worksheet.append_row(["bob@example.com", "washers", "5", "2024-01-05"])
+    assert index.refresh()
+    assert index.rows_for("bob@example.com") == [6, 3]
+
+
+def test_refresh_skips_a_blank_tail_row(cache, store):
+    # Built from the local copy, which keeps a row the values API trims off
+    store.save_rows("user_assignments_index", [["Email", "Date"], ["ann@example.com", "2024-01-01"],
+                                               ["bob@example.com", "2024-01-02"],
+                                               ["ann@example.com", "2024-01-03"],
+                                               ["ann@example.com", "2024-01-04"], ["", ""]])
+    index = RequestIndex(cache, store)
+    index._rebuild = lambda: pytest.fail("rebuilt the index")
+
+    assert not index.refresh()
+    assert not index.refresh()
+
+
+def test_a_removed_row_rebuilds_the_index(worksheet, cache, store):
+    index = RequestIndex(cache, store)
+    index.refresh()
+    worksheet.delete_rows(2)
+
+    with pytest.raises(StaleIndex):
+        index.fetch([5, 4, 2])
+    assert index.rows_for("ann@example.com") == [4, 3]
+    assert materials(index.user_page("ann@example.com")) == ["gears", "pins"]
+
+
+def test_offline_index_comes_from_the_local_copy(worksheet, cache, store):
+    cache.get_all_values()
+    worksheet.down = True
+    index = RequestIndex(cache, store)
+
+    assert index.refresh()
+    assert index.offline
+    assert materials(index.user_page("bob@example.com")) == ["nuts"]
@@ -0,0 +1,140 @@
+import threading
+import time
+from types import SimpleNamespace
+
+import pytest
+
+from request_scheduler import RequestScheduler, TokenBucket
+
+
+class APIError(Exception):
+    def __init__(self, status, headers=None):
+        super().__init__(f"HTTP {status}")
+        self.response = SimpleNamespace(status_code=status, headers=headers or {})
+
+
+class Responses:
+    """A send function answering with the given errors, then "ok" """
+
+    def __init__(self, *errors):
+        self.errors = list(errors)
+        self.calls = []
+
+    def __call__(self, method, endpoint, *args, **kwargs):
+        self.calls.append((method, endpoint))
+        if self.errors:
+            raise self.errors.pop(0)
+        return "ok"
+
+
+def scheduler(send, **kwargs):
+    sleeps = []
+    return RequestScheduler(send, sleep=sleeps.append, **kwargs), sleeps
+
+
+def test_reads_are_retried_on_429_and_5xx():
+    send = Responses(APIError(429), APIError(503))
+    requests, sleeps = scheduler(send)
+
+    assert requests.request("GET", "values") == "ok"
+    assert len(send.calls) == 3
+    assert len(sleeps) == 2
+
+
+def test_writes_are_only_retried_on_429():
+    send = Responses(APIError(429), APIError(500))
+    requests, sleeps = scheduler(send)
+
+    with pytest.raises(APIError):
+        requests.request("POST", "batchUpdate")
+    assert len(send.calls) == 2
+
+
+def test_retry_after_is_honoured():
+    send = Responses(APIError(429, {"Retry-After": "7"}))
+    requests, sleeps = scheduler(send)
+
+    requests.request("GET", "values")
+    assert sleeps == [7.0]
+
+
+def test_a_long_retry_after_is_capped():
+    send = Responses(APIError(429, {"Retry-After": "3600"}))
+    requests, sleeps = scheduler(send, max_delay=32.0)
+
+    requests.request("GET", "values")
+    assert sleeps == [32.0]
+
+
+def test_each_instance_keeps_to_its_share_of_the_quota():
+    requests, sleeps = scheduler(Responses(), instances=4)
+
+    for _ in range(15):  # A quarter of the 60 reads per minute per user
+        requests.request("GET", "values", _)
+    assert sleeps == []
+    requests.request("GET", "values", "one more")
+    assert sleeps == [pytest.approx(4.0, abs=0.1)]
+
+
+def test_backoff_is_jittered_below_the_exponential_bound():
+    send = Responses(*[APIError(503)] * 4)
+    requests, sleeps = scheduler(send, base_delay=1.0, max_delay=4.0)
+
+    requests.request("GET", "values")
+    assert len(sleeps) == 4
+    assert all(0 <= delay <= bound for delay, bound in zip(sleeps, (1, 2, 4, 4)))
+
+
+def test_gives_up_after_max_retries():
+    send = Responses(*[APIError(429)] * 3)
+    requests, sleeps = scheduler(send, max_retries=2)
+
+    with pytest.raises(APIError):
+        requests.request("GET", "values")
+    assert len(send.calls) == 3
+
+
+def test_other_errors_are_not_retried():
+    send = Responses(APIError(404))
+    requests, sleeps = scheduler(send)
+
+    with pytest.raises(APIError):
+        requests.request("GET", "values")
+    assert len(send.calls) == 1
+
+
+def test_identical_reads_in_flight_share_one_call():
+    started, release = threading.Event(), threading.Event()
+    calls = []
+
+    def send(method, endpoint, *args, **kwargs):
+        calls.append(endpoint)
+        started.set()
+        release.wait(5)
+        return len(calls)
+
+    requests, sleeps = scheduler(send)
+    results = []
+    threads = [threading.Thread(target=lambda: results.append(requests.request("GET", "values", "A1:B")))
+               for _ in range(3)]
+    threads[0].start()
+    started.wait(5)
+    for thread in threads[1:]:
+        thread.start()
+    time.sleep(0.2)  # Let the followers join the call in flight
+    release.set()
+    for thread in threads:
+        thread.join(5)
+
+    assert calls == ["values"]
+    assert results == [1, 1, 1]
+    # Once it has finished, the same read is sent again
+    assert requests.request("GET", "values", "A1:B") == 2
+
+
+def test_token_bucket_waits_once_the_burst_is_spent():
+    bucket = TokenBucket(60, period=60.0, capacity=2)
+
+    assert bucket.reserve() == 0.0
+    assert bucket.reserve() == 0.0
+    assert bucket.reserve() == pytest.approx(1.0, abs=0.05)
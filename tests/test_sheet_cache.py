@@ -0,0 +1,215 @@
+import pytest
+
+import sheet_cache
+from conftest import Unreachable
+from sheet_cache import SheetCache, Conflict, SYNC_INTERVAL
+from sheet_export import trimmed
+
+HEADER = ["Material", "Quantity"]
+
+
+def inventory(backend, count):
+    worksheet = backend.get_worksheet("inventory")
+    worksheet.append_rows([HEADER] + [[f"m{i}", str(i)] for i in range(count)])
+    return worksheet
+
+
+def replay_all(cache, store):
+    for entry in store.outbox():
+        cache.replay(entry)
+        store.mark_sent(entry["id"])
+
+
+def test_sync_without_changes_reads_nothing_new(backend, store):
+    cache = SheetCache(sheet=inventory(backend, 10), name="inventory", store=store)
+    cache.get_all_values()
+    cache.sync()
+    assert cache.sync() == {"reloaded": False, "changed": {}, "appended": {}}
+
+
+def test_sync_appends_new_rows(backend, store):
+    worksheet = inventory(backend, 10)
+    cache = SheetCache(sheet=worksheet, name="inventory", store=store)
+    cache.get_all_values()
+    worksheet.append_rows([["new1", "1"], ["new2", "2"]])
+
+    result = cache.sync()
+
+    assert not result["reloaded"]
+    assert result["appended"] == {11: ["new1", "1"], 12: ["new2", "2"]}
+    assert cache.find_row("new2") == 13
+    assert cache.get_all_values() == worksheet.get_all_values()
+
+
+def test_sync_finds_an_edit_in_place_within_one_rotation(backend, store):
+    worksheet = inventory(backend, 300)
+    cache = SheetCache(sheet=worksheet, name="inventory", store=store)
+    cache.get_all_values()
+    worksheet.update_cell(251, 2, "edited")
+
+    changed = {}
+    for _ in range(4):  # 301 rows, verified a third at a time
+        result = cache.sync()
+        assert not result["reloaded"]
+        changed.update(result["changed"])
+
+    assert changed == {250: ["m249", "edited"]}
+    assert cache.get_all_values() == worksheet.get_all_values()
+
+
+def test_sync_reloads_after_rows_were_deleted(backend, store):
+    worksheet = inventory(backend, 10)
+    cache = SheetCache(sheet=worksheet, name="inventory", store=store)
+    cache.get_all_values()
+    worksheet.delete_rows(3)
+
+    result = cache.sync()
+
+    assert result["reloaded"]
+    assert result["rows"] == worksheet.get_all_values()
+    assert cache.find_row("m9") == 10
+
+
+class Clock:
+    """Stands in for the time module so a test can let a TTL pass"""
+
+    def __init__(self):
+        self.now = 1000.0
+
+    def monotonic(self):
+        return self.now
+
+
+@pytest.fixture
+def clock(monkeypatch):
+    clock = Clock()
+    monkeypatch.setattr(sheet_cache, "time", clock)
+    return clock
+
+
+def test_appends_to_a_large_sheet_never_reload_it(backend, store, clock):
+    worksheet = inventory(backend, 1000)
+    cache = SheetCache(sheet=worksheet, name="inventory", store=store)
+    cache.get_all_values()
+
+    for i in range(8):  # Two minutes of syncs, a row appended before each
+        worksheet.append_row([f"new{i}", "1"])
+        clock.now += SYNC_INTERVAL
+        result = cache.sync()
+        assert not result["reloaded"]
+        assert list(result["appended"].values()) == [[f"new{i}", "1"]]
+    assert cache.get_all_values() == worksheet.get_all_values()
+
+
+def test_an_edit_in_place_is_found_before_the_ttl_on_a_large_sheet(backend, store, clock):
+    worksheet = inventory(backend, 1000)
+    cache = SheetCache(sheet=worksheet, name="inventory", store=store)
+    cache.get_all_values()
+    worksheet.update_cell(990, 2, "edited")
+
+    changed = {}
+    while not changed:
+        assert clock.now < 1000.0 + cache.ttl
+        result = cache.sync()
+        assert not result["reloaded"]
+        changed.update(result["changed"])
+        clock.now += SYNC_INTERVAL
+    assert changed == {989: ["m988", "edited"]}
+
+
+def test_sync_reloads_once_the_rotation_falls_behind_the_ttl(backend, store, clock):
+    worksheet = inventory(backend, 1000)
+    cache = SheetCache(sheet=worksheet, name="inventory", store=store)
+    cache.get_all_values()
+    worksheet.update_cell(5, 2, "edited")
+
+    assert not cache.sync()["reloaded"]
+    clock.now += cache.ttl
+    assert cache.sync()["reloaded"]
+
+
+def test_mirror_follows_every_change(backend, store):
+    worksheet = inventory(backend, 10)
+    cache = SheetCache(sheet=worksheet, name="inventory", store=store)
+    cache.get_all_values()
+
+    worksheet.append_row(["remote", "1"])
+    cache.sync()
+    cache.update_cell(2, 2, "42")
+    cache.append_row(["local", "3"])
+    cache.delete_row(4)
+
+    assert [trimmed(row) for row in store.load_rows("inventory")] == \
+        [trimmed(row) for row in cache.get_all_values()]
+    assert cache.get_all_values() == worksheet.get_all_values()
+
+
+def test_offline_update_is_queued_and_follows_its_row(backend, store):
+    worksheet = Unreachable(inventory(backend, 3))
+    cache = SheetCache(sheet=worksheet, name="inventory", store=store)
+    cache.get_all_values()
+
+    worksheet.down = True
+    assert cache.update_cell(3, 2, "9") is False  # m1
+    assert store.pending_count("inventory") == 1
+    assert store.pending_count("credentials") == 0
+    assert cache.row_values(3) == ["m1", "9"]
+
+    # Meanwhile a row above it is removed on the sheet
+    worksheet.down = False
+    worksheet.delete_rows(2)
+    assert cache.get_all_values(force=True)[1] == ["m1", "9"]  # Still shown while queued
+
+    replay_all(cache, store)
+    assert worksheet.get_all_values() == [HEADER, ["m1", "9"], ["m2", "2"]]
+
+
+def test_offline_update_of_a_removed_row_conflicts(backend, store):
+    worksheet = Unreachable(inventory(backend, 3))
+    cache = SheetCache(sheet=worksheet, name="inventory", store=store)
+    cache.get_all_values()
+
+    worksheet.down = True
+    cache.update_cell(3, 2, "9")
+    worksheet.down = False
+    worksheet.delete_rows(3)
+
+    with pytest.raises(Conflict):
+        cache.replay(store.outbox()[0])
+
+
+def test_offline_writes_match_whole_rows_where_keys_repeat(backend, store):
+    worksheet = Unreachable(backend.get_worksheet("requests"))
+    worksheet.append_rows([["Email", "Material", "Quantity", "Date"],
+                           ["a@x.com", "m1", "1", "2024-01-01"],
+                           ["a@x.com", "m2", "2", "2024-01-02"],
+                           ["a@x.com", "m3", "3", "2024-01-03"]])
+    cache = SheetCache(sheet=worksheet, name="user_assignments", store=store, unique_keys=False)
+    cache.get_all_values()
+
+    worksheet.down = True
+    cache.update_cell(4, 3, "5")  # m3
+    cache.delete_row(3)  # m2
+    worksheet.down = False
+    worksheet.delete_rows(2)  # m1, on the sheet
+
+    assert [row[1] for row in cache.get_all_values(force=True)] == ["Material", "m3"]
+    replay_all(cache, store)
+    assert worksheet.get_all_values() == [["Email", "Material", "Quantity", "Date"],
+                                          ["a@x.com", "m3", "5", "2024-01-03"]]
+
+
+def test_every_listener_hears_a_sync_whoever_pulled_it(backend, store):
+    worksheet = inventory(backend, 10)
+    cache = SheetCache(sheet=worksheet, name="inventory", store=store)
+    cache.get_all_values()
+    heard = [], []
+    for changes in heard:
+        cache.add_listener(changes.append)
+    cache.remove_listener(heard[1].append)
+    worksheet.append_row(["new", "1"])
+
+    cache.sync()
+
+    assert heard[0] == [{"reloaded": False, "changed": {}, "appended": {11: ["new", "1"]}, "deleted": {}}]
+    assert heard[1] == []
@@ -0,0 +1,19 @@
+import csv
+import gzip
+
+from sheet_export import export_worksheet
+
+
+def test_export_reads_past_a_blank_stretch(backend, tmp_path):
+    worksheet = backend.get_worksheet("inventory")
+    worksheet.append_rows([["Material", "Quantity"], ["bolts", "10"]])
+    worksheet.update_cell(1200, 1, "after the gap")  # Rows 3-1199 stay blank
+    path = str(tmp_path / "inventory.csv.gz")
+
+    assert export_worksheet(worksheet, path, chunk_rows=500) == 1200
+
+    with gzip.open(path, "rt", newline="") as file:
+        rows = list(csv.reader(file))
+    assert rows[:2] == [["Material", "Quantity"], ["bolts", "10"]]
+    assert rows[-1] == ["after the gap"]
+    assert len(rows) == 1200
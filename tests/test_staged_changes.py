@@ -0,0 +1,69 @@
+from staged_changes import StagedChanges, collapse_ranges
+
+ROWS = [["Material", "Quantity"], ["bolts", "10"], ["nuts", "5"], ["pins", "7"], ["rivets", "2"], ["screws", "1"]]
+SHEET_ID = 7
+
+
+def test_diff_reports_each_change():
+    staged = StagedChanges()
+    staged.stage("bolts", 12)
+    staged.stage("washers", 4)
+    staged.stage("gears", remove=True)
+    staged.stage("nuts", "lots")
+
+    entries = {entry["name"]: entry for entry in staged.diff(ROWS)}
+
+    assert (entries["bolts"]["action"], entries["bolts"]["row"], entries["bolts"]["old"]) == ("update", 2, "10")
+    assert entries["washers"]["action"] == "add"
+    assert entries["gears"]["error"] == "Material not found"
+    assert entries["nuts"]["error"] == "Quantity must be a number"
+
+
+def test_build_requests_orders_updates_appends_then_deletes_from_the_bottom():
+    staged = StagedChanges()
+    staged.stage("bolts", 12)
+    staged.stage("washers", 4)
+    staged.stage("nuts", remove=True)
+    staged.stage("pins", remove=True)
+    staged.stage("screws", remove=True)
+    staged.stage("gears", remove=True)  # Not on the sheet: left out
+
+    requests = staged.build_requests(staged.diff(ROWS), SHEET_ID)
+
+    assert [next(iter(request)) for request in requests] == \
+        ["updateCells", "appendCells", "deleteDimension", "deleteDimension"]
+    update = requests[0]["updateCells"]
+    assert update["range"] == {"sheetId": SHEET_ID, "startRowIndex": 1, "endRowIndex": 2,
+                               "startColumnIndex": 1, "endColumnIndex": 2}
+    assert update["rows"] == [{"values": [{"userEnteredValue": {"numberValue": 12.0}}]}]
+    assert requests[1]["appendCells"]["rows"] == [{"values": [{"userEnteredValue": {"stringValue": "washers"}},
+                                                              {"userEnteredValue": {"numberValue": 4.0}}]}]
+    # screws (row 6) first, then nuts and pins (rows 3-4) as one range
+    assert [(request["deleteDimension"]["range"]["startIndex"], request["deleteDimension"]["range"]["endIndex"])
+            for request in requests[2:]] == [(5, 6), (2, 4)]
+
+
+def test_build_requests_is_empty_when_every_change_has_an_error():
+    staged = StagedChanges()
+    staged.stage("gears", remove=True)
+    assert staged.build_requests(staged.diff(ROWS), SHEET_ID) == []
+
+
+def test_collapse_ranges():
+    assert collapse_ranges([3, 9, 4, 5, 4, 11]) == [(11, 11), (9, 9), (3, 5)]
+
+
+def test_commit_applies_the_batch_and_keeps_failed_changes(backend):
+    worksheet = backend.get_worksheet("inventory")
+    worksheet.append_rows(ROWS)
+    staged = StagedChanges()
+    staged.stage("bolts", 12)
+    staged.stage("washers", 4)
+    staged.stage("nuts", remove=True)
+    staged.stage("gears", remove=True)
+
+    staged.commit(worksheet, worksheet.get_all_values())
+
+    assert worksheet.get_all_values() == [["Material", "Quantity"], ["bolts", "12"], ["pins", "7"],
+                                          ["rivets", "2"], ["screws", "1"], ["washers", "4"]]
+    assert list(staged.changes) == ["gears"]
@@ -0,0 +1,42 @@
+import datetime
+
+from sheet_cache import SheetCache
+from usage_analytics import UsageAnalytics
+
+TODAY = datetime.date(2024, 1, 10)
+HEADER = ["Email", "Material", "Quantity", "Date", "Notes", "Status", "Fulfilled"]
+REQUESTS = [HEADER,
+            ["ann@example.com", "bolts", "4", "2024-01-08"],
+            ["bob@example.com", "bolts", "6", "2024-01-09", "", "partial", "2"],
+            ["ann@example.com", "nuts", "3", "2024-01-09", "", "rejected"]] + \
+           [["cid@example.com", "pins", "1", "2024-01-01", "", "rejected"]] * 20
+
+
+def used(analytics):
+    return {item["name"]: item["total"] for item in analytics.report(today=TODAY)["materials"]}
+
+
+def test_new_requests_arrive_through_the_sync_not_a_full_read(backend, store):
+    worksheet = backend.get_worksheet("requests")
+    worksheet.append_rows(REQUESTS)
+    full_reads = []
+    get_all_values = worksheet.get_all_values
+    worksheet.get_all_values = lambda: full_reads.append(1) or get_all_values()
+    cache = SheetCache(sheet=worksheet, name="user_assignments", store=store, unique_keys=False)
+    analytics = UsageAnalytics(cache)
+
+    assert analytics.refresh()
+    assert used(analytics) == {"bolts": 6.0}
+
+    worksheet.append_row(["bob@example.com", "nuts", "2", "2024-01-10"])
+    worksheet.update_cell(2, 6, "approved")
+    worksheet.update_cell(2, 7, "1")
+    while not cache.sync()["changed"]:
+        pass  # Until the rotation reaches the edited row
+    assert not analytics.refresh()  # The listener already had it
+    assert used(analytics) == {"bolts": 3.0, "nuts": 2.0}
+    assert len(full_reads) == 1
+
+    cache.delete_row(3)  # Written through the cache: no read at all
+    assert used(analytics) == {"bolts": 1.0, "nuts": 2.0}
+    assert len(full_reads) == 1
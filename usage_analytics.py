@@ -0,0 +1,245 @@
+import datetime
+import math
+import threading
+import time
+from array import array
+
+# numpy is optional: with it, the aggregates are computed on whole columns at once
+try:
+    import numpy as np
+except ImportError:
+    np = None
+
+from inventory_model import parse_quantity
+from request_fulfillment import STATUS_COLUMN, GRANTED_COLUMN, PENDING
+from sheet_cache import assignments_cache
+
+# Columns of the user_assignments worksheet (Email, Material, Quantity, Date, ...)
+EMAIL_COLUMN = 0
+MATERIAL_COLUMN = 1
+QUANTITY_COLUMN = 2
+DATE_COLUMN = 3
+
+# Velocity and the moving average look back this many days; the forecast covers the next HORIZON_DAYS
+WINDOW_DAYS = 28
+HORIZON_DAYS = 14
+TOP_CONSUMERS = 10
+TREND_POINTS = 14
+
+
+class UsageAnalytics:
+    """Per-material, per-day usage from the user_assignments log, parsed once per row"""
+
+    def __init__(self, cache):
+        self.cache = cache
+        self._sources = []
+        self._material_ids = array("q")
+        self._email_ids = array("q")
+        self._days = array("q")
+        self._quantities = array("d")
+        self._materials = {}
+        self._material_names = []
+        self._emails = {}
+        self._email_names = []
+        self._day_numbers = {}  # Date text -> day number; a log has few distinct dates
+        self._report = None
+        self._fed = False  # Whether the columns hold the whole log
+        self._version = 0
+        self._lock = threading.Lock()
+        if cache is not None:
+            cache.add_listener(self._cache_changed)
+
+    def refresh(self, force=False):
+        """Bring the columns up to date through a delta sync; returns True if anything changed"""
+        version = self._version
+        if force:
+            self.cache.get_all_values(force=True)  # The listener applies the reload
+        elif not self._fed:
+            self.update(self.cache.get_all_values())
+        else:
+            self.cache.sync()
+        return self._version != version
+
+    def update(self, rows):
+        """Re-parse the rows that differ from the ones parsed last time"""
+        with self._lock:
+            changed = False
+            for position, row in enumerate(rows):
+                changed = self._store(position, row) or changed
+            if len(rows) < len(self._sources):
+                # Rows were deleted from the end
+                for column in self._columns():
+                    del column[len(rows):]
+                changed = True
+            self._fed = True
+            if changed:
+                self._changed()
+            return changed
+
+    def _cache_changed(self, changes):
+        # Cache listener: gets the rows with the changes, as the cache is locked
+        if changes["reloaded"]:
+            self.update(changes["rows"])
+            return
+        with self._lock:
+            if not self._fed:
+                return  # The next refresh() reads the whole log anyway
+            for position in sorted(changes["deleted"], reverse=True):
+                if position < len(self._sources):
+                    for column in self._columns():
+                        del column[position]
+            for position, row in sorted({**changes["changed"], **changes["appended"]}.items()):
+                if position > len(self._sources):
+                    self._fed = False  # A gap: these are not the rows parsed so far
+                    return
+                self._store(position, row)
+            self._changed()
+
+    def _store(self, position, row):
+        """Parse row into the columns at position (appending it at the end); False if it is unchanged"""
+        source = tuple(row[:GRANTED_COLUMN])
+        if position < len(self._sources):
+            if self._sources[position] == source:
+                return False
+            self._sources[position] = source
+            (self._material_ids[position], self._email_ids[position],
+             self._days[position], self._quantities[position]) = self._parse(source)
+        else:
+            self._sources.append(source)
+            material_id, email_id, day, quantity = self._parse(source)
+            self._material_ids.append(material_id)
+            self._email_ids.append(email_id)
+            self._days.append(day)
+            self._quantities.append(quantity)
+        return True
+
+    def _columns(self):
+        return self._sources, self._material_ids, self._email_ids, self._days, self._quantities
+
+    def _changed(self):
+        self._report = None
+        self._version += 1
+
+    def report(self, window=WINDOW_DAYS, horizon=HORIZON_DAYS, today=None):
+        """Usage per material (velocity, forecast) and top consumers"""
+        today = (today or datetime.date.today()).toordinal()
+        with self._lock:
+            key = (window, horizon, today)
+            if self._report is not None and self._report[0] == key:
+                return self._report[1]
+
+            started = time.perf_counter()
+            aggregate = self._aggregate_numpy if np is not None else self._aggregate_python
+            totals, counts, daily, last_days, consumer_totals, consumer_counts = aggregate(window, today)
+
+            materials = []
+            for material_id, name in enumerate(self._material_names):
+                if not counts[material_id]:
+                    continue
+                recent = math.fsum(daily[material_id])
+                materials.append({
+                    "name": name, "total": totals[material_id], "requests": counts[material_id],
+                    "recent": recent, "daily": list(daily[material_id]),
+                    "velocity": recent / window, "forecast": recent / window * horizon,
+                    "last_used": datetime.date.fromordinal(last_days[material_id]).isoformat()})
+            materials.sort(key=lambda item: (-item["velocity"], -item["total"], item["name"].lower()))
+
+            consumers = sorted(({"email": email, "total": consumer_totals[email_id],
+                                 "requests": consumer_counts[email_id]}
+                                for email_id, email in enumerate(self._email_names) if consumer_counts[email_id]),
+                               key=lambda item: (-item["total"], item["email"]))[:TOP_CONSUMERS]
+
+            result = {"materials": materials, "consumers": consumers,
+                      "requests": sum(item["requests"] for item in materials),
+                      "window": window, "horizon": horizon,
+                      "elapsed_ms": (time.perf_counter() - started) * 1000}
+            self._report = (key, result)
+            return result
+
+    def _aggregate_numpy(self, window, today):
+        ids = np.frombuffer(self._material_ids, dtype=np.int64) if self._material_ids else np.zeros(0, np.int64)
+        emails = np.frombuffer(self._email_ids, dtype=np.int64) if self._email_ids else np.zeros(0, np.int64)
+        days = np.frombuffer(self._days, dtype=np.int64) if self._days else np.zeros(0, np.int64)
+        quantities = np.frombuffer(self._quantities, dtype=float) if self._quantities else np.zeros(0)
+        materials, people = len(self._material_names), len(self._email_names)
+
+        counted = ids >= 0
+        ids, emails, days, quantities = ids[counted], emails[counted], days[counted], quantities[counted]
+        totals = np.bincount(ids, weights=quantities, minlength=materials)
+        counts = np.bincount(ids, minlength=materials)
+
+        # One cell per material and day of the window, oldest day first
+        age = today - days
+        recent = (age >= 0) & (age < window)
+        cells = ids[recent] * window + (window - 1 - age[recent])
+        daily = np.bincount(cells, weights=quantities[recent], minlength=materials * window).reshape(materials, window)
+
+        last_days = np.zeros(materials, dtype=np.int64)
+        np.maximum.at(last_days, ids, days)
+        consumer_totals = np.bincount(emails, weights=quantities, minlength=people)
+        consumer_counts = np.bincount(emails, minlength=people)
+        return (totals.tolist(), counts.tolist(), daily.tolist(), last_days.tolist(),
+                consumer_totals.tolist(), consumer_counts.tolist())
+
+    def _aggregate_python(self, window, today):
+        materials, people = len(self._material_names), len(self._email_names)
+        totals, counts = [0.0] * materials, [0] * materials
+        daily = [[0.0] * window for _ in range(materials)]
+        last_days = [0] * materials
+        consumer_totals, consumer_counts = [0.0] * people, [0] * people
+        for material_id, email_id, day, quantity in zip(self._material_ids, self._email_ids,
+                                                        self._days, self._quantities):
+            if material_id < 0:
+                continue
+            totals[material_id] += quantity
+            counts[material_id] += 1
+            age = today - day
+            if 0 <= age < window:
+                daily[material_id][window - 1 - age] += quantity
+            if day > last_days[material_id]:
+                last_days[material_id] = day
+            consumer_totals[email_id] += quantity
+            consumer_counts[email_id] += 1
+        return totals, counts, daily, last_days, consumer_totals, consumer_counts
+
+    def _parse(self, source):
+        """(material id, email id, day number, quantity used) of a row; material id -1 if it is not counted"""
+        cells = list(source) + [""] * (GRANTED_COLUMN - len(source))
+        status = cells[STATUS_COLUMN - 1].strip().lower()
+        if status in PENDING:
+            quantity = parse_quantity(cells[QUANTITY_COLUMN])
+        elif status in ("approved", "partial"):
+            quantity = parse_quantity(cells[GRANTED_COLUMN - 1])
+        else:
+            quantity = None
+        day = self._day(cells[DATE_COLUMN])
+        material = cells[MATERIAL_COLUMN].strip()
+        if not material or day is None or quantity is None or quantity <= 0:
+            return -1, -1, 0, 0.0
+        return (self._intern(self._materials, self._material_names, material),
+                self._intern(self._emails, self._email_names, cells[EMAIL_COLUMN].strip()), day, quantity)
+
+    def _day(self, text):
+        if text not in self._day_numbers:
+            try:
+                self._day_numbers[text] = datetime.date.fromisoformat(text.strip()[:10]).toordinal()
+            except ValueError:
+                self._day_numbers[text] = None  # The header row, or not a date
+        return self._day_numbers[text]
+
+    @staticmethod
+    def _intern(ids, names, value):
+        if value not in ids:
+            ids[value] = len(names)
+            names.append(value)
+        return ids[value]
+
+
+def trend(daily, points=TREND_POINTS):
+    """Fold a daily series into at most points buckets (oldest first), e.g. for a sparkline"""
+    size = max(1, -(-len(daily) // points))
+    return [math.fsum(daily[i:i + size]) for i in range(0, len(daily), size)]
+
+
+# Shared by every window of the application
+usage_analytics = UsageAnalytics(assignments_cache)
@@ -1,52 +1,62 @@
-import gspread
 import customtkinter as ctk
-import os
-from google.oauth2.service_account import Credentials
 from login import LoginPage
 from config import Config
 from custom_messagebox import show_error, show_info
+from storage import get_backend
+from sheet_cache import inventory_cache, assignments_cache, sync_outbox
+from local_store import local_store, is_offline_error
+from search_controller import SearchController
+from view_sync import keep_in_sync
+from virtual_list import VirtualList, Pager
+from request_history import request_index
+from request_fulfillment import STATUS_COLUMN, GRANTED_COLUMN
+from inventory_model import InventoryTable, SORT_ORDERS, format_quantity, parse_quantity, split_query
+from sheets_worker import sheets_executor
+from health_monitor import health_monitor, describe
+from api_trace import traced_action
+from diagnostics_window import bind_diagnostics
+from sites import site_inventories
+from cross_site_window import CrossSiteWindow
 
 config = Config()
 
-scopes = [
-    "https://www.googleapis.com/auth/spreadsheets",
-    "https://www.googleapis.com/auth/drive"
-]
+def connect_sheets():
+    """Open the inventory and user_assignments worksheets, raising on failure"""
+    client = get_backend().connect()
 
-def initialize_sheets():
-    global client, inventory_sheet, user_assignments_sheet
+    # Google Sheets IDs from config
+    inventory_sheetid = config.get_inventory_sheet_id()
+    user_assignments_sheetid = config.get_credentials_sheet_id()  # Reusing credentials sheet for assignments
 
-    try:
-        if os.path.exists('credentials.json'):
-            print("Using credentials from file")
-            creds = Credentials.from_service_account_file('credentials.json', scopes=scopes)
-        else:
-            print("No credentials found")
-            show_error("Error", "Google API credentials not found. Please configure them in the Settings.")
-            return None, None, None
+    # Access the sheets with error handling
+    inventory_sheet = get_backend().get_worksheet(inventory_sheetid)
 
-        client = gspread.authorize(creds)
+    # Create user_assignments worksheet if it doesn't exist
+    user_assignments_sheet = get_backend().get_or_create_worksheet(
+        user_assignments_sheetid, "user_assignments", ["Email", "Material", "Quantity", "Date"])
 
-        # Google Sheets IDs from config
-        inventory_sheetid = config.get_inventory_sheet_id()
-        user_assignments_sheetid = config.get_credentials_sheet_id()  # Reusing credentials sheet for assignments
+    inventory_cache.set_sheet(inventory_sheet)
+    assignments_cache.set_sheet(user_assignments_sheet)
 
-        # Access the sheets with error handling
-        inventory_sheet = client.open_by_key(inventory_sheetid).sheet1
+    return client, inventory_sheet, user_assignments_sheet
 
-        # Create user_assignments worksheet if it doesn't exist
-        try:
-            user_assignments_sheet = client.open_by_key(user_assignments_sheetid).worksheet("user_assignments")
-        except gspread.exceptions.WorksheetNotFound:
-            # If the worksheet doesn't exist, create it
-            credentials_sheet = client.open_by_key(user_assignments_sheetid)
-            user_assignments_sheet = credentials_sheet.add_worksheet(title="user_assignments", rows=100, cols=20)
-            # Add headers
-            user_assignments_sheet.append_row(["Email", "Material", "Quantity", "Date"])
+def initialize_sheets():
+    global client, inventory_sheet, user_assignments_sheet
 
+    try:
+        client, inventory_sheet, user_assignments_sheet = connect_sheets()
         return client, inventory_sheet, user_assignments_sheet
 
+    except FileNotFoundError as e:
+        print("No credentials found")
+        show_error("Error", str(e))
+        return None, None, None
+
     except Exception as e:
+        if is_offline_error(e):
+            # The views work from the local copy until the connection is back
+            print(f"Google Sheets unreachable, working offline: {e}")
+            return None, None, None
         print(f"Error authenticating with Google Sheets: {e}")
         import traceback
         traceback.print_exc()
@@ -56,19 +66,29 @@ def initialize_sheets():
 client, inventory_sheet, user_assignments_sheet = initialize_sheets()
 
 class UserPage:
-    def __init__(self, email):
+    # Requests made by handlers without an action of their own count towards the page
+    @traced_action("user.page")
+    def __init__(self, email, mainloop=True):
         self.email = email
         self.display = ctk.CTk()
         self.display.title("Inventory Management - User Dashboard")
-        self.display.geometry("700x500")
+        self.display.geometry("700x540")
         self.display.config(bg="#2E2E2E")
         
         # Set appearance mode
         ctk.set_appearance_mode("dark")
         ctk.set_default_color_theme("green")
         
+        sheets_executor.attach(self.display)
+        health_monitor.attach(self.display, probe=self.probe)
+        self.connected = False
         self.setup_ui()
-        self.display.mainloop()
+        bind_diagnostics(self.display)
+        sheets_executor.add_busy_listener(self.update_busy_indicator)
+        health_monitor.add_listener(self.show_health)
+        # The benchmarks drive the page from their own loop
+        if mainloop:
+            self.display.mainloop()
 
     def setup_ui(self):
         # Header frame with logout and user info
@@ -83,6 +103,11 @@ class UserPage:
         # User email display
         ctk.CTkLabel(header_frame, text=f"User: {self.email}", font=("Helvetica", 12),
                      text_color="#e0e0e0").pack(side="left", padx=20)
+
+        # The site whose inventory is shown
+        self.site_var = ctk.StringVar(value=config.get_active_site())
+        ctk.CTkOptionMenu(header_frame, values=config.get_sites(), variable=self.site_var, width=110,
+                          command=self.switch_site).pack(side="left", padx=5)
         
         # Logout button
         ctk.CTkButton(header_frame, text="Log Out", fg_color="#F44336", text_color="white", 
@@ -105,7 +130,10 @@ class UserPage:
                      
         ctk.CTkButton(inventory_frame, text="View Inventory", command=self.view_inventory, width=200,
                       fg_color="#4CAF50", text_color="white").pack(pady=10)
-        
+
+        ctk.CTkButton(inventory_frame, text="All Sites Inventory", command=self.show_all_sites, width=200,
+                      fg_color="#4CAF50", text_color="white").pack(pady=(0, 10))
+
         # Add refresh inventory button
         ctk.CTkButton(inventory_frame, text="Refresh Inventory Data", command=self.refresh_sheets, width=200,
                       fg_color="#2196F3", text_color="white").pack(pady=10)
@@ -116,9 +144,6 @@ class UserPage:
                                             text_color="#888888")
         self.connection_status.pack(pady=15)
         
-        # Update connection status
-        self.display.after(1000, self.update_connection_status)
-        
         # Right column - Material management
         right_column = ctk.CTkFrame(content_frame, fg_color="transparent")
         right_column.pack(side="right", fill="both", expand=True, padx=(10, 0))
@@ -139,105 +164,172 @@ class UserPage:
         footer_frame = ctk.CTkFrame(self.display, fg_color="#333333", corner_radius=0, height=30)
         footer_frame.pack(fill="x", side="bottom")
         footer_frame.pack_propagate(False)
+
+        # Loading indicator for background Sheets calls
+        self.busy_label = ctk.CTkLabel(footer_frame, text="", font=("Helvetica", 11),
+                                       text_color="#FF9800")
+        self.busy_label.pack(side="right", padx=10)
+
+        # Connection health and recent request latencies
+        self.health_label = ctk.CTkLabel(footer_frame, text="", font=("Helvetica", 11),
+                                         text_color="#888888")
+        self.health_label.pack(side="left", padx=10)
+
+    @staticmethod
+    def probe():
+        """Checks the connection when there has been no other traffic for a while"""
+        if config.get_inventory_sheet_id():
+            get_backend().probe(config.get_inventory_sheet_id())
+
+    def update_busy_indicator(self, pending):
+        """Show how many Google Sheets calls are still running"""
+        self.busy_label.configure(text=f"⟳ Syncing ({pending})" if pending else "")
                     
-    def update_connection_status(self):
-        """Update the connection status indicator"""
-        global inventory_sheet
-        
-        if inventory_sheet is not None:
-            try:
-                # Try a simple operation to verify connection
-                inventory_sheet.cell(1, 1)
-                self.connection_status.configure(text="Connection Status: Connected ✓", text_color="#4CAF50")
-            except Exception:
-                self.connection_status.configure(text="Connection Status: Disconnected ✗", text_color="#F44336")
-        else:
+    def show_health(self, status):
+        """Update the connection indicators from the shared health monitor"""
+        text, color = describe(status)
+        self.health_label.configure(text=text, text_color=color)
+
+        if not config.get_inventory_sheet_id():
             self.connection_status.configure(text="Connection Status: Not Configured ⚠", text_color="#FF9800")
-            
-        # Schedule the next update
-        self.display.after(60000, self.update_connection_status)  # Check every minute
-        
+        elif status["state"] == "unknown":
+            self.connection_status.configure(text="Connection Status: Checking...", text_color="#888888")
+        elif status["state"] == "offline":
+            self.show_offline_status(local_store.pending_count())
+        else:
+            if status["state"] == "connected":
+                self.connection_status.configure(text="Connection Status: Connected ✓", text_color="#4CAF50")
+            else:
+                self.connection_status.configure(text="Connection Status: Slow or Rate Limited ⚠",
+                                                 text_color="#FF9800")
+            # Back online: open the sheets if that failed earlier and send queued writes
+            if not self.connected:
+                self.check_connection()
+        self.connected = status["state"] in ("connected", "degraded")
+
+    @traced_action("user.check_connection")
+    def check_connection(self):
+        """Reconnect in the background if needed and send the writes queued while offline"""
+        def connected(result):
+            global client, inventory_sheet, user_assignments_sheet
+            if result["sheets"]:
+                client, inventory_sheet, user_assignments_sheet = result["sheets"]
+            sent, conflicts, pending = result["sync"]
+            if pending:
+                self.show_offline_status(pending)
+            if conflicts:
+                show_error("Sync Conflicts", "These offline changes were not applied because the "
+                           "sheet changed in the meantime:\n\n" + "\n".join(conflicts))
+
+        def check():
+            sheets = connect_sheets() if inventory_sheet is None else None
+            return {"sheets": sheets, "sync": sync_outbox()}
+
+        sheets_executor.submit(check, write=True, on_success=connected,
+                               on_error=lambda e: print(f"Error reconnecting: {e}"))
+
+    def show_offline_status(self, pending):
+        text = "Connection Status: Offline"
+        if pending:
+            text += f" ({pending} change{'s' if pending != 1 else ''} waiting)"
+        self.connection_status.configure(text=text, text_color="#FF9800")
+
+    @traced_action("user.refresh_sheets")
     def refresh_sheets(self):
         """Refresh Google Sheets connection"""
-        global client, inventory_sheet, user_assignments_sheet
-        
-        try:
-            client, inventory_sheet, user_assignments_sheet = initialize_sheets()
-            if inventory_sheet is not None:
-                show_info("Success", "Connection to Google Sheets refreshed successfully!")
-                self.update_connection_status()
-            else:
-                show_error("Error", "Failed to connect to Google Sheets")
-        except Exception as e:
-            show_error("Error", f"Error refreshing connection: {str(e)}")
+        def connected(result):
+            global client, inventory_sheet, user_assignments_sheet
+            client, inventory_sheet, user_assignments_sheet = result
+            inventory_cache.invalidate()
+            assignments_cache.invalidate()
+            show_info("Success", "Connection to Google Sheets refreshed successfully!")
+            self.check_connection()
+
+        def failed(e):
+            show_error("Error", f"Failed to connect to Google Sheets: {str(e)}")
+
+        def reconnect():
+            # Drop the cached client and handles so the connection is really rebuilt
+            get_backend().reset()
+            return connect_sheets()
+
+        sheets_executor.submit(reconnect, on_success=connected, on_error=failed)
             
+    @traced_action("user.view_my_requests")
     def view_my_requests(self):
-        """View the user's material requests"""
-        if user_assignments_sheet is None:
-            show_error("Error", "Cannot connect to Google Sheets")
-            return
-            
+        """View the user's material requests, newest first, one page at a time"""
         top = ctk.CTkToplevel(self.display)
         top.title("My Material Requests")
-        top.geometry("600x500")
+        top.geometry("720x500")
         top.grab_set()  # Make window modal
         
         ctk.CTkLabel(top, text="My Material Requests", font=("Helvetica", 18, 'bold'), 
                     text_color="#4CAF50").pack(pady=10)
                     
-        # Create scrollable frame
-        frame = ctk.CTkScrollableFrame(top, fg_color="#16191a")
-        frame.pack(fill="both", expand=True, padx=10, pady=10)
+        # Add header
+        header_frame = ctk.CTkFrame(top, fg_color="#333333")
+        header_frame.pack(fill="x", padx=10, pady=(5, 0))
         
-        try:
-            # Get all rows
-            all_rows = user_assignments_sheet.get_all_values()
-            
-            # Check if there's at least a header row
-            if len(all_rows) > 0:
-                # Add header
-                header_frame = ctk.CTkFrame(frame, fg_color="#333333")
-                header_frame.pack(fill="x", pady=5)
-                
-                ctk.CTkLabel(header_frame, text="Material", font=("Helvetica", 12, "bold"), 
-                            text_color="#ffffff", width=200).pack(side="left", padx=10)
-                ctk.CTkLabel(header_frame, text="Quantity", font=("Helvetica", 12, "bold"), 
-                            text_color="#ffffff", width=100).pack(side="left", padx=10)
-                ctk.CTkLabel(header_frame, text="Date", font=("Helvetica", 12, "bold"), 
-                            text_color="#ffffff", width=150).pack(side="left", padx=10)
-                
-                # Filter for this user's requests
-                user_rows = [row for row in all_rows if len(row) >= 2 and row[0] == self.email]
-                
-                if not user_rows:
-                    ctk.CTkLabel(frame, text="You have no material requests", font=("Helvetica", 12), 
-                                text_color="#888").pack(pady=20)
-                else:
-                    for i, row in enumerate(user_rows):
-                        # Extract data
-                        material = row[1] if len(row) > 1 else "Unknown"
-                        quantity = row[2] if len(row) > 2 else "Unknown"
-                        date = row[3] if len(row) > 3 else "Unknown"
-                        
-                        # Create row
-                        row_color = "#1e1e1e" if i % 2 == 0 else "#151515"
-                        row_frame = ctk.CTkFrame(frame, fg_color=row_color)
-                        row_frame.pack(fill="x", pady=2)
-                        
-                        ctk.CTkLabel(row_frame, text=material, font=("Helvetica", 12), 
-                                    text_color="#ffffff", width=200).pack(side="left", padx=10)
-                        ctk.CTkLabel(row_frame, text=quantity, font=("Helvetica", 12), 
-                                    text_color="#ffffff", width=100).pack(side="left", padx=10)
-                        ctk.CTkLabel(row_frame, text=date, font=("Helvetica", 12), 
-                                    text_color="#ffffff", width=150).pack(side="left", padx=10)
-            else:
-                ctk.CTkLabel(frame, text="No data available", font=("Helvetica", 12), 
-                            text_color="#888").pack(pady=20)
-                
-        except Exception as e:
-            ctk.CTkLabel(frame, text=f"Error: {str(e)}", font=("Helvetica", 12), 
-                        text_color="#F44336").pack(pady=20)
-                
+        ctk.CTkLabel(header_frame, text="Material", font=("Helvetica", 12, "bold"), 
+                    text_color="#ffffff", width=200).pack(side="left", padx=10)
+        ctk.CTkLabel(header_frame, text="Quantity", font=("Helvetica", 12, "bold"), 
+                    text_color="#ffffff", width=100).pack(side="left", padx=10)
+        ctk.CTkLabel(header_frame, text="Date", font=("Helvetica", 12, "bold"), 
+                    text_color="#ffffff", width=150).pack(side="left", padx=10)
+        ctk.CTkLabel(header_frame, text="Status", font=("Helvetica", 12, "bold"),
+                    text_color="#ffffff", width=110).pack(side="left", padx=10)
+
+        status_colors = {"approved": "#4CAF50", "partial": "#FF9800", "rejected": "#F44336"}
+
+        # Virtualized list of requests
+        def make_row(parent):
+            row_frame = ctk.CTkFrame(parent)
+            row_frame.labels = []
+            for width in (200, 100, 150, 110):
+                label = ctk.CTkLabel(row_frame, text="", font=("Helvetica", 12), 
+                                     text_color="#ffffff", width=width)
+                label.pack(side="left", padx=10)
+                row_frame.labels.append(label)
+            return row_frame
+
+        def bind_row(row_frame, row, index):
+            row_frame.configure(fg_color="#1e1e1e" if index % 2 == 0 else "#151515")
+            # Material, Quantity, Date
+            for column, label in enumerate(row_frame.labels[:3], start=1):
+                label.configure(text=row[column] if len(row) > column else "Unknown")
+            # Status and fulfilled quantity, once an admin processed the request
+            status = row[STATUS_COLUMN - 1].lower() if len(row) >= STATUS_COLUMN else ""
+            granted = row[GRANTED_COLUMN - 1] if len(row) >= GRANTED_COLUMN else ""
+            row_frame.labels[3].configure(
+                text=f"Partial ({granted})" if status == "partial" else status.capitalize() or "Pending",
+                text_color=status_colors.get(status, "#ffffff"))
+
+        requests_list = VirtualList(top, make_row, bind_row, row_height=36)
+        requests_list.pack(fill="both", expand=True, padx=10, pady=10)
+
+        # Only this user's rows of the current page are read, found through the row index
+        def load_page(page):
+            requests_list.show_message("Loading requests...")
+            sheets_executor.submit(request_index.user_page, self.email, page,
+                                   on_success=loaded, on_error=failed)
+
+        pager = Pager(top, load_page)
+        pager.pack()
+
+        def loaded(result):
+            if not top.winfo_exists():
+                return
+            pager.show(result["page"], result["pages"], result["total"], "requests")
+            requests_list.scroll_to(0)
+            requests_list.set_rows([row for position, row in result["rows"]],
+                                   empty_text="You have no material requests")
+
+        def failed(e):
+            if top.winfo_exists():
+                requests_list.show_message(f"Error: {str(e)}", text_color="#F44336")
+
+        load_page(0)
+
         # Close button
         ctk.CTkButton(top, text="Close", command=top.destroy, fg_color="#555555", 
                     text_color="white").pack(pady=15)
@@ -246,6 +338,34 @@ class UserPage:
         self.display.destroy()
         LoginPage()
 
+    @traced_action("user.switch_site")
+    def switch_site(self, site):
+        """Show the inventory of another site"""
+        if site == config.get_active_site():
+            return
+
+        def switched(sheet):
+            global inventory_sheet
+            inventory_sheet = sheet
+            # Reopen an inventory list that shows the previous site
+            for widget in self.display.winfo_children():
+                if isinstance(widget, ctk.CTkToplevel) and widget.title() == "View Inventory":
+                    widget.destroy()
+                    self.view_inventory()
+            show_info("Success", f"Now showing the inventory of {site}")
+
+        def failed(e):
+            self.site_var.set(config.get_active_site())
+            show_error("Error", f"Could not switch to {site}: {e}")
+
+        sheets_executor.submit(site_inventories.switch_site, config, site, write=True,
+                               on_success=switched, on_error=failed)
+
+    @traced_action("user.show_all_sites")
+    def show_all_sites(self):
+        CrossSiteWindow(self.display, config)
+
+    @traced_action("user.view_inventory")
     def view_inventory(self):
         top = ctk.CTkToplevel(self.display)
         top.title("View Inventory")
@@ -253,48 +373,96 @@ class UserPage:
 
         ctk.CTkLabel(top, text="Inventory List", font=("Helvetica", 18, 'bold'), text_color="#4CAF50").pack(pady=10)
 
+        # Search box (text and quantity conditions such as "qty < 10") and sort order
+        controls_frame = ctk.CTkFrame(top, fg_color="transparent")
+        controls_frame.pack(pady=5)
+
         search_var = ctk.StringVar()
-        search_entry = ctk.CTkEntry(top, textvariable=search_var, placeholder_text="Search Inventory", width=300)
-        search_entry.pack(pady=5)
+        search_entry = ctk.CTkEntry(controls_frame, textvariable=search_var,
+                                    placeholder_text="Search Inventory, e.g. bolt qty < 10", width=300)
+        search_entry.pack(side="left", padx=5)
+
+        sort_var = ctk.StringVar(value=SORT_ORDERS[0])
+        ctk.CTkOptionMenu(controls_frame, values=list(SORT_ORDERS), variable=sort_var, width=130,
+                          command=lambda choice: run_search(now=True)).pack(side="left", padx=5)
 
-        frame = ctk.CTkScrollableFrame(top, fg_color="#16191a")
-        frame.pack(fill="both", expand=True, padx=10, pady=10)
+        def make_row(parent):
+            item_frame = ctk.CTkFrame(parent, fg_color="#04090a", corner_radius=5)
+            item_frame.name_label = ctk.CTkLabel(item_frame, text="", font=("Helvetica", 12),
+                                                 text_color="#ffffff")
+            item_frame.name_label.pack(side="left", padx=10)
+            item_frame.qty_label = ctk.CTkLabel(item_frame, text="", font=("Helvetica", 12),
+                                                text_color="#ffffff")
+            item_frame.qty_label.pack(side="right", padx=10)
+            return item_frame
+
+        def bind_row(item_frame, index, position):
+            current = table["current"]
+            item_frame.name_label.configure(text=current.names[index])
+            item_frame.qty_label.configure(text=current.texts[index])
+
+        # Only the visible rows exist as widgets
+        inventory_list = VirtualList(top, make_row, bind_row, row_height=40)
+        inventory_list.pack(fill="both", expand=True, padx=10, pady=(10, 0))
+
+        summary_label = ctk.CTkLabel(top, text="", font=("Helvetica", 11), text_color="#888888")
+        summary_label.pack(pady=5)
+
+        # The rows are parsed into columns once; search items are positions in the table
+        table = {"current": InventoryTable()}
+
+        def render(indexes):
+            current = table["current"]
+            indexes = current.sort(indexes, sort_var.get())
+            summary_label.configure(text=current.summary(indexes))
+            inventory_list.set_rows(indexes, empty_text="No inventory found" if not search.rows
+                                    else "No matching materials")
+
+        # Keystrokes filter the loaded snapshot; only the changed rows are read while it is open
+        search = SearchController(top, render, text_func=lambda index: table["current"].names[index])
+
+        def run_search(now=False):
+            text, conditions = split_query(search_var.get())
+            predicate = table["current"].where(conditions)
+            if now:
+                search.run_now(text, predicate)
+            else:
+                search.schedule(text, predicate)
+
+        def loaded(rows):
+            if not top.winfo_exists():
+                return
+            table["current"] = InventoryTable.from_rows(rows)
+            search.set_rows(range(len(table["current"])))
+            run_search(now=True)
+
+        def patch(changes):
+            patched = table["current"].patch(changes)
+            if patched is None:
+                # A row gained or lost its quantity column: rebuild from the synced cache
+                loaded(inventory_cache.get_all_values())
+                return
+            updated, appended = patched
+            for index in updated:
+                search.update_row(index, index)
+            for index in appended:
+                search.append_row(index)
+
+        def failed(e):
+            if top.winfo_exists():
+                inventory_list.show_message(f"Error: {e}")
 
         def update_inventory():
-            for widget in frame.winfo_children():
-                widget.destroy()
-
-            search_text = search_var.get().lower()
-            try:
-                rows = inventory_sheet.get_all_values()
-                if not rows:
-                    ctk.CTkLabel(frame, text="No inventory found", font=("Helvetica", 12), text_color="#888").pack(
-                        pady=10)
-                else:
-                    for i, row in enumerate(rows):
-                        name, qty = row
-                        if search_text in name.lower():
-                            row_color = "#04090a" if i % 2 == 0 else "#04090a"
-                            item_frame = ctk.CTkFrame(frame, fg_color=row_color, corner_radius=5)
-                            item_frame.pack(fill="x", pady=5, padx=10)
-                            ctk.CTkLabel(item_frame, text=f"{name}", font=("Helvetica", 12),
-                                         text_color="#ffffff").pack(
-                                side="left", padx=10)
-                            ctk.CTkLabel(item_frame, text=f"{qty}", font=("Helvetica", 12),
-                                         text_color="#ffffff").pack(
-                                side="right", padx=10)
-            except Exception as e:
-                ctk.CTkLabel(frame, text=f"Error: {e}", font=("Helvetica", 12), text_color="#888").pack(pady=10)
-
-        search_entry.bind("<KeyRelease>", lambda event: update_inventory())
+            inventory_list.show_message("Loading inventory...")
+            sheets_executor.submit(inventory_cache.get_all_values, on_success=loaded, on_error=failed)
+
+        search_entry.bind("<KeyRelease>", lambda event: run_search())
         update_inventory()
+        keep_in_sync(top, inventory_cache, patch, loaded, lambda: run_search(now=True))
 
+    @traced_action("user.add_update_material")
     def add_update_material(self):
         """Add or update a material request"""
-        if user_assignments_sheet is None:
-            show_error("Error", "Cannot connect to Google Sheets")
-            return
-            
         top = ctk.CTkToplevel(self.display)
         top.title("Add Material Request")
         top.geometry("450x400")
@@ -313,18 +481,20 @@ class UserPage:
                     
         # Create a combobox with material options
         material_options = ["Type to search..."]
-        try:
-            if inventory_sheet:
-                materials = inventory_sheet.get_all_values()
-                if materials and len(materials) > 0:
-                    material_options.extend([item[0] for item in materials if len(item) > 0 and item[0]])
-        except Exception:
-            pass
             
         material_var = ctk.StringVar()
         name_entry = ctk.CTkComboBox(material_frame, width=250, values=material_options,
                                   variable=material_var)
         name_entry.pack(side="left", padx=(10, 0))
+
+        # Fill in the existing materials once the inventory has loaded
+        def materials_loaded(materials):
+            if materials and len(materials) > 0 and top.winfo_exists():
+                name_entry.configure(values=material_options + [item[0] for item in materials
+                                                                if len(item) > 0 and item[0]])
+
+        sheets_executor.submit(inventory_cache.get_all_values, on_success=materials_loaded,
+                               on_error=lambda e: None)
         
         # Quantity
         quantity_frame = ctk.CTkFrame(top, fg_color="transparent")
@@ -360,6 +530,7 @@ class UserPage:
         notes_entry = ctk.CTkEntry(notes_frame, width=250)
         notes_entry.pack(side="left", padx=(10, 0))
 
+        @traced_action("user.request_material")
         def save_material():
             # Get values
             material_name = name_entry.get()
@@ -376,26 +547,33 @@ class UserPage:
                 show_error("Error", "Please enter a quantity")
                 return
                 
-            try:
-                # Convert to number to validate
-                float(quantity)
-            except ValueError:
+            amount = parse_quantity(quantity)
+            if amount is None:
                 show_error("Error", "Quantity must be a number")
                 return
+            if amount <= 0:
+                show_error("Error", "Quantity must be more than 0")
+                return
                 
-            try:
-                # Prepare data
-                row_data = [self.email, material_name, quantity, date]
-                if notes:
-                    row_data.append(notes)
-                    
-                # Append to sheet
-                user_assignments_sheet.append_row(row_data)
-                show_info("Success", "Material request added successfully!")
-                top.destroy()
+            # Prepare data
+            row_data = [self.email, material_name, format_quantity(amount), date]
+            if notes:
+                row_data.append(notes)
+
+            def saved(sent):
+                if sent:
+                    show_info("Success", "Material request added successfully!")
+                else:
+                    show_info("Saved Offline", "You are offline. The request was saved and will be "
+                              "sent when the connection returns.")
+                    self.show_offline_status(local_store.pending_count())
+                if top.winfo_exists():
+                    top.destroy()
                 
-            except Exception as e:
-                show_error("Error", f"An error occurred: {e}")
+            # Append to sheet (queued if the sheet cannot be reached)
+            sheets_executor.submit(assignments_cache.append_row, row_data, write=True,
+                                   on_success=saved,
+                                   on_error=lambda e: show_error("Error", f"An error occurred: {e}"))
 
         # Buttons
         button_frame = ctk.CTkFrame(top, fg_color="transparent")
@@ -0,0 +1,42 @@
+from api_trace import action
+from sheet_cache import SYNC_INTERVAL
+from sheets_worker import sheets_executor
+
+
+def keep_in_sync(top, cache, patch, reload, rerun):
+    """Delta-sync the cache while top is open and show every change to it"""
+    def changed(changes):
+        # Cache listener: runs on the thread that changed the cache
+        sheets_executor.post(show, changes)
+
+    def show(changes):
+        if not top.winfo_exists():
+            cache.remove_listener(changed)
+            return
+        if changes["reloaded"]:
+            reload(changes["rows"])
+        elif changes["deleted"]:
+            # Every later row moved up: take the positions from the cache again
+            sheets_executor.submit(cache.get_all_values, on_success=reload,
+                                   on_error=lambda e: print(f"Error reading {cache.name}: {e}"))
+        elif changes["changed"] or changes["appended"]:
+            patch(changes)
+            rerun()
+
+    def failed(e):
+        print(f"Error syncing {cache.name}: {e}")
+        schedule()
+
+    def sync():
+        if not top.winfo_exists():
+            cache.remove_listener(changed)
+            return
+        with action(f"{cache.name}.sync"):
+            sheets_executor.submit(cache.sync, on_success=lambda changes: schedule(), on_error=failed)
+
+    def schedule():
+        if top.winfo_exists():
+            top.after(SYNC_INTERVAL * 1000, sync)
+
+    cache.add_listener(changed)
+    schedule()
@@ -0,0 +1,184 @@
+import customtkinter as ctk
+
+
+class VirtualList(ctk.CTkFrame):
+    """Scrollable list that recycles a pool of row widgets instead of one frame per row"""
+
+    def __init__(self, master, make_row, bind_row, row_height=44, overscan=2, **kwargs):
+        kwargs.setdefault("fg_color", "#16191a")
+        super().__init__(master, **kwargs)
+        self.make_row = make_row
+        self.bind_row = bind_row
+        self.row_height = row_height
+        self.overscan = overscan
+
+        self._items = []
+        self._pool = []
+        self._bound = []
+        self._offset = 0
+        self._message_label = None
+
+        self._scrollbar = ctk.CTkScrollbar(self, command=self._on_scrollbar)
+        self._scrollbar.pack(side="right", fill="y")
+
+        # Rows are placed inside the body, which clips anything outside the viewport
+        self._body = ctk.CTkFrame(self, fg_color="transparent")
+        self._body.pack(side="left", fill="both", expand=True)
+        self._body.bind("<Configure>", lambda event: self._layout())
+
+        bind_mousewheel(self._root())
+
+    def set_rows(self, items, empty_text=None):
+        """Show a new list of items, keeping the scroll position where possible"""
+        self._items = list(items)
+        self._bound = [None] * len(self._pool)
+        if not self._items and empty_text:
+            self.show_message(empty_text)
+        else:
+            self._hide_message()
+        self._offset = min(self._offset, self._max_offset())
+        self._layout()
+
+    def refresh(self):
+        """Re-bind the visible rows, e.g. after items were changed in place"""
+        self._bound = [None] * len(self._pool)
+        self._layout()
+
+    def show_message(self, text, text_color="#888"):
+        """Replace the rows with a single message (empty list, errors, loading)"""
+        self._items = []
+        for widget in self._pool:
+            widget.place_forget()
+        if self._message_label is None:
+            self._message_label = ctk.CTkLabel(self._body, text=text, font=("Helvetica", 12),
+                                               text_color=text_color)
+        else:
+            self._message_label.configure(text=text, text_color=text_color)
+        self._message_label.pack(pady=10)
+        self._update_scrollbar()
+
+    def _hide_message(self):
+        if self._message_label is not None:
+            self._message_label.pack_forget()
+
+    def scroll_to(self, offset):
+        self._offset = max(0, min(int(offset), self._max_offset()))
+        self._layout()
+
+    def _viewport_height(self):
+        return max(self._body.winfo_height(), 1)
+
+    def _max_offset(self):
+        return max(0, len(self._items) * self.row_height - self._viewport_height())
+
+    def _layout(self):
+        height = self._viewport_height()
+        first = max(0, self._offset // self.row_height - self.overscan)
+        last = min(len(self._items), (self._offset + height) // self.row_height + 1 + self.overscan)
+
+        # Grow the pool to cover the viewport plus the overscan on both sides
+        needed = height // self.row_height + 2 + 2 * self.overscan
+        if len(self._pool) < needed:
+            while len(self._pool) < needed:
+                self._pool.append(self.make_row(self._body))
+            # The slot of every index changes with the pool size
+            self._bound = [None] * len(self._pool)
+
+        pool_size = len(self._pool)
+        used = set()
+        for index in range(first, last):
+            slot = index % pool_size
+            widget = self._pool[slot]
+            if self._bound[slot] != index:
+                self.bind_row(widget, self._items[index], index)
+                self._bound[slot] = index
+            widget.place(x=0, y=index * self.row_height - self._offset,
+                         relwidth=1, height=self.row_height - 4)
+            used.add(slot)
+
+        for slot, widget in enumerate(self._pool):
+            if slot not in used:
+                widget.place_forget()
+                self._bound[slot] = None
+
+        self._update_scrollbar()
+
+    def _update_scrollbar(self):
+        total = len(self._items) * self.row_height
+        if total <= 0:
+            self._scrollbar.set(0, 1)
+            return
+        height = self._viewport_height()
+        self._scrollbar.set(self._offset / total, min(1.0, (self._offset + height) / total))
+
+    def _on_scrollbar(self, action, *args):
+        if action == "moveto":
+            self.scroll_to(float(args[0]) * len(self._items) * self.row_height)
+        elif action == "scroll":
+            amount = int(args[0])
+            if len(args) > 1 and args[1] == "pages":
+                self.scroll_to(self._offset + amount * self._viewport_height())
+            else:
+                self.scroll_to(self._offset + amount * self.row_height)
+
+    def scroll_wheel(self, event):
+        if getattr(event, "num", None) == 4 or getattr(event, "delta", 0) > 0:
+            step = -3
+        else:
+            step = 3
+        self.scroll_to(self._offset + step * self.row_height)
+
+
+def bind_mousewheel(root):
+    """Scroll the VirtualList under the pointer with the wheel (bound once per Tk root)"""
+    if getattr(root, "_virtual_list_wheel", False):
+        return
+    root._virtual_list_wheel = True
+    for sequence in ("<MouseWheel>", "<Button-4>", "<Button-5>"):
+        root.bind_all(sequence, lambda event: _scroll_list_under(root, event), add="+")
+
+
+def _scroll_list_under(root, event):
+    widget = event.widget
+    # event.widget can be a string for widgets Tk created internally
+    if isinstance(widget, str):
+        try:
+            widget = root.nametowidget(widget)
+        except Exception:
+            return
+    while widget is not None:
+        if isinstance(widget, VirtualList):
+            try:
+                if widget.winfo_exists():
+                    widget.scroll_wheel(event)
+            except Exception:
+                pass
+            return
+        widget = getattr(widget, "master", None)
+
+
+class Pager(ctk.CTkFrame):
+    """Previous/next buttons and a "Page x of y" label for lists read a page at a time"""
+
+    def __init__(self, master, on_page, **kwargs):
+        kwargs.setdefault("fg_color", "transparent")
+        super().__init__(master, **kwargs)
+        self.on_page = on_page
+        self.page = 0
+        self.pages = 1
+
+        self._previous = ctk.CTkButton(self, text="◀ Previous", width=100, state="disabled",
+                                       command=lambda: self.on_page(self.page - 1))
+        self._previous.pack(side="left", padx=5)
+        self._label = ctk.CTkLabel(self, text="", font=("Helvetica", 12), width=220)
+        self._label.pack(side="left", padx=5)
+        self._next = ctk.CTkButton(self, text="Next ▶", width=100, state="disabled",
+                                   command=lambda: self.on_page(self.page + 1))
+        self._next.pack(side="left", padx=5)
+
+    def show(self, page, pages, total, noun="rows"):
+        self.page = page
+        self.pages = pages
+        self._label.configure(text=f"Page {page + 1} of {pages} ({total} {noun})")
+        self._previous.configure(state="normal" if page > 0 else "disabled")
+        self._next.configure(state="normal" if page + 1 < pages else "disabled")